@@ -1,7 +1,15 @@
 #!/usr/bin/python
 
+import abc
+import mmap
+import os
+
 import ahmes_math
 
+# The bits of AhmesComputer.watchpoints.
+watch_read = 0x01
+watch_write = 0x02
+
 
 def find_maximum_string_width(objects):
     maximum_so_far = 0
@@ -26,33 +34,102 @@ def make_string_of_key_value_lines(keys, values):
     return '\n'.join(make_list_of_key_value_lines(keys, values))
 
 
+# The values of bytes right-aligned to each width they can need, so that dumps of the memory do not format numbers.
+byte_strings_by_width = {width: [str(value).rjust(width) for value in range(256)] for width in (1, 2, 3)}
+
+# The beginnings of the lines of dumps of the memory, as make_list_of_key_value_lines would format them.
+memory_line_prefixes = ['{0:3}: '.format(address) for address in range(256)]
+computer_line_prefixes = ['AC : ', 'PC : '] + memory_line_prefixes
+
+
+def make_string_of_byte_lines(prefixes, values):
+    """
+    Makes the same string as make_string_of_key_value_lines for byte values whose keys are already formatted.
+    :param prefixes: the formatted keys, followed by ': '
+    :param values: byte values, one per prefix
+    """
+    strings = byte_strings_by_width[len(str(max(values)))]
+    return '\n'.join([prefix + strings[value] for prefix, value in zip(prefixes, values)])
+
+
+def make_flag_property(flag):
+    """
+    Makes a property that reads and writes one of the packed indicators as a bool.
+    :param flag: one of the flag constants of ahmes_math
+    """
+    return property(lambda self: self.flags & flag != 0, lambda self, value: self.set_flag(flag, value))
+
+
 class AhmesIndicators(object):
+    """
+    A view of the N, Z, V, C, and B indicators of an AhmesComputer, which keeps them packed into its flags.
+    """
+
+    __slots__ = ('ahmes_computer',)
+
     def __init__(self, ahmes_computer):
         self.ahmes_computer = ahmes_computer
-        self.update()
+
+    @property
+    def flags(self):
+        return self.ahmes_computer.flags
+
+    @flags.setter
+    def flags(self, flags):
+        self.ahmes_computer.flags = flags
 
     def update(self):
-        self.n = ahmes_math.to_signed_byte(self.ahmes_computer.ac) < 0
-        self.z = self.ahmes_computer.ac == 0
-        self.v = False
-        self.c = False
-        self.b = False
+        """
+        Updates the N and Z indicators according to the current value of the accumulator.
+        The V, C, and B indicators are only changed by the instructions that affect them.
+        """
+        self.flags = self.flags & ~ahmes_math.nz_flag_mask | ahmes_math.nz_flags[self.ahmes_computer.ac]
+
+    def set_flag(self, flag, value):
+        if value:
+            self.flags |= flag
+        else:
+            self.flags &= ~flag
+
+    n = make_flag_property(ahmes_math.flag_n)
+    z = make_flag_property(ahmes_math.flag_z)
+    v = make_flag_property(ahmes_math.flag_v)
+    c = make_flag_property(ahmes_math.flag_c)
+    b = make_flag_property(ahmes_math.flag_b)
 
 
 class AhmesComputer(object):
     """
     A pure Python implementation of the Ahmes computer.
+
+    The state of the computer is its memory, AC, PC, the indicators packed into flags, and whether it has halted.
+    Two computers are equal when their states and instruction indexes are equal; the counters are not compared.
     """
 
-    def __init__(self, ac=0, pc=0):
+    __slots__ = ('ac', 'pc', 'flags', 'bytes', 'instructions', 'memory_accesses', 'halted', 'pedantic',
+                 'dispatch_table', 'store_observers', 'breakpoints', 'watchpoints', 'debugging', 'stop_reason')
+
+    def __init__(self, ac=0, pc=0, pedantic=True):
         self.ac = 0  # It is a good practice to define all attributes inside the __init__ method
         self.pc = 0
         self.set_ac(ac)  # Should reuse the AC setter so that the validation step is not duplicated
         self.set_pc(pc)  # Same for PC
-        self.bytes = [0] * 256
-        self.indicators = AhmesIndicators(self)
+        self.flags = ahmes_math.nz_flags[self.ac]
+        self.bytes = bytearray(256)
         self.instructions = 0
         self.memory_accesses = 0
+        self.halted = False
+        self.pedantic = bool(pedantic)  # So that computers in the same mode compare and hash equal
+        self.dispatch_table = ahmes_dispatch_tables[self.pedantic]
+        self.store_observers = []
+        self.breakpoints = bytearray(256)  # Nonzero for the addresses that stop run before they are executed
+        self.watchpoints = bytearray(256)  # The watch_read and watch_write bits of every address
+        self.debugging = False  # Whether there is any breakpoint or watchpoint
+        self.stop_reason = None
+
+    @property
+    def indicators(self):
+        return AhmesIndicators(self)
 
     def set_ac(self, ac):
         ahmes_math.assert_is_a_valid_byte_value(ac)
@@ -62,15 +139,183 @@ class AhmesComputer(object):
         ahmes_math.assert_is_a_valid_byte_value(pc)
         self.pc = pc
 
+    def set_byte(self, address, value):
+        """
+        Sets the byte at the specified address without counting a memory access.
+        Every function in store_observers is called with the address, the old value, and the new value.
+        :param address: a valid byte value
+        :param value: a valid byte value
+        """
+        ahmes_math.assert_is_a_valid_byte_value(address)
+        ahmes_math.assert_is_a_valid_byte_value(value)
+        old_value = self.bytes[address]
+        self.bytes[address] = value
+        for observer in self.store_observers:
+            observer(address, old_value, value)
+
+    def update_debugging(self):
+        self.debugging = any(self.breakpoints) or any(self.watchpoints)
+
+    def add_breakpoint(self, address):
+        """
+        Makes run stop before executing the instruction at the specified address, unless it is the first instruction.
+        :param address: a valid byte value
+        """
+        ahmes_math.assert_is_a_valid_byte_value(address)
+        self.breakpoints[address] = 1
+        self.debugging = True
+
+    def remove_breakpoint(self, address):
+        ahmes_math.assert_is_a_valid_byte_value(address)
+        self.breakpoints[address] = 0
+        self.update_debugging()
+
+    def add_watchpoint(self, address, read=False, write=True):
+        """
+        Makes run stop right after an instruction reads or writes the specified address.
+        :param address: a valid byte value
+        :param read: whether data reads by LDA, ADD, OR, AND, and SUB should stop the computer
+        :param write: whether writes by STA should stop the computer, even if they do not change the byte
+        """
+        ahmes_math.assert_is_a_valid_byte_value(address)
+        self.watchpoints[address] |= (watch_read if read else 0) | (watch_write if write else 0)
+        self.update_debugging()
+
+    def remove_watchpoint(self, address):
+        ahmes_math.assert_is_a_valid_byte_value(address)
+        self.watchpoints[address] = 0
+        self.update_debugging()
+
     def increment_pc(self):
         self.pc = (self.pc + 1) % 256
 
     def load_program(self, program):
         assert isinstance(program, AhmesProgram), 'program should be an AhmesProgram'
-        self.bytes = list(program.bytes)  # Copy the bytes, not just the reference
+        assert len(program.bytes) == 256, 'program should have exactly 256 bytes'
+        self.bytes = bytearray(program.bytes)  # Copy the bytes, not just the reference
+        self.halted = False
+
+    def get_state(self):
+        """
+        Returns the state of the computer as 260 bytes: the memory followed by AC, PC, the flags, and the halted flag.
+        """
+        return bytes(self.bytes) + bytes((self.ac, self.pc, self.flags, self.halted))
+
+    def snapshot(self):
+        """
+        Makes a snapshot of the computer, which can be restored with restore.
+        :return: a tuple with the state, the number of instructions, and the number of memory accesses
+        """
+        return self.get_state(), self.instructions, self.memory_accesses
+
+    def restore(self, snapshot):
+        """
+        Restores the computer to a snapshot made by snapshot.
+
+        The memory is replaced by a new bytearray, so objects that watch it through store_observers can notice that
+        it changed by comparing its identity.
+        :param snapshot: a tuple returned by snapshot
+        """
+        state, self.instructions, self.memory_accesses = snapshot
+        self.bytes = bytearray(state[:256])
+        self.ac, self.pc, self.flags, halted = state[256:]
+        self.halted = halted != 0
+
+    def __eq__(self, other):
+        if not isinstance(other, AhmesComputer):
+            return NotImplemented
+        return self.pedantic == other.pedantic and self.get_state() == other.get_state()
+
+    def __hash__(self):
+        # The hash changes when the computer does, so computers should not be mutated while in sets or dict keys.
+        return hash((self.pedantic, self.get_state()))
 
     def advance(self):
-        pass
+        """
+        Fetches, decodes, and executes a single instruction. Does nothing if the computer is halted.
+        """
+        self.run(1)
+
+    def run(self, max_steps=None):
+        """
+        Executes instructions until the computer halts or max_steps instructions have been executed.
+
+        Every memory byte is a valid opcode, so the only validation is done when values enter the computer.
+        If there are breakpoints or watchpoints, the computer also stops when one of them is hit, which is described by
+        stop_reason. Otherwise stop_reason is None and they cost nothing but the bit tests of load_byte and store_byte.
+        :param max_steps: the maximum number of instructions to execute, or None for no limit
+        :return: the number of instructions executed
+        """
+        if self.debugging:
+            return self.run_debugging(max_steps)
+        return self.run_uninterrupted(max_steps)
+
+    def run_uninterrupted(self, max_steps=None):
+        """
+        Executes instructions like run, but never stops at breakpoints or watchpoints, for callers that replay or
+        reuse runs and need them to reach the step budget. stop_reason is left as None.
+        :param max_steps: the maximum number of instructions to execute, or None for no limit
+        :return: the number of instructions executed
+        """
+        dispatch_table = self.dispatch_table
+        memory = self.bytes
+        steps = 0
+        fetches = 0  # Instruction fetches are added to memory_accesses once the loop is over
+        limit = -1 if max_steps is None else max_steps
+        try:
+            while steps != limit and not self.halted:
+                pc = self.pc
+                function, size = dispatch_table[memory[pc]]
+                fetches += size
+                if size == 1:
+                    self.pc = (pc + 1) & 0xFF
+                    function(self, None)
+                else:
+                    self.pc = (pc + 2) & 0xFF
+                    function(self, memory[(pc + 1) & 0xFF])
+                steps += 1
+        finally:
+            self.instructions += steps
+            self.memory_accesses += fetches
+            self.stop_reason = None  # Watchpoints hit by load_byte and store_byte are ignored
+        return steps
+
+    def run_debugging(self, max_steps=None):
+        """
+        Executes instructions like run, but stops after an instruction that hits a watchpoint or before an instruction
+        that has a breakpoint. The first instruction is always executed, so that a stopped run can be resumed.
+        Sets stop_reason to ('breakpoint', address), ('read', address), ('write', address), or None.
+        :param max_steps: the maximum number of instructions to execute, or None for no limit
+        :return: the number of instructions executed
+        """
+        dispatch_table = self.dispatch_table
+        memory = self.bytes
+        breakpoints = self.breakpoints
+        steps = 0
+        fetches = 0
+        limit = -1 if max_steps is None else max_steps
+        self.stop_reason = None
+        try:
+            while steps != limit and not self.halted:
+                pc = self.pc
+                function, size = dispatch_table[memory[pc]]
+                fetches += size
+                if size == 1:
+                    self.pc = (pc + 1) & 0xFF
+                    function(self, None)
+                else:
+                    self.pc = (pc + 2) & 0xFF
+                    function(self, memory[(pc + 1) & 0xFF])
+                steps += 1
+                if self.stop_reason is not None:
+                    break
+                if breakpoints[self.pc] and not self.halted:
+                    self.stop_reason = ('breakpoint', self.pc)
+                    break
+        finally:
+            self.instructions += steps
+            self.memory_accesses += fetches
+        return steps
 
     def load_byte(self, address):
         """
@@ -78,49 +323,90 @@ class AhmesComputer(object):
         :param address: a valid byte value
         :return: the byte at the specified address
         """
-        ahmes_math.assert_is_a_valid_byte_value(address)
         self.memory_accesses += 1
+        if self.watchpoints[address] & watch_read:
+            self.stop_reason = ('read', address)
         return self.bytes[address]
 
     def store_byte(self, address, value):
         """
         Stores the specified byte value in the specified address, incrementing the number of memory accesses.
+        Every function in store_observers is then called with the address, the old value, and the new value.
         :param address: a valid byte value
         :param value: a valid byte value
         """
-        ahmes_math.assert_is_a_valid_byte_value(address)
-        ahmes_math.assert_is_a_valid_byte_value(value)
+        old_value = self.bytes[address]
         self.bytes[address] = value
         self.memory_accesses += 1
+        if self.watchpoints[address] & watch_write:
+            self.stop_reason = ('write', address)
+        if self.store_observers:
+            for observer in self.store_observers:
+                observer(address, old_value, value)
 
     def __str__(self):
-        keys = ['AC', 'PC']
-        keys.extend([i for i in range(256)])
         values = [self.ac, self.pc]
         values.extend(self.bytes)
-        return make_string_of_key_value_lines(keys, values)
+        return make_string_of_byte_lines(computer_line_prefixes, values)
 
 
 class AhmesProgram(object):
     """
     A pure Python representation of an Ahmes program.
+
+    The file is only read when the bytes of the program are first needed, so constructing programs is cheap.
     """
 
+    # The first 4 bytes of a memory file are not part of the program.
+    # The remaining of the file seems to be made up of pairs of bytes of which only the first is used.
+    header = b'\x03AHM'
+
     def __init__(self, filename):
-        self.initialized = False
         self.filename = filename
-        self.bytes = []
+        self.decoded = False
+        self.read_successfully = False
+        self.program_bytes = b''
+
+    @classmethod
+    def from_bytes(cls, byte_list, filename=None):
+        """
+        Makes an AhmesProgram from a list of bytes instead of a memory file.
+        :param byte_list: a list of bytes
+        :param filename: the filename used by save when it is not given one
+        :return: an AhmesProgram
+        """
+        assert all(map(ahmes_math.is_byte, byte_list)), 'byte_list should be a list of bytes'
+        program = cls(filename)
+        program.decoded = True
+        program.read_successfully = True
+        program.program_bytes = bytes(byte_list)
+        return program
+
+    @property
+    def initialized(self):
+        self.initialize_bytes()
+        return self.read_successfully
+
+    @property
+    def bytes(self):
         self.initialize_bytes()
+        return self.program_bytes
 
     def initialize_bytes(self):
-        if not self.initialized:
+        if not self.decoded:
+            self.decoded = True
             try:
                 with open(self.filename, 'rb') as open_file:
-                    read_bytes = open_file.read()
-                    # The first 4 bytes are not part of the program.
-                    # The remaining of the file seems to be made up of pairs of bytes of which only the first is used.
-                    self.bytes = read_bytes[4::2]
-                    self.initialized = True
+                    if os.fstat(open_file.fileno()).st_size == 0:
+                        self.program_bytes = b''  # Empty files cannot be mapped
+                    else:
+                        with mmap.mmap(open_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                            view = memoryview(mapped_file)
+                            try:
+                                self.program_bytes = view[len(self.header)::2].tobytes()
+                            finally:
+                                view.release()  # The map cannot be closed while it is exported
+                    self.read_successfully = True
             except FileNotFoundError:
                 pass  # Acceptable, the class handles this exception
 
@@ -137,49 +423,63 @@ class AhmesProgram(object):
             assert len(byte_list) == len(
                     self.get_bytes()), 'byte_list should have the same size as the current list'
             assert all(map(lambda e: isinstance(e, int), byte_list)), 'byte_list should be a list of bytes'
-            self.bytes = byte_list
+            self.program_bytes = byte_list
+
+    def save(self, filename=None):
+        """
+        Writes this AhmesProgram as a memory file: the header followed by each byte padded with a zero byte.
+        :param filename: the path of the file, or None to use the filename of the program
+        """
+        filename = self.filename if filename is None else filename
+        assert filename is not None, 'the program has no filename'
+        program_bytes = self.bytes
+        file_bytes = bytearray(len(self.header) + 2 * len(program_bytes))
+        file_bytes[:len(self.header)] = self.header
+        file_bytes[len(self.header)::2] = program_bytes
+        with open(filename, 'wb') as open_file:
+            open_file.write(file_bytes)
 
     def __str__(self):
         if not self.initialized:
             return 'Failed to initialize the program.'
-        keys = [i for i in range(256)]
         values = self.bytes
+        if len(values) == 256:
+            return make_string_of_byte_lines(memory_line_prefixes, values)
+        keys = [i for i in range(256)]
         return make_string_of_key_value_lines(keys, values)
 
 
 class AhmesInstruction(object):
-    def __init__(self, function, mnemonic, code):
+    def __init__(self, function, mnemonic, code, size):
         """
-        Constructs a new AhmesInstruction with a function, a mnemonic, and a code value.
-        :param function: a function that takes an AhmesComputer as an argument
+        Constructs a new AhmesInstruction with a function, a mnemonic, a code value, and a size.
+        :param function: a function with two parameters: an AhmesComputer and an operand (None if there is none)
         :param mnemonic: an uppercase string that represents the instruction
         :param code: a valid byte code for the instruction
+        :param size: the number of bytes the instruction occupies in memory
         :return: an AhmesInstruction
         """
         assert isinstance(mnemonic, str), 'mnemonic should be a str'
         assert mnemonic.isupper(), 'mnemonic should be uppercase'
         assert len(mnemonic) > 0, 'mnemonic should not be empty'
         ahmes_math.assert_is_a_valid_byte_value(code)
+        assert size in (1, 2), 'size should be either 1 or 2'
         self.function = function
         self.mnemonic = mnemonic
         self.code = code
+        self.size = size
 
 
 class SingleByteAhmesInstruction(AhmesInstruction):
     def __init__(self, function, mnemonic, code):
         """
-        Constructs a new SingleByteAhmesInstruction with a function of one parameter, a mnemonic, and a code value.
-        :param function: a function that takes an AhmesComputer as an argument
+        Constructs a new SingleByteAhmesInstruction with a function, a mnemonic, and a code value.
+        :param function: a function that takes an AhmesComputer and an ignored operand as arguments
         :param mnemonic: an uppercase string that represents the instruction
         :param code: a valid byte code for the instruction
         :return: a SingleByteAhmesInstruction
         """
-
-        def wrapped_function(ahmes_computer):
-            ahmes_computer.increment_pc()
-            function(ahmes_computer)
-
-        super().__init__(wrapped_function, mnemonic, code)
+        super().__init__(function, mnemonic, code, 1)
 
 
 class TwoByteAhmesInstruction(AhmesInstruction):
@@ -191,37 +491,32 @@ class TwoByteAhmesInstruction(AhmesInstruction):
         :param code: a valid byte code for the instruction
         :return: a TwoByteAhmesInstruction
         """
-
-        def wrapped_function(ahmes_computer):
-            ahmes_computer.increment_pc()
-            operand = ahmes_computer.retrieve_current_byte()
-            ahmes_computer.increment_pc()
-            function(ahmes_computer, operand)
-
-        super().__init__(wrapped_function, mnemonic, code)
+        super().__init__(function, mnemonic, code, 2)
 
 
 class AhmesJumpInstruction(TwoByteAhmesInstruction):
     def __init__(self, predicate, mnemonic, code):
         """
         Constructs a new AhmesJumpInstruction with a predicate function, a mnemonic, and a code value.
-        :param predicate : a function that takes an AhmesComputer as an argument and returns a logic value
+        :param predicate : a function that takes the packed indicators as an argument and returns a logic value
         :param mnemonic: an uppercase string that represents the instruction
         :param code: a valid byte code for the instruction
         :return: an AhmesJumpInstruction
         """
 
-        def wrapped_function(ahmes_computer, operand):
-            if predicate(ahmes_computer):
-                ahmes_computer.set_pc(operand)
+        def jump_function(ahmes_computer, operand):
+            if predicate(ahmes_computer.flags):
+                ahmes_computer.pc = operand
 
-        super().__init__(wrapped_function, mnemonic, code)
+        super().__init__(jump_function, mnemonic, code)
+        self.predicate = predicate
 
 
-def no_op_function(ahmes_computer):
+def no_op_function(ahmes_computer, operand=None):
     """
     The no-op function.
     :param ahmes_computer: an AhmesComputer
+    :param operand: ignored
     :return: None
     """
     pass
@@ -234,7 +529,6 @@ def store_function(ahmes_computer, address):
     :param address: a valid address
     :return: None
     """
-    ahmes_math.assert_is_a_valid_byte_value(address)
     ahmes_computer.store_byte(address, ahmes_computer.ac)
 
 
@@ -245,35 +539,94 @@ def load_function(ahmes_computer, address):
     :param address: a valid address
     :return: None
     """
-    ahmes_math.assert_is_a_valid_byte_value(address)
-    ahmes_computer.load_byte(address)
+    value = ahmes_computer.load_byte(address)
+    ahmes_computer.ac = value
+    ahmes_computer.flags = ahmes_computer.flags & ~ahmes_math.nz_flag_mask | ahmes_math.nz_flags[value]
+
+
+def make_binary_alu_function(mnemonic):
+    """
+    Makes the function of an instruction that combines the accumulator with the byte at an address.
+    The result and the indicators are read from the lookup table of the operation.
+    :param mnemonic: one of ADD, SUB, AND, or OR
+    :return: a function with two parameters: an AhmesComputer and a valid address
+    """
+    results, flags = ahmes_math.get_alu_table(mnemonic)
+    kept_flags = ~ahmes_math.alu_flag_masks[mnemonic]
+
+    def binary_alu_function(ahmes_computer, address):
+        index = ahmes_computer.ac << 8 | ahmes_computer.load_byte(address)
+        ahmes_computer.ac = results[index]
+        ahmes_computer.flags = ahmes_computer.flags & kept_flags | flags[index]
+
+    return binary_alu_function
+
+
+def make_unary_alu_function(mnemonic):
+    """
+    Makes the function of an instruction that only changes the accumulator.
+    The result and the indicators are read from the lookup table of the operation.
+    :param mnemonic: one of NOT, SHR, SHL, ROR, or ROL
+    :return: a function that takes an AhmesComputer and an ignored operand as arguments
+    """
+    results, flags = ahmes_math.get_alu_table(mnemonic)
+    kept_flags = ~ahmes_math.alu_flag_masks[mnemonic]
+
+    def unary_alu_function(ahmes_computer, operand=None):
+        ac = ahmes_computer.ac
+        ahmes_computer.ac = results[ac]
+        ahmes_computer.flags = ahmes_computer.flags & kept_flags | flags[ac]
+
+    return unary_alu_function
+
+
+def make_flag_predicate(flag, expected):
+    """
+    Makes the predicate of a conditional jump.
+    :param flag: one of the flag constants of ahmes_math
+    :param expected: whether the jump happens when the indicator is set or when it is clear
+    :return: a function that takes the packed indicators as an argument and returns a logic value
+    """
+    if expected:
+        return lambda flags: flags & flag
+    return lambda flags: not flags & flag
+
+
+def halt_function(ahmes_computer, operand=None):
+    """
+    The function of the halt instruction. Stops the execution of the program.
+    :param ahmes_computer: an AhmesComputer
+    :param operand: ignored
+    :return: None
+    """
+    ahmes_computer.halted = True
 
 
 def make_ahmes_instruction_index(pedantic):
     instruction_list = [SingleByteAhmesInstruction(no_op_function, 'NOP', 0),
                         TwoByteAhmesInstruction(store_function, 'STA', 16),
                         TwoByteAhmesInstruction(load_function, 'LDA', 32),
-                        TwoByteAhmesInstruction(no_op_function, 'ADD', 48),
-                        TwoByteAhmesInstruction(no_op_function, 'OR', 64),
-                        TwoByteAhmesInstruction(no_op_function, 'AND', 80),
-                        SingleByteAhmesInstruction(no_op_function, 'NOT', 96),
-                        TwoByteAhmesInstruction(no_op_function, 'SUB', 112),
-                        AhmesJumpInstruction(no_op_function, 'JMP', 128),
-                        AhmesJumpInstruction(no_op_function, 'JN', 144),
-                        AhmesJumpInstruction(no_op_function, 'JP', 148),
-                        AhmesJumpInstruction(no_op_function, 'JV', 152),
-                        AhmesJumpInstruction(no_op_function, 'JNV', 156),
-                        AhmesJumpInstruction(no_op_function, 'JZ', 160),
-                        AhmesJumpInstruction(no_op_function, 'JNZ', 164),
-                        AhmesJumpInstruction(no_op_function, 'JC', 176),
-                        AhmesJumpInstruction(no_op_function, 'JNC', 180),
-                        AhmesJumpInstruction(no_op_function, 'JB', 184),
-                        AhmesJumpInstruction(no_op_function, 'JNB', 188),
-                        SingleByteAhmesInstruction(no_op_function, 'SHR', 224),
-                        SingleByteAhmesInstruction(no_op_function, 'SHL', 225),
-                        SingleByteAhmesInstruction(no_op_function, 'ROR', 226),
-                        SingleByteAhmesInstruction(no_op_function, 'ROL', 227),
-                        SingleByteAhmesInstruction(no_op_function, 'HLT', 240)]
+                        TwoByteAhmesInstruction(make_binary_alu_function('ADD'), 'ADD', 48),
+                        TwoByteAhmesInstruction(make_binary_alu_function('OR'), 'OR', 64),
+                        TwoByteAhmesInstruction(make_binary_alu_function('AND'), 'AND', 80),
+                        SingleByteAhmesInstruction(make_unary_alu_function('NOT'), 'NOT', 96),
+                        TwoByteAhmesInstruction(make_binary_alu_function('SUB'), 'SUB', 112),
+                        AhmesJumpInstruction(lambda flags: True, 'JMP', 128),
+                        AhmesJumpInstruction(make_flag_predicate(ahmes_math.flag_n, True), 'JN', 144),
+                        AhmesJumpInstruction(make_flag_predicate(ahmes_math.flag_n, False), 'JP', 148),
+                        AhmesJumpInstruction(make_flag_predicate(ahmes_math.flag_v, True), 'JV', 152),
+                        AhmesJumpInstruction(make_flag_predicate(ahmes_math.flag_v, False), 'JNV', 156),
+                        AhmesJumpInstruction(make_flag_predicate(ahmes_math.flag_z, True), 'JZ', 160),
+                        AhmesJumpInstruction(make_flag_predicate(ahmes_math.flag_z, False), 'JNZ', 164),
+                        AhmesJumpInstruction(make_flag_predicate(ahmes_math.flag_c, True), 'JC', 176),
+                        AhmesJumpInstruction(make_flag_predicate(ahmes_math.flag_c, False), 'JNC', 180),
+                        AhmesJumpInstruction(make_flag_predicate(ahmes_math.flag_b, True), 'JB', 184),
+                        AhmesJumpInstruction(make_flag_predicate(ahmes_math.flag_b, False), 'JNB', 188),
+                        SingleByteAhmesInstruction(make_unary_alu_function('SHR'), 'SHR', 224),
+                        SingleByteAhmesInstruction(make_unary_alu_function('SHL'), 'SHL', 225),
+                        SingleByteAhmesInstruction(make_unary_alu_function('ROR'), 'ROR', 226),
+                        SingleByteAhmesInstruction(make_unary_alu_function('ROL'), 'ROL', 227),
+                        SingleByteAhmesInstruction(halt_function, 'HLT', 240)]
     instruction_index = [None] * 256
     for instruction in instruction_list:
         instruction_index[instruction.code] = instruction
@@ -292,7 +645,103 @@ def make_ahmes_instruction_index(pedantic):
     return instruction_index
 
 
-ahmes_instructions = make_ahmes_instruction_index(True)
+def make_ahmes_dispatch_table(instruction_index):
+    """
+    Resolves every opcode of an instruction index into a flat table of (function, size) pairs.
+    :param instruction_index: a list of 256 AhmesInstruction objects
+    :return: a list of 256 (function, size) tuples
+    """
+    assert len(instruction_index) == 256, 'instruction_index should have 256 instructions'
+    return [(instruction.function, instruction.size) for instruction in instruction_index]
+
+
+class AhmesLazyTables(dict):
+    """
+    A dict from pedantic to a table built by make_table(pedantic) the first time it is looked up, so that importing
+    this module does not build the instruction indexes and the ALU tables behind them. Only True and False are keys.
+    """
+
+    def __init__(self, make_table):
+        super(AhmesLazyTables, self).__init__()
+        self.make_table = make_table
+
+    def __missing__(self, pedantic):
+        assert isinstance(pedantic, bool), 'pedantic should be a bool'
+        table = self.make_table(pedantic)
+        self[pedantic] = table
+        return table
+
+
+ahmes_instruction_indexes = AhmesLazyTables(make_ahmes_instruction_index)
+
+ahmes_dispatch_tables = AhmesLazyTables(lambda pedantic: make_ahmes_dispatch_table(ahmes_instruction_indexes[pedantic]))
+
+
+def get_ahmes_instruction_index(pedantic):
+    """
+    Returns the shared instruction index of a mode, which should not be modified.
+    :param pedantic: as in make_ahmes_instruction_index
+    :return: a list of 256 AhmesInstruction objects
+    """
+    return ahmes_instruction_indexes[bool(pedantic)]
+
+
+class AhmesInstrument(abc.ABC):
+    """
+    The base of the objects that observe an AhmesComputer by wrapping the entries of its dispatch table.
+
+    enable swaps the dispatch table of the computer for one whose entries are made by make_entry from the entries of
+    the table the computer had, so instruments enabled on top of each other all observe every instruction. disable
+    restores that table, so instruments should be disabled in the reverse order they were enabled. A computer that is
+    not instrumented runs exactly as fast as before, and only instructions executed through the dispatch table are
+    observed.
+    """
+
+    def __init__(self, computer):
+        self.computer = computer
+        self.dispatch_table = None
+        self.wrapped_dispatch_table = None  # The table dispatch_table was made from
+        self.original_dispatch_table = None  # The table to restore, or None while disabled
+
+    @abc.abstractmethod
+    def make_entry(self, code, instruction, function):
+        """
+        Wraps the function of the entry of an opcode.
+        :param code: the opcode
+        :param instruction: the AhmesInstruction of the opcode
+        :param function: the function of the entry being wrapped, which may itself be instrumented
+        :return: a function that takes an AhmesComputer and an operand
+        """
+
+    @property
+    def enabled(self):
+        return self.original_dispatch_table is not None
+
+    def enable(self):
+        assert not self.enabled, 'the instrument should not be enabled twice'
+        dispatch_table = self.computer.dispatch_table
+        if dispatch_table is not self.wrapped_dispatch_table:
+            instruction_index = get_ahmes_instruction_index(self.computer.pedantic)
+            self.dispatch_table = []
+            for code, (function, size) in enumerate(dispatch_table):
+                self.dispatch_table.append((self.make_entry(code, instruction_index[code], function), size))
+            self.wrapped_dispatch_table = dispatch_table
+        self.original_dispatch_table = dispatch_table
+        self.computer.dispatch_table = self.dispatch_table
+
+    def disable(self):
+        if self.enabled:
+            on_top = self.computer.dispatch_table is self.dispatch_table
+            assert on_top, 'instruments should be disabled in the reverse order they were enabled'
+            self.computer.dispatch_table = self.original_dispatch_table
+            self.original_dispatch_table = None
+
+
+def __getattr__(name):
+    # ahmes_instructions used to be built on import and is now built when it is first accessed.
+    if name == 'ahmes_instructions':
+        return ahmes_instruction_indexes[True]
+    raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
 
 
 def resolve_ahmes_instruction(value):
@@ -301,12 +750,10 @@ def resolve_ahmes_instruction(value):
     :param value: a valid byte value
     :return: an AhmesInstruction
     """
-    return ahmes_instructions[value]
+    return ahmes_instruction_indexes[True][value]
 
 
 if __name__ == '__main__':
-    computer = AhmesComputer(16, 32)
-    print(str(computer))
-    ahmes_program = AhmesProgram('ones.mem')
-    ahmes_program.set_bytes(ahmes_program.get_bytes())
-    print(str(ahmes_program))
+    import ahmes_cli
+
+    ahmes_cli.main()
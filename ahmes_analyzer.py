@@ -0,0 +1,235 @@
+#!/usr/bin/python
+
+import functools
+
+import ahmes
+import ahmes_math
+
+# The mnemonics whose operand is the address of a byte of data.
+data_access_mnemonics = {'STA', 'LDA', 'ADD', 'OR', 'AND', 'SUB'}
+
+# The mnemonics whose instructions read one byte of data.
+data_read_mnemonics = data_access_mnemonics - {'STA'}
+
+# Mapping from jump mnemonics to (flag, value that makes the jump happen), None for unconditional jumps.
+jump_conditions = {'JMP': None,
+                   'JN': (ahmes_math.flag_n, True), 'JP': (ahmes_math.flag_n, False),
+                   'JV': (ahmes_math.flag_v, True), 'JNV': (ahmes_math.flag_v, False),
+                   'JZ': (ahmes_math.flag_z, True), 'JNZ': (ahmes_math.flag_z, False),
+                   'JC': (ahmes_math.flag_c, True), 'JNC': (ahmes_math.flag_c, False),
+                   'JB': (ahmes_math.flag_b, True), 'JNB': (ahmes_math.flag_b, False)}
+
+analysis_cache_size = 1024
+
+
+def is_jump(instruction):
+    return isinstance(instruction, ahmes.AhmesJumpInstruction)
+
+
+def falls_through(instruction):
+    return instruction.mnemonic not in ('JMP', 'HLT')
+
+
+def accesses_addresses(computer, instruction_index, addresses):
+    """
+    Returns whether the next instruction of a computer is fetched from or accesses data in any of the addresses.
+    """
+    pc = computer.pc
+    instruction = instruction_index[computer.bytes[pc]]
+    if pc in addresses:
+        return True
+    if instruction.size == 1:
+        return False
+    operand_address = (pc + 1) & 0xFF
+    return operand_address in addresses or (instruction.mnemonic in data_access_mnemonics and
+                                            computer.bytes[operand_address] in addresses)
+
+
+def run_until_access(computer, addresses, max_steps):
+    """
+    Runs a computer until its next instruction would read, write, or execute any of the addresses. Everything it did
+    up to that point is independent of the values at the addresses, so runs with different values can all start there.
+    :param computer: an AhmesComputer
+    :param addresses: a set of addresses
+    :param max_steps: the maximum number of instructions to execute
+    :return: the number of instructions executed
+    """
+    instruction_index = ahmes.get_ahmes_instruction_index(computer.pedantic)
+    steps = 0
+    while steps < max_steps and not computer.halted and not accesses_addresses(computer, instruction_index, addresses):
+        computer.run(1)
+        steps += 1
+    return steps
+
+
+def get_successors(address, instruction, operand):
+    """
+    Returns the addresses that can be executed after an instruction.
+    """
+    following = (address + instruction.size) & 0xFF
+    if instruction.mnemonic == 'HLT':
+        return []
+    if instruction.mnemonic == 'JMP':
+        return [operand]
+    if is_jump(instruction):
+        return [following, operand]
+    return [following]
+
+
+def find_reachable_instructions(memory, instruction_index, start=0):
+    """
+    Decodes every instruction that can be reached from an address, assuming the code does not modify itself.
+    :param memory: a list of 256 bytes
+    :param instruction_index: a list of 256 AhmesInstruction
+    :param start: the address of the first instruction
+    :return: a dict from addresses to (instruction, operand) pairs, where operand is None for single-byte instructions
+    """
+    reachable = {}
+    pending = [start]
+    while pending:
+        address = pending.pop()
+        if address in reachable:
+            continue
+        instruction = instruction_index[memory[address]]
+        operand = memory[(address + 1) & 0xFF] if instruction.size == 2 else None
+        reachable[address] = (instruction, operand)
+        pending.extend(get_successors(address, instruction, operand))
+    return reachable
+
+
+class AhmesAnalysis(object):
+    """
+    The static facts about a memory image: its reachable instructions and basic blocks, which bytes are code and which
+    are data, the loops, and the addresses STA can write.
+
+    The facts are exact only if the program never writes its own code, which is what self_modifying tells. When it
+    does, any byte may be executed or written, so may_be_written is true for every address and may_halt is true.
+    """
+
+    def __init__(self, memory, start=0, pedantic=True):
+        """
+        Analyzes a memory image.
+        :param memory: a bytes object with 256 bytes
+        :param start: the address of the first instruction
+        :param pedantic: which instruction index to decode with
+        """
+        assert len(memory) == 256, 'memory should have 256 bytes'
+        self.start = start
+        instruction_index = ahmes.get_ahmes_instruction_index(pedantic)
+        self.instructions = find_reachable_instructions(memory, instruction_index, start)
+        self.code_addresses = set()
+        for address, (instruction, operand) in self.instructions.items():
+            self.code_addresses.update((address + i) & 0xFF for i in range(instruction.size))
+        self.read_addresses = {operand for instruction, operand in self.instructions.values()
+                               if instruction.mnemonic in data_read_mnemonics}
+        self.written_addresses = {operand for instruction, operand in self.instructions.values()
+                                  if instruction.mnemonic == 'STA'}
+        self.data_addresses = self.read_addresses | self.written_addresses
+        self.self_modifying = not self.written_addresses.isdisjoint(self.code_addresses)
+        self.unreachable_addresses = set(range(256)) - self.code_addresses - self.data_addresses
+        self.predecessors = {}
+        for address, (instruction, operand) in self.instructions.items():
+            for successor in get_successors(address, instruction, operand):
+                self.predecessors.setdefault(successor, set()).add(address)
+        # Blocks start at the first instruction, after jumps, and wherever control flow merges.
+        self.leaders = {start}
+        for address, (instruction, operand) in self.instructions.items():
+            if is_jump(instruction):
+                self.leaders.update(get_successors(address, instruction, operand))
+            if len(self.predecessors.get(address, ())) != 1:
+                self.leaders.add(address)
+        self.blocks = self.find_blocks()
+        self.block_of = {address: block for block, (addresses, successors) in self.blocks.items()
+                         for address in addresses}
+        self.loops = self.find_loops()
+
+    def find_blocks(self):
+        """
+        Splits the reachable instructions into basic blocks.
+        :return: a dict from the address of the first instruction of each block to a pair with the list of the
+        addresses of its instructions and the list of the first addresses of its successors
+        """
+        blocks = {}
+        for leader in self.leaders:
+            addresses = [leader]
+            while True:
+                instruction, operand = self.instructions[addresses[-1]]
+                successors = get_successors(addresses[-1], instruction, operand)
+                if is_jump(instruction) or not successors or successors[0] in self.leaders:
+                    break
+                addresses.append(successors[0])
+            blocks[leader] = (addresses, successors)
+        return blocks
+
+    def find_loops(self):
+        """
+        Finds the natural loops of the control-flow graph from its back edges, the edges to a block that is still being
+        visited by a depth-first search from the start.
+        :return: a dict from (header, latch) pairs to the set of the first addresses of the blocks of each loop
+        """
+        loops = {}
+        visiting = set()
+        visited = set()
+        stack = [(self.start, iter(self.blocks[self.start][1]))]
+        visiting.add(self.start)
+        while stack:
+            block, successors = stack[-1]
+            successor = next(successors, None)
+            if successor is None:
+                stack.pop()
+                visiting.discard(block)
+                visited.add(block)
+            elif successor in visiting:
+                loops[(successor, block)] = self.find_loop_body(successor, block)
+            elif successor not in visited:
+                visiting.add(successor)
+                stack.append((successor, iter(self.blocks[successor][1])))
+        return loops
+
+    def find_loop_body(self, header, latch):
+        """
+        Finds the blocks that can reach the latch without going through the header.
+        """
+        body = {header, latch}
+        pending = [latch]
+        while pending:
+            block = pending.pop()
+            if block == header:
+                continue
+            for predecessor in self.predecessors.get(block, ()):
+                predecessor = self.block_of[predecessor]
+                if predecessor not in body:
+                    body.add(predecessor)
+                    pending.append(predecessor)
+        return body
+
+    @property
+    def may_halt(self):
+        """
+        Whether the program can halt. When this is false the program provably runs forever.
+        """
+        return self.self_modifying or any(instruction.mnemonic == 'HLT' for instruction, operand in
+                                          self.instructions.values())
+
+    def may_be_written(self, address):
+        return self.self_modifying or address in self.written_addresses
+
+    def is_never_written(self, addresses):
+        """
+        Returns whether no byte in addresses can ever be written by the program.
+        """
+        return not self.self_modifying and self.written_addresses.isdisjoint(addresses)
+
+
+@functools.lru_cache(maxsize=analysis_cache_size)
+def analyze_bytes(memory, start, pedantic):
+    return AhmesAnalysis(memory, start, pedantic)
+
+
+def analyze(memory, start=0, pedantic=True):
+    """
+    Analyzes a memory image, reusing the analysis of an identical image.
+    :param memory: a list of 256 bytes
+    :return: an AhmesAnalysis, which should not be modified
+    """
+    return analyze_bytes(bytes(memory), start, pedantic)
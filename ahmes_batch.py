@@ -0,0 +1,170 @@
+#!/usr/bin/python
+
+import numpy
+
+import ahmes
+import ahmes_analyzer
+import ahmes_math
+
+
+class AhmesBatchComputer(object):
+    """
+    Many Ahmes computers stored as NumPy arrays and executed in lockstep.
+
+    Each step fetches the opcode of every machine that has not halted, groups the machines by mnemonic, and applies
+    each instruction as a masked vectorized update.
+    """
+
+    def __init__(self, memories, ac=0, pc=0, pedantic=True):
+        """
+        Constructs a new AhmesBatchComputer.
+        :param memories: an array-like of shape (N, 256) with the initial memory of each computer
+        :param ac: a valid byte value or an array of N valid byte values
+        :param pc: a valid byte value or an array of N valid byte values
+        :param pedantic: which instruction index to use, as in make_ahmes_instruction_index
+        """
+        memories = numpy.asarray(memories)
+        assert memories.ndim == 2 and memories.shape[1] == 256, 'memories should have shape (N, 256)'
+        assert memories.size == 0 or (memories.min() >= 0 and memories.max() < 256), 'memories should hold bytes'
+        count = memories.shape[0]
+        self.bytes = memories.astype(numpy.uint8)
+        self.ac = self.make_byte_vector(ac, count)
+        self.pc = self.make_byte_vector(pc, count)
+        self.n = self.ac >= 128
+        self.z = self.ac == 0
+        self.v = numpy.zeros(count, dtype=bool)
+        self.c = numpy.zeros(count, dtype=bool)
+        self.b = numpy.zeros(count, dtype=bool)
+        self.halted = numpy.zeros(count, dtype=bool)
+        self.instructions = numpy.zeros(count, dtype=numpy.int64)
+        self.memory_accesses = numpy.zeros(count, dtype=numpy.int64)
+        self.pedantic = pedantic
+        instruction_index = ahmes.get_ahmes_instruction_index(pedantic)
+        self.mnemonics = sorted({instruction.mnemonic for instruction in instruction_index})
+        self.kinds = numpy.array([self.mnemonics.index(instruction.mnemonic) for instruction in instruction_index],
+                                 dtype=numpy.uint8)
+        self.sizes = numpy.array([instruction.size for instruction in instruction_index], dtype=numpy.int64)
+        self.data_accesses = numpy.array([instruction.mnemonic in ahmes_analyzer.data_access_mnemonics
+                                          for instruction in instruction_index], dtype=numpy.int64)
+
+    @staticmethod
+    def make_byte_vector(value, count):
+        vector = numpy.broadcast_to(numpy.asarray(value), (count,))
+        assert vector.size == 0 or (vector.min() >= 0 and vector.max() < 256), 'values should be valid bytes'
+        return vector.astype(numpy.uint8)
+
+    def __len__(self):
+        return self.bytes.shape[0]
+
+    def advance(self):
+        """
+        Executes one instruction on every computer that has not halted.
+        :return: the number of computers that executed an instruction
+        """
+        rows = numpy.flatnonzero(~self.halted)
+        if rows.size == 0:
+            return 0
+        pc = self.pc[rows]
+        opcodes = self.bytes[rows, pc]
+        operands = self.bytes[rows, (pc + 1) & 0xFF]
+        sizes = self.sizes[opcodes]
+        self.pc[rows] = (pc + sizes) & 0xFF
+        self.instructions[rows] += 1
+        self.memory_accesses[rows] += sizes + self.data_accesses[opcodes]
+        kinds = self.kinds[opcodes]
+        for kind in numpy.unique(kinds):
+            selected = kinds == kind
+            self.execute(self.mnemonics[kind], rows[selected], operands[selected])
+        return rows.size
+
+    def run(self, max_steps=None):
+        """
+        Advances all computers in lockstep until every one has halted or max_steps steps have been made.
+        :param max_steps: the maximum number of steps, or None for no limit
+        :return: the number of steps made
+        """
+        steps = 0
+        while (max_steps is None or steps < max_steps) and self.advance():
+            steps += 1
+        return steps
+
+    def update_nz(self, rows):
+        self.n[rows] = self.ac[rows] >= 128
+        self.z[rows] = self.ac[rows] == 0
+
+    def execute(self, mnemonic, rows, operands):
+        """
+        Applies an instruction to the selected computers, whose PC already points to the next instruction.
+        :param mnemonic: the mnemonic of the instruction
+        :param rows: the indices of the selected computers
+        :param operands: the byte after the opcode for each selected computer
+        """
+        if mnemonic == 'NOP':
+            return
+        elif mnemonic == 'HLT':
+            self.halted[rows] = True
+        elif mnemonic == 'STA':
+            self.bytes[rows, operands] = self.ac[rows]
+        elif mnemonic == 'JMP':
+            self.pc[rows] = operands
+        elif mnemonic in ahmes_analyzer.jump_conditions:
+            flag, expected = ahmes_analyzer.jump_conditions[mnemonic]
+            taken = getattr(self, ahmes_math.flag_names[flag])[rows] == expected
+            self.pc[rows[taken]] = operands[taken]
+        elif mnemonic in ('SHR', 'SHL', 'ROR', 'ROL'):
+            ac = self.ac[rows]
+            if mnemonic == 'SHR':
+                self.c[rows] = (ac & 0x01) != 0
+                self.ac[rows] = ac >> 1
+            elif mnemonic == 'SHL':
+                self.c[rows] = (ac & 0x80) != 0
+                self.ac[rows] = ac << 1
+            elif mnemonic == 'ROR':
+                self.c[rows] = (ac & 0x01) != 0
+                self.ac[rows] = (ac >> 1) | (ac << 7)
+            else:
+                self.c[rows] = (ac & 0x80) != 0
+                self.ac[rows] = (ac << 1) | (ac >> 7)
+            self.update_nz(rows)
+        elif mnemonic == 'NOT':
+            self.ac[rows] = ~self.ac[rows]
+            self.update_nz(rows)
+        else:
+            ac = self.ac[rows].astype(numpy.int16)
+            data = self.bytes[rows, operands].astype(numpy.int16)
+            if mnemonic == 'LDA':
+                result = data
+            elif mnemonic == 'OR':
+                result = ac | data
+            elif mnemonic == 'AND':
+                result = ac & data
+            elif mnemonic == 'ADD':
+                result = (ac + data) & 0xFF
+                self.c[rows] = ac + data > 0xFF
+                self.v[rows] = ((ac ^ result) & (data ^ result) & 0x80) != 0
+            elif mnemonic == 'SUB':
+                result = (ac - data) & 0xFF
+                self.b[rows] = data > ac
+                self.v[rows] = ((ac ^ data) & (ac ^ result) & 0x80) != 0
+            else:
+                raise ValueError('unknown mnemonic {0}'.format(mnemonic))
+            self.ac[rows] = result
+            self.update_nz(rows)
+
+    def get_computer(self, index):
+        """
+        Makes an AhmesComputer with the state of one of the computers of the batch.
+        :param index: the index of the computer in the batch
+        :return: an AhmesComputer
+        """
+        computer = ahmes.AhmesComputer(int(self.ac[index]), int(self.pc[index]), self.pedantic)
+        computer.bytes = bytearray(self.bytes[index].tobytes())
+        computer.indicators.n = bool(self.n[index])
+        computer.indicators.z = bool(self.z[index])
+        computer.indicators.v = bool(self.v[index])
+        computer.indicators.c = bool(self.c[index])
+        computer.indicators.b = bool(self.b[index])
+        computer.halted = bool(self.halted[index])
+        computer.instructions = int(self.instructions[index])
+        computer.memory_accesses = int(self.memory_accesses[index])
+        return computer
@@ -0,0 +1,291 @@
+#!/usr/bin/python
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import ahmes
+import ahmes_translator
+
+default_minimum_time = 0.2
+default_tolerance = 0.1
+
+
+def make_memory(code, data):
+    """
+    Makes a memory image with code from address 0 and the data at the specified addresses.
+    :param code: a list of bytes
+    :param data: a dict from addresses to bytes
+    :return: a list of 256 bytes
+    """
+    memory = [0] * 256
+    memory[:len(code)] = code
+    for address, value in data.items():
+        memory[address] = value
+    return memory
+
+
+def make_pseudorandom_bytes(count):
+    return [(i * 37 + 11) % 256 for i in range(count)]
+
+
+def make_countdown_memory(counter=255):
+    """
+    Decrements the byte at 128 until it is zero.
+    """
+    code = [32, 128,  # 0: LDA 128
+            112, 129,  # 2: SUB 129
+            16, 128,  # 4: STA 128
+            164, 2,  # 6: JNZ 2
+            240]  # 8: HLT
+    return make_memory(code, {128: counter, 129: 1})
+
+
+def make_multiplication_memory(a=13, b=19):
+    """
+    Multiplies the byte at 128 by the byte at 129 by repeated addition, leaving the product at 131.
+    """
+    code = [32, 129,  # 0: LDA 129
+            16, 132,  # 2: STA 132 (counter)
+            32, 132,  # 4: LDA 132
+            160, 20,  # 6: JZ 20
+            112, 133,  # 8: SUB 133
+            16, 132,  # 10: STA 132
+            32, 131,  # 12: LDA 131
+            48, 128,  # 14: ADD 128
+            16, 131,  # 16: STA 131
+            128, 4,  # 18: JMP 4
+            240]  # 20: HLT
+    return make_memory(code, {128: a, 129: b, 131: 0, 133: 1})
+
+
+bubble_sort_start = 192
+bubble_sort_length = 16
+
+
+def make_bubble_sort_memory(values=None):
+    """
+    Sorts the bytes from 192 to 207 in ascending order with a bubble sort.
+
+    Ahmes has no indirect addressing, so every pass patches the operands of the instructions that compare and swap
+    the current pair of bytes.
+    """
+    if values is None:
+        values = make_pseudorandom_bytes(bubble_sort_length)
+    assert len(values) == bubble_sort_length, 'values should have {0} bytes'.format(bubble_sort_length)
+    code = [32, 243,  # 0: LDA 243 (swapped = 0)
+            16, 241,  # 2: STA 241
+            32, 246,  # 4: LDA 246 (p = 192)
+            16, 240,  # 6: STA 240
+            32, 240,  # 8: LDA 240
+            16, 27,  # 10: STA 27 (operands that refer to p)
+            16, 33,  # 12: STA 33
+            16, 39,  # 14: STA 39
+            48, 242,  # 16: ADD 242
+            16, 25,  # 18: STA 25 (operands that refer to p + 1)
+            16, 37,  # 20: STA 37
+            16, 43,  # 22: STA 43
+            32, 0,  # 24: LDA p + 1
+            112, 0,  # 26: SUB p
+            184, 32,  # 28: JB 32 (swap if the byte at p is greater than the byte at p + 1)
+            128, 48,  # 30: JMP 48
+            32, 0,  # 32: LDA p
+            16, 245,  # 34: STA 245
+            32, 0,  # 36: LDA p + 1
+            16, 0,  # 38: STA p
+            32, 245,  # 40: LDA 245
+            16, 0,  # 42: STA p + 1
+            32, 242,  # 44: LDA 242 (swapped = 1)
+            16, 241,  # 46: STA 241
+            32, 240,  # 48: LDA 240 (p = p + 1)
+            48, 242,  # 50: ADD 242
+            16, 240,  # 52: STA 240
+            112, 244,  # 54: SUB 244
+            164, 8,  # 56: JNZ 8 (until p is the last byte)
+            32, 241,  # 58: LDA 241
+            164, 0,  # 60: JNZ 0 (until a pass makes no swap)
+            240]  # 62: HLT
+    data = {242: 1, 243: 0, 244: bubble_sort_start + bubble_sort_length - 1, 246: bubble_sort_start}
+    for i, value in enumerate(values):
+        data[bubble_sort_start + i] = value
+    return make_memory(code, data)
+
+
+self_modifying_sum_start = 192
+self_modifying_sum_length = 48
+
+
+def make_self_modifying_sum_memory(values=None):
+    """
+    Adds the bytes from 192 to 239, leaving the sum modulo 256 at 250, by incrementing the operand of its own ADD.
+    """
+    if values is None:
+        values = make_pseudorandom_bytes(self_modifying_sum_length)
+    assert len(values) == self_modifying_sum_length, 'values should have {0} bytes'.format(self_modifying_sum_length)
+    code = [32, 250,  # 0: LDA 250
+            48, self_modifying_sum_start,  # 2: ADD 192 (the operand is incremented by every iteration)
+            16, 250,  # 4: STA 250
+            32, 3,  # 6: LDA 3
+            48, 251,  # 8: ADD 251
+            16, 3,  # 10: STA 3
+            112, 252,  # 12: SUB 252
+            164, 0,  # 14: JNZ 0
+            240]  # 16: HLT
+    data = {250: 0, 251: 1, 252: self_modifying_sum_start + self_modifying_sum_length}
+    for i, value in enumerate(values):
+        data[self_modifying_sum_start + i] = value
+    return make_memory(code, data)
+
+
+workloads = {'countdown': make_countdown_memory,
+             'multiplication': make_multiplication_memory,
+             'bubble_sort': make_bubble_sort_memory,
+             'self_modifying_sum': make_self_modifying_sum_memory}
+
+
+# Every engine takes a computer and returns the function that runs it to completion and returns the instructions run.
+
+
+def make_interpreter_run(computer):
+    return computer.run
+
+
+def make_translator_run(computer):
+    return ahmes_translator.AhmesTranslator(computer).run
+
+
+engines = {'interpreter': make_interpreter_run, 'translator': make_translator_run}
+
+
+def measure(function, minimum_time):
+    """
+    Calls a function until minimum_time seconds have passed.
+    :return: the number of calls and the number of seconds they took
+    """
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while calls == 0 or elapsed < minimum_time:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return calls, elapsed
+
+
+def measure_instructions_per_second(memory, engine, minimum_time):
+    """
+    Runs a workload until minimum_time seconds have been spent running it. Only the runs are timed: the computer and
+    the engine are built once, a first run compiles what the engine compiles, and the computer is restored to its
+    initial state before every run.
+    """
+    computer = ahmes.AhmesComputer()
+    computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+    initial = computer.snapshot()
+    run = engine(computer)
+    run()
+    instructions = 0
+    elapsed = 0.0
+    while instructions == 0 or elapsed < minimum_time:
+        computer.restore(initial)
+        start = time.perf_counter()
+        instructions += run()
+        elapsed += time.perf_counter() - start
+    return instructions / elapsed
+
+
+def measure_load_seconds(memory, minimum_time):
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'program.mem')
+        ahmes.AhmesProgram.from_bytes(memory).save(filename)
+
+        def load_once():
+            ahmes.AhmesComputer().load_program(ahmes.AhmesProgram(filename))
+
+        calls, elapsed = measure(load_once, minimum_time)
+    return elapsed / calls
+
+
+def measure_str_seconds(memory, minimum_time):
+    computer = ahmes.AhmesComputer()
+    computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+    calls, elapsed = measure(lambda: str(computer), minimum_time)
+    return elapsed / calls
+
+
+def run_benchmarks(minimum_time=default_minimum_time):
+    """
+    Runs every benchmark.
+    :param minimum_time: the minimum number of seconds spent on each measurement
+    :return: a dict from metric names to values; names ending in _per_second are better when higher and names ending
+    in _seconds are better when lower
+    """
+    metrics = {}
+    for name, make_workload_memory in sorted(workloads.items()):
+        memory = make_workload_memory()
+        for engine_name, engine in sorted(engines.items()):
+            metric = '{0}.{1}.instructions_per_second'.format(name, engine_name)
+            metrics[metric] = measure_instructions_per_second(memory, engine, minimum_time)
+    memory = make_countdown_memory()
+    metrics['load_program_seconds'] = measure_load_seconds(memory, minimum_time)
+    metrics['str_seconds'] = measure_str_seconds(memory, minimum_time)
+    return metrics
+
+
+def find_regressions(metrics, baseline, tolerance=default_tolerance):
+    """
+    Compares metrics against a baseline.
+    :param metrics: a dict as returned by run_benchmarks
+    :param baseline: a dict as returned by run_benchmarks
+    :param tolerance: the relative change that is not considered a regression
+    :return: a dict from the names of the metrics that regressed to their relative change
+    """
+    regressions = {}
+    for name, value in metrics.items():
+        if name not in baseline or baseline[name] == 0:
+            continue
+        change = (value - baseline[name]) / baseline[name]
+        if name.endswith('_per_second'):
+            change = -change
+        if change > tolerance:
+            regressions[name] = change
+    return regressions
+
+
+def make_report(metrics):
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'metrics': metrics}
+
+
+def make_argument_parser():
+    parser = argparse.ArgumentParser(description='Benchmarks the Ahmes simulator on canonical programs.')
+    parser.add_argument('--minimum-time', type=float, default=default_minimum_time,
+                        help='the minimum number of seconds spent on each measurement')
+    parser.add_argument('--output', help='write the results to this file instead of the standard output')
+    parser.add_argument('--compare', help='a previous output to compare against')
+    parser.add_argument('--tolerance', type=float, default=default_tolerance,
+                        help='the relative slowdown that is not reported as a regression')
+    return parser
+
+
+def main(arguments=None):
+    options = make_argument_parser().parse_args(arguments)
+    report = make_report(run_benchmarks(options.minimum_time))
+    if options.compare is not None:
+        with open(options.compare) as open_file:
+            baseline = json.load(open_file)['metrics']
+        report['regressions'] = find_regressions(report['metrics'], baseline, options.tolerance)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if options.output is None:
+        print(text)
+    else:
+        with open(options.output, 'w') as open_file:
+            open_file.write(text + '\n')
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
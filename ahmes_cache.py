@@ -0,0 +1,150 @@
+#!/usr/bin/python
+
+import hashlib
+import os
+import struct
+import tempfile
+
+import ahmes
+
+# Changing how programs run or how entries are stored should change the version, so old entries are never read.
+cache_version = b'ahmes-result-cache-2'
+
+default_max_bytes = 64 * 1024 * 1024
+
+# Checking the size of the cache needs a scan of the directory, so it is only done after this many insertions.
+default_eviction_interval = 256
+
+counters_format = struct.Struct('<QQ')
+
+state_size = 260
+
+entry_size = state_size + counters_format.size
+
+
+def make_key(computer, max_steps):
+    """
+    Makes the key of a run: a hash of the initial state of the computer, its instruction index, and the step budget.
+    :param computer: an AhmesComputer
+    :param max_steps: the maximum number of instructions of the run, or None for no limit
+    :return: a str of hexadecimal digits
+    """
+    digest = hashlib.sha256(cache_version)
+    digest.update(computer.get_state())
+    digest.update(struct.pack('<??Q', computer.pedantic, max_steps is None, max_steps or 0))
+    return digest.hexdigest()
+
+
+class AhmesResultCache(object):
+    """
+    An on-disk cache of the outcomes of running programs, shared by every process that uses the same directory.
+
+    Each entry is a file named after its key that holds the final state and how much the counters grew. Entries are
+    written to a temporary file and then renamed, so readers never see partial entries. Reading an entry updates its
+    modification time, and when the cache grows past max_bytes the least recently used entries are removed.
+    """
+
+    def __init__(self, directory, max_bytes=default_max_bytes, eviction_interval=default_eviction_interval):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.eviction_interval = eviction_interval
+        self.insertions = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """
+        Reads an entry.
+        :param key: a key made by make_key
+        :return: the final state, the number of instructions executed, and the number of memory accesses, or None
+        """
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as open_file:
+                entry = open_file.read()
+        except OSError:
+            return None  # Missing, evicted by another process, or unreadable
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # A cache that cannot be written is still read
+        if len(entry) != entry_size:
+            return None
+        instructions, memory_accesses = counters_format.unpack(entry[state_size:])
+        return entry[:state_size], instructions, memory_accesses
+
+    def put(self, key, state, instructions, memory_accesses):
+        """
+        Writes an entry, replacing any entry with the same key.
+        """
+        path = self.get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as open_file:
+                open_file.write(state + counters_format.pack(instructions, memory_accesses))
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        self.insertions += 1
+        if self.insertions % self.eviction_interval == 0:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache uses at most 90% of max_bytes.
+        """
+        entries = []
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if not entry.name.startswith('.tmp-'):
+                        try:
+                            entries.append((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+                        except FileNotFoundError:
+                            pass  # Evicted by another process
+        total = sum(size for modified, size, path in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for modified, size, path in entries:
+            if total <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def run(self, computer, max_steps):
+        """
+        Runs a computer as computer.run would, but reads the outcome from the cache when it has it. Computers with
+        breakpoints, watchpoints, store observers, or an instrumented dispatch table bypass the cache, because a cached
+        outcome would skip what they observe. An entry that cannot be written is not fatal.
+        :param computer: an AhmesComputer
+        :param max_steps: the maximum number of instructions to execute, or None for no limit
+        :return: the number of instructions executed
+        """
+        if (computer.debugging or computer.store_observers or
+                computer.dispatch_table is not ahmes.ahmes_dispatch_tables[computer.pedantic]):
+            return computer.run(max_steps)
+        key = make_key(computer, max_steps)
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            state, instructions, memory_accesses = entry
+            computer.restore((state, computer.instructions + instructions, computer.memory_accesses + memory_accesses))
+            return instructions
+        self.misses += 1
+        memory_accesses = computer.memory_accesses
+        steps = computer.run(max_steps)
+        try:
+            self.put(key, computer.get_state(), steps, computer.memory_accesses - memory_accesses)
+        except OSError:
+            pass  # The outcome is still returned from a read-only or full cache
+        return steps
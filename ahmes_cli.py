@@ -0,0 +1,128 @@
+#!/usr/bin/python
+
+import argparse
+import json
+import sys
+
+import ahmes
+
+# The same budget as ahmes_runner, which is not imported until a subcommand needs it.
+default_max_steps = 1000000
+
+
+def load_computer(filename, pedantic):
+    """
+    Loads a memory file into a new AhmesComputer, exiting if the file cannot be read.
+    """
+    program = ahmes.AhmesProgram(filename)
+    if not program.initialized or len(program.get_bytes()) != 256:
+        sys.exit(str(program) if not program.initialized else 'The program should have exactly 256 bytes.')
+    computer = ahmes.AhmesComputer(pedantic=pedantic)
+    computer.load_program(program)
+    return computer
+
+
+def write_json(result):
+    sys.stdout.write(json.dumps(result, sort_keys=True))
+    sys.stdout.write('\n')
+
+
+def run_command(options):
+    import ahmes_runner
+
+    write_json(ahmes_runner.run_program_file(options.filename, options.max_steps, options.pedantic,
+                                             options.detect_loops, skip_non_halting=options.skip_non_halting))
+
+
+def batch_command(options):
+    import ahmes_runner
+
+    filenames = ahmes_runner.find_program_files(options.pattern)
+    results = ahmes_runner.run_program_files(filenames, options.max_steps, options.pedantic, options.workers,
+                                             options.chunk_size, options.detect_loops, options.cache,
+                                             options.skip_non_halting)
+    ahmes_runner.write_json_lines(results, sys.stdout)
+
+
+def trace_command(options):
+    import ahmes_runner
+    import ahmes_trace
+
+    computer = load_computer(options.filename, options.pedantic)
+    buffer_records = options.buffer_records or ahmes_trace.default_buffer_records
+    ahmes_trace.record_trace(computer, options.output, options.max_steps, buffer_records)
+    result = ahmes_runner.describe_computer(computer)
+    result.update({'filename': options.filename, 'trace': options.output})
+    write_json(result)
+
+
+def profile_command(options):
+    computer = load_computer(options.filename, options.pedantic)
+    if options.cycles:
+        import ahmes_cycles
+
+        profiler = ahmes_cycles.AhmesCycleCounter(computer)
+    else:
+        import ahmes_profiler
+
+        profiler = ahmes_profiler.AhmesProfiler(computer)
+    profiler.enable()
+    try:
+        computer.run(options.max_steps)
+    finally:
+        profiler.disable()
+    print(profiler.make_report(options.limit))
+
+
+def make_argument_parser():
+    # Every subcommand also accepts --pedantic and --no-pedantic after its own arguments, without overriding one given
+    # before it. Pedantic is the default, as in the Python API and the service.
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--pedantic', action=argparse.BooleanOptionalAction, default=argparse.SUPPRESS,
+                        help='map only the first code of each instruction (the default)')
+    common.add_argument('--max-steps', type=int, default=default_max_steps, help='the step budget of each program')
+    parser = argparse.ArgumentParser(description='Runs, traces, and profiles Ahmes memory files.')
+    parser.add_argument('--pedantic', action=argparse.BooleanOptionalAction, default=True,
+                        help='map only the first code of each instruction (the default)')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser('run', parents=[common], help='run a memory file and print its final state')
+    run_parser.add_argument('filename', help='a memory file')
+    run_parser.add_argument('--detect-loops', action='store_true', help='stop the program if it repeats a state')
+    run_parser.add_argument('--skip-non-halting', action='store_true',
+                            help='do not run the program if it can be proven to never halt')
+    run_parser.set_defaults(function=run_command)
+
+    batch_parser = subparsers.add_parser('batch', parents=[common], help='run many memory files in parallel')
+    batch_parser.add_argument('pattern', help='a directory of .mem files or a glob pattern')
+    batch_parser.add_argument('--workers', type=int, default=None, help='the number of worker processes')
+    batch_parser.add_argument('--chunk-size', type=int, default=None, help='the number of programs per task')
+    batch_parser.add_argument('--detect-loops', action='store_true', help='stop programs that repeat a state')
+    batch_parser.add_argument('--cache', default=None, help='a directory where the outcomes of runs are cached')
+    batch_parser.add_argument('--skip-non-halting', action='store_true',
+                              help='do not run programs that can be proven to never halt')
+    batch_parser.set_defaults(function=batch_command)
+
+    trace_parser = subparsers.add_parser('trace', parents=[common], help='run a memory file and record its trace')
+    trace_parser.add_argument('filename', help='a memory file')
+    trace_parser.add_argument('output', help='the file the trace is written to')
+    trace_parser.add_argument('--buffer-records', type=int, default=None,
+                              help='the number of records written at a time')
+    trace_parser.set_defaults(function=trace_command)
+
+    profile_parser = subparsers.add_parser('profile', parents=[common], help='run a memory file and print a profile')
+    profile_parser.add_argument('filename', help='a memory file')
+    profile_parser.add_argument('--cycles', action='store_true', help='count cycles instead of executions')
+    profile_parser.add_argument('--limit', type=int, default=10, help='the maximum number of lines in each section')
+    profile_parser.set_defaults(function=profile_command)
+    return parser
+
+
+def main(arguments=None):
+    options = make_argument_parser().parse_args(arguments)
+    options.function(options)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/python
+
+import ahmes
+import ahmes_analyzer
+import ahmes_profiler
+
+
+class AhmesCostModel(object):
+    """
+    The number of cycles each instruction takes: opcode_cycles to fetch the opcode, operand_cycles to fetch the
+    operand, and data_access_cycles to read or write a byte of data. The defaults give 3 cycles to single-byte
+    instructions, 5 to jumps, and 7 to instructions that access data. Mnemonics in overrides take the given number of
+    cycles instead.
+    """
+
+    def __init__(self, opcode_cycles=3, operand_cycles=2, data_access_cycles=2, overrides=None):
+        self.opcode_cycles = opcode_cycles
+        self.operand_cycles = operand_cycles
+        self.data_access_cycles = data_access_cycles
+        self.overrides = dict(overrides or {})
+
+    def get_cycles(self, instruction):
+        """
+        Returns the number of cycles of an instruction.
+        :param instruction: an AhmesInstruction
+        :return: an int
+        """
+        if instruction.mnemonic in self.overrides:
+            return self.overrides[instruction.mnemonic]
+        cycles = self.opcode_cycles
+        if instruction.size == 2:
+            cycles += self.operand_cycles
+        if instruction.mnemonic in ahmes_analyzer.data_access_mnemonics:
+            cycles += self.data_access_cycles
+        return cycles
+
+
+class AhmesCycleCounter(ahmes.AhmesInstrument):
+    """
+    Counts the cycles an AhmesComputer spends at each address under a cost model, and records the jumps it takes, so
+    that the cycles can be reported per mnemonic, per basic block, and per loop.
+
+    Basic blocks and loops are found from the execution: a block starts at the first executed instruction, at a jump
+    target, after a jump, or where no executed instruction falls through, and every backward jump that was taken closes
+    a loop made of the executed blocks that reach the jump without passing through its target, unless the program
+    can also reach the jump from where it started without passing through the target.
+    """
+
+    def __init__(self, computer, cost_model=None):
+        super(AhmesCycleCounter, self).__init__(computer)
+        self.cost_model = cost_model or AhmesCostModel()
+        self.instruction_index = ahmes.get_ahmes_instruction_index(computer.pedantic)
+        self.mnemonics = sorted({instruction.mnemonic for instruction in self.instruction_index})
+        self.cycles = ahmes_profiler.make_counter_array()
+        self.mnemonic_cycles = ahmes_profiler.make_counter_array(len(self.mnemonics))
+        self.sizes = bytearray(256)  # The size of the last instruction executed at each address, or 0
+        self.ends_block = bytearray(256)
+        self.leaders = bytearray(256)
+        self.back_edges = set()
+        self.jump_edges = set()  # The (jump, next address) pairs that were executed
+        self.entries = set()  # The addresses where execution started
+
+    def make_entry(self, code, instruction, function):
+        """
+        Wraps the function of an instruction so that it adds its cycles and records the jumps it takes.
+        """
+        size = instruction.size
+        cost = self.cost_model.get_cycles(instruction)
+        mnemonic_index = self.mnemonics.index(instruction.mnemonic)
+        cycles = self.cycles
+        mnemonic_cycles = self.mnemonic_cycles
+        sizes = self.sizes
+        ends_block = self.ends_block
+        leaders = self.leaders
+        back_edges = self.back_edges
+        jump_edges = self.jump_edges
+        predicate = getattr(instruction, 'predicate', None)
+        ends = 1 if predicate is not None or instruction.mnemonic == 'HLT' else 0
+
+        def counted_function(ahmes_computer, operand):
+            pc = (ahmes_computer.pc - size) & 0xFF
+            cycles[pc] += cost
+            mnemonic_cycles[mnemonic_index] += cost
+            sizes[pc] = size
+            ends_block[pc] = ends
+            if predicate is None:
+                function(ahmes_computer, operand)
+                return
+            following = (pc + size) & 0xFF
+            leaders[following] = 1
+            if predicate(ahmes_computer.flags):
+                leaders[operand] = 1
+                jump_edges.add((pc, operand))
+                if operand <= pc:
+                    back_edges.add((operand, pc))
+            else:
+                jump_edges.add((pc, following))
+            function(ahmes_computer, operand)
+
+        return counted_function
+
+    def enable(self):
+        self.leaders[self.computer.pc] = 1
+        self.entries.add(self.computer.pc)
+        super(AhmesCycleCounter, self).enable()
+
+    @property
+    def total_cycles(self):
+        return sum(self.cycles)
+
+    def find_basic_blocks(self):
+        """
+        Finds the basic blocks that were executed.
+        :return: a list of (start, addresses) pairs sorted by start, where addresses are those of the instructions
+        """
+        sizes = self.sizes
+        falls_through = bytearray(256)
+        for address in range(256):
+            if sizes[address] and not self.ends_block[address]:
+                falls_through[(address + sizes[address]) & 0xFF] = 1
+        blocks = []
+        for start in range(256):
+            if not sizes[start] or (falls_through[start] and not self.leaders[start]):
+                continue
+            addresses = [start]
+            while not self.ends_block[addresses[-1]] and len(addresses) < 256:
+                following = (addresses[-1] + sizes[addresses[-1]]) & 0xFF
+                if not sizes[following] or self.leaders[following]:
+                    break
+                addresses.append(following)
+            blocks.append((start, addresses))
+        return blocks
+
+    def find_loop_blocks(self, blocks, header, latch):
+        """
+        Finds the executed blocks of the loop closed by a backward jump: the header block and every block that reaches
+        the latch without passing through the header.
+        :param blocks: the result of find_basic_blocks
+        :param header: the address of the jump target
+        :param latch: the address of the backward jump
+        :return: a set of block starts, or None if the header does not dominate the latch
+        """
+        block_starts = {}
+        for start, addresses in blocks:
+            for address in addresses:
+                block_starts[address] = start
+        predecessors = {start: set() for start, addresses in blocks}
+        for start, addresses in blocks:
+            end = addresses[-1]
+            if self.ends_block[end]:
+                successors = [target for jump, target in self.jump_edges if jump == end]
+            else:
+                successors = [(end + self.sizes[end]) & 0xFF]
+            for successor in successors:
+                if successor in predecessors:
+                    predecessors[successor].add(start)
+        loop = {header}
+        pending = [block_starts[latch]]
+        while pending:
+            start = pending.pop()
+            if start not in loop:
+                if start in self.entries:
+                    return None
+                loop.add(start)
+                pending.extend(predecessors[start])
+        return loop
+
+    def as_dict(self):
+        """
+        Returns the total cycles and their distribution per mnemonic, per basic block, and per loop. Loops are keyed
+        by a (header, latch) pair, the addresses of the jump target and of the backward jump.
+        """
+        total = self.total_cycles
+
+        def share(cycles):
+            return cycles / total if total else 0.0
+
+        basic_blocks = self.find_basic_blocks()
+        blocks = {}
+        for start, addresses in basic_blocks:
+            cycles = sum(self.cycles[address] for address in addresses)
+            blocks[start] = {'end': addresses[-1], 'cycles': cycles, 'share': share(cycles)}
+        loops = {}
+        for header, latch in sorted(self.back_edges):
+            loop = self.find_loop_blocks(basic_blocks, header, latch)
+            if loop is None:
+                continue
+            cycles = sum(blocks[start]['cycles'] for start in loop)
+            loops[(header, latch)] = {'cycles': cycles, 'share': share(cycles)}
+        return {'cycles': total,
+                'mnemonics': {mnemonic: self.mnemonic_cycles[i] for i, mnemonic in enumerate(self.mnemonics)
+                              if self.mnemonic_cycles[i]},
+                'blocks': blocks,
+                'loops': loops}
+
+    def make_report(self, limit=10):
+        """
+        Makes a text report with the total cycles and the mnemonics, basic blocks, and loops that took the most.
+        :param limit: the maximum number of lines in each section
+        :return: a str
+        """
+        report = self.as_dict()
+        sections = ['Cycles\n' + ahmes.make_string_of_key_value_lines(['Total'], [report['cycles']])]
+        mnemonics = report['mnemonics']
+        keys = sorted(mnemonics, key=lambda key: -mnemonics[key])[:limit]
+        sections.append('Mnemonics\n' + ahmes.make_string_of_key_value_lines(keys, [mnemonics[key] for key in keys]))
+        for title, entries in (('Blocks', report['blocks']), ('Loops', report['loops'])):
+            keys = sorted(entries, key=lambda key: -entries[key]['cycles'])[:limit]
+            names = ['{0}-{1}'.format(*key) if isinstance(key, tuple) else '{0}-{1}'.format(key, entries[key]['end'])
+                     for key in keys]
+            values = ['{0} ({1:.1%})'.format(entries[key]['cycles'], entries[key]['share']) for key in keys]
+            sections.append(title + '\n' + ahmes.make_string_of_key_value_lines(names, values))
+        return '\n\n'.join(sections)
+
+    def __str__(self):
+        return self.make_report()
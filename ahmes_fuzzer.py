@@ -0,0 +1,320 @@
+#!/usr/bin/python
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import random
+import sys
+import time
+
+import ahmes
+import ahmes_analyzer
+
+default_max_steps = 10000
+
+# The coverage of a run is a byte per address that was executed followed by a byte per direction of each conditional
+# jump: the byte at 256 + 2 * address + 1 when the jump at address was taken and 256 + 2 * address when it was not.
+coverage_size = 768
+
+# The values that most often reach the edges of comparisons and arithmetic.
+interesting_values = (0, 1, 2, 0x7F, 0x80, 0x81, 0xFE, 0xFF)
+
+AhmesFuzzResult = collections.namedtuple('AhmesFuzzResult', ['inputs', 'coverage', 'state', 'crash'])
+
+# A crash is a run that hit the step budget without halting (kind 'step_limit') or that halted in a state rejected by
+# the check function (kind 'assertion'), keyed by the kind, the final PC, and the message of the check.
+AhmesCrash = collections.namedtuple('AhmesCrash', ['kind', 'pc', 'message', 'inputs'])
+
+
+def parse_addresses(text):
+    """
+    Parses a list of addresses such as '128-131,140'.
+    :return: a list of ints
+    """
+    addresses = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        addresses.extend(range(int(first, 0), int(last or first, 0) + 1))
+    for address in addresses:
+        assert 0 <= address <= 255, 'addresses should be valid byte values'
+    return addresses
+
+
+class AhmesCoverageRecorder(ahmes.AhmesInstrument):
+    """
+    Marks the addresses an AhmesComputer executes and the directions of its conditional jumps in a coverage bytearray.
+    """
+
+    def __init__(self, computer, coverage):
+        super(AhmesCoverageRecorder, self).__init__(computer)
+        self.coverage = coverage
+
+    def make_entry(self, code, instruction, function):
+        size = instruction.size
+        coverage = self.coverage
+        predicate = getattr(instruction, 'predicate', None) if instruction.mnemonic != 'JMP' else None
+
+        if predicate is None:
+            def covered_function(ahmes_computer, operand):
+                coverage[(ahmes_computer.pc - size) & 0xFF] = 1
+                function(ahmes_computer, operand)
+        else:
+            def covered_function(ahmes_computer, operand):
+                pc = (ahmes_computer.pc - size) & 0xFF
+                coverage[pc] = 1
+                coverage[256 + 2 * pc + (1 if predicate(ahmes_computer.flags) else 0)] = 1
+                function(ahmes_computer, operand)
+
+        return covered_function
+
+
+class AhmesFuzzer(object):
+    """
+    A coverage-guided fuzzer of the input bytes of an Ahmes memory image.
+
+    Every execution restores a snapshot taken just before the program first touches an input byte, writes mutated
+    inputs into it, and runs the rest of the program under an instrumented dispatch table that marks the executed
+    addresses and the directions of the conditional jumps. Inputs that mark anything new, or that halt in a final state
+    not seen before, are added to the corpus, which is what later inputs are mutated from. Input bytes are left out of
+    final states, so only what the program computes from them is compared. Only executions of mutated inputs are
+    counted in executions; seeds and corpora replayed with add_input are not.
+    """
+
+    def __init__(self, memory, input_addresses, max_steps=default_max_steps, pedantic=True, check=None, seed=None,
+                 track_states=True):
+        """
+        Constructs a new AhmesFuzzer.
+        :param memory: a list of 256 bytes
+        :param input_addresses: the addresses of the input bytes
+        :param max_steps: the step budget of each execution, including the steps before the snapshot
+        :param pedantic: which instruction index the computer should use
+        :param check: a function that takes a halted AhmesComputer and returns None or a message describing what is
+        wrong with its state, which must be picklable to be used by fuzz_in_workers
+        :param seed: the seed of the mutations
+        :param track_states: whether new final states count as new coverage
+        """
+        assert len(memory) == 256, 'memory should have 256 bytes'
+        assert input_addresses, 'there should be at least one input address'
+        self.memory = bytes(memory)
+        self.input_addresses = list(input_addresses)
+        self.max_steps = max_steps
+        self.check = check
+        self.track_states = track_states
+        self.random = random.Random(seed)
+        self.computer = ahmes.AhmesComputer(pedantic=pedantic)
+        self.computer.load_program(ahmes.AhmesProgram.from_bytes(self.memory))
+        self.fork_steps = ahmes_analyzer.run_until_access(self.computer, set(self.input_addresses), max_steps)
+        self.fork = self.computer.snapshot()
+        self.run_coverage = bytearray(coverage_size)
+        self.coverage_recorder = AhmesCoverageRecorder(self.computer, self.run_coverage)
+        self.coverage = bytearray(coverage_size)
+        self.coverage_bits = 0
+        self.states = set()
+        self.corpus = []
+        self.crashes = {}
+        self.executions = 0
+        self.elapsed = 0.0
+        self.add_input(bytes(self.memory[address] for address in self.input_addresses))
+
+    def execute(self, inputs):
+        """
+        Runs the program from the snapshot with the specified inputs.
+        :param inputs: a bytes object with a value per input address
+        :return: an AhmesFuzzResult
+        """
+        assert len(inputs) == len(self.input_addresses), 'there should be a value per input address'
+        computer = self.computer
+        computer.restore(self.fork)
+        memory = computer.bytes
+        for address, value in zip(self.input_addresses, inputs):
+            memory[address] = value
+        coverage = self.run_coverage
+        coverage[:] = bytes(coverage_size)
+        self.coverage_recorder.enable()
+        try:
+            computer.run(self.max_steps - self.fork_steps)
+        finally:
+            self.coverage_recorder.disable()
+        state = bytearray(computer.get_state())
+        for address in self.input_addresses:
+            state[address] = 0
+        crash = None
+        if not computer.halted:
+            crash = AhmesCrash('step_limit', computer.pc, None, inputs)
+        elif self.check is not None:
+            message = self.check(computer)
+            if message is not None:
+                crash = AhmesCrash('assertion', computer.pc, message, inputs)
+        return AhmesFuzzResult(inputs, bytes(coverage), bytes(state), crash)
+
+    def update(self, result):
+        """
+        Adds the inputs of a result to the corpus if they found new coverage, and records a crash not seen before.
+        :param result: an AhmesFuzzResult
+        :return: whether the result found new coverage
+        """
+        bits = int.from_bytes(result.coverage, 'little')
+        new_coverage = bits & ~self.coverage_bits != 0
+        if new_coverage:
+            self.coverage_bits |= bits
+            self.coverage = bytearray(self.coverage_bits.to_bytes(coverage_size, 'little'))
+        if self.track_states and result.crash is None and result.state not in self.states:
+            self.states.add(result.state)
+            new_coverage = True
+        if new_coverage:
+            self.corpus.append(result.inputs)
+        if result.crash is not None:
+            key = result.crash[:3]
+            if key not in self.crashes:
+                self.crashes[key] = result.crash
+        return new_coverage
+
+    def add_input(self, inputs):
+        """
+        Executes inputs chosen by hand, such as seeds or the corpus of another fuzzer.
+        :param inputs: a bytes object with a value per input address
+        :return: whether the inputs found new coverage
+        """
+        return self.update(self.execute(bytes(inputs)))
+
+    def mutate(self, inputs):
+        """
+        Applies one to four random mutations to inputs: setting a byte to a random or interesting value, flipping a
+        bit, adding a small number, or copying a byte from another input of the corpus.
+        :param inputs: a bytes object
+        :return: a new bytes object
+        """
+        generator = self.random
+        mutated = bytearray(inputs)
+        for i in range(generator.randint(1, 4)):
+            position = generator.randrange(len(mutated))
+            strategy = generator.randrange(5)
+            if strategy == 0:
+                mutated[position] = generator.randrange(256)
+            elif strategy == 1:
+                mutated[position] ^= 1 << generator.randrange(8)
+            elif strategy == 2:
+                mutated[position] = (mutated[position] + generator.choice((-8, -4, -2, -1, 1, 2, 4, 8))) & 0xFF
+            elif strategy == 3:
+                mutated[position] = generator.choice(interesting_values)
+            else:
+                mutated[position] = generator.choice(self.corpus)[position]
+        return bytes(mutated)
+
+    def fuzz(self, executions):
+        """
+        Mutates inputs of the corpus and executes them.
+        :param executions: the number of executions
+        :return: the number of inputs that found new coverage
+        """
+        start = time.perf_counter()
+        found = 0
+        for i in range(executions):
+            if self.update(self.execute(self.mutate(self.random.choice(self.corpus)))):
+                found += 1
+            self.executions += 1
+        self.elapsed += time.perf_counter() - start
+        return found
+
+    @property
+    def covered_addresses(self):
+        return [address for address in range(256) if self.coverage[address]]
+
+    @property
+    def covered_branches(self):
+        """
+        Returns the conditional jumps and directions that were covered as (address, taken) pairs.
+        """
+        return [((i - 256) // 2, i % 2 == 1) for i in range(256, coverage_size) if self.coverage[i]]
+
+    def as_dict(self):
+        executions_per_second = self.executions / self.elapsed if self.elapsed else 0.0
+        return {'executions': self.executions,
+                'executions_per_second': executions_per_second,
+                'fork_steps': self.fork_steps,
+                'corpus': [list(inputs) for inputs in self.corpus],
+                'addresses': self.covered_addresses,
+                'branches': self.covered_branches,
+                'states': len(self.states),
+                'crashes': [{'kind': crash.kind, 'pc': crash.pc, 'message': crash.message, 'inputs': list(crash.inputs)}
+                            for crash in self.crashes.values()]}
+
+
+def fuzz_round(memory, input_addresses, corpus, executions, max_steps, pedantic, check, seed, track_states):
+    """
+    Runs a fuzzer in a worker process, starting from a corpus.
+    :return: a pair with the corpus and the list of crashes of the fuzzer
+    """
+    fuzzer = AhmesFuzzer(memory, input_addresses, max_steps, pedantic, check, seed, track_states)
+    for inputs in corpus:
+        fuzzer.add_input(inputs)
+    fuzzer.fuzz(executions)
+    return fuzzer.corpus, list(fuzzer.crashes.values()), fuzzer.executions
+
+
+def fuzz_in_workers(memory, input_addresses, executions, workers=None, rounds=4, max_steps=default_max_steps,
+                    pedantic=True, check=None, seed=0, track_states=True):
+    """
+    Fuzzes a memory image on a process pool. Each round, every worker mutates the corpus found so far with its own
+    seed, and the corpora and crashes of the workers are merged into the fuzzer that is returned.
+    :param executions: the total number of executions of mutated inputs
+    :param workers: the number of worker processes, or None to use every core
+    :param rounds: the number of times the corpora of the workers are merged
+    :return: an AhmesFuzzer with the merged corpus, coverage, and crashes
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    fuzzer = AhmesFuzzer(memory, input_addresses, max_steps, pedantic, check, seed, track_states)
+    executions_per_task = max(1, executions // (rounds * workers))
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for round_index in range(rounds):
+            futures = [executor.submit(fuzz_round, fuzzer.memory, fuzzer.input_addresses, fuzzer.corpus,
+                                       executions_per_task, max_steps, pedantic, check,
+                                       '{0}-{1}-{2}'.format(seed, round_index, worker), track_states)
+                       for worker in range(workers)]
+            for future in concurrent.futures.as_completed(futures):
+                corpus, crashes, worker_executions = future.result()
+                for inputs in corpus:
+                    fuzzer.add_input(inputs)
+                for crash in crashes:
+                    fuzzer.crashes.setdefault(crash[:3], crash)
+                fuzzer.executions += worker_executions
+    fuzzer.elapsed = time.perf_counter() - start
+    return fuzzer
+
+
+def make_argument_parser():
+    parser = argparse.ArgumentParser(description='Fuzzes the input bytes of an Ahmes memory file.')
+    parser.add_argument('filename', help='a memory file')
+    parser.add_argument('inputs', help='the input addresses, such as 128-131,140')
+    parser.add_argument('--executions', type=int, default=10000, help='the number of executions')
+    parser.add_argument('--max-steps', type=int, default=default_max_steps, help='the step budget of each run')
+    parser.add_argument('--pedantic', action=argparse.BooleanOptionalAction, default=True,
+                        help='map only the first code of each instruction (the default)')
+    parser.add_argument('--workers', type=int, default=1, help='the number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the mutations')
+    return parser
+
+
+def main(arguments=None):
+    options = make_argument_parser().parse_args(arguments)
+    program = ahmes.AhmesProgram(options.filename)
+    if not program.initialized:
+        sys.exit('Failed to initialize the program.')
+    input_addresses = parse_addresses(options.inputs)
+    if options.workers > 1:
+        fuzzer = fuzz_in_workers(program.get_bytes(), input_addresses, options.executions, options.workers,
+                                 max_steps=options.max_steps, pedantic=options.pedantic, seed=options.seed)
+    else:
+        fuzzer = AhmesFuzzer(program.get_bytes(), input_addresses, options.max_steps, options.pedantic,
+                             seed=options.seed)
+        fuzzer.fuzz(options.executions)
+    json.dump(fuzzer.as_dict(), sys.stdout, sort_keys=True)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+import array
+
+default_checkpoint_interval = 4096
+
+
+class AhmesJournal(object):
+    """
+    Executes an AhmesComputer while recording what each instruction changed, so that execution can run backwards.
+
+    For every instruction the journal keeps the old PC, AC, and flags, the number of memory accesses it made, and the
+    address and old value of the byte it stored, if any. A snapshot of the computer is also taken every
+    checkpoint_interval instructions, so going back further than that restores a checkpoint and runs forward instead
+    of undoing every instruction.
+    """
+
+    def __init__(self, computer, checkpoint_interval=default_checkpoint_interval):
+        assert checkpoint_interval > 0, 'checkpoint_interval should be positive'
+        self.computer = computer
+        self.checkpoint_interval = checkpoint_interval
+        self.pcs = array.array('B')
+        self.acs = array.array('B')
+        self.flags = array.array('B')
+        self.memory_accesses = array.array('B')
+        self.store_addresses = array.array('h')  # -1 when the instruction did not store a byte
+        self.store_values = array.array('B')
+        self.checkpoints = {0: computer.snapshot()}
+        self.store_address = -1
+        self.store_value = 0
+        computer.store_observers.append(self.record_store)
+
+    def __len__(self):
+        return len(self.pcs)
+
+    def record_store(self, address, old_value, value):
+        self.store_address = address
+        self.store_value = old_value
+
+    def step(self, count=1):
+        """
+        Executes up to count instructions, recording each one of them.
+        :param count: the maximum number of instructions to execute
+        :return: the number of instructions executed
+        """
+        computer = self.computer
+        steps = 0
+        while steps < count and not computer.halted:
+            pc, ac, flags, memory_accesses = computer.pc, computer.ac, computer.flags, computer.memory_accesses
+            self.store_address = -1
+            self.store_value = 0
+            computer.run(1)
+            self.pcs.append(pc)
+            self.acs.append(ac)
+            self.flags.append(flags)
+            self.memory_accesses.append(computer.memory_accesses - memory_accesses)
+            self.store_addresses.append(self.store_address)
+            self.store_values.append(self.store_value)
+            steps += 1
+            if len(self) % self.checkpoint_interval == 0:
+                self.checkpoints[len(self)] = computer.snapshot()
+        return steps
+
+    def undo(self, index):
+        computer = self.computer
+        if self.store_addresses[index] >= 0:
+            computer.set_byte(self.store_addresses[index], self.store_values[index])
+        computer.pc = self.pcs[index]
+        computer.ac = self.acs[index]
+        computer.flags = self.flags[index]
+        computer.memory_accesses -= self.memory_accesses[index]
+        computer.instructions -= 1
+        computer.halted = False
+
+    def truncate(self, length):
+        for journal_array in (self.pcs, self.acs, self.flags, self.memory_accesses, self.store_addresses,
+                              self.store_values):
+            del journal_array[length:]
+        for checkpoint in [checkpoint for checkpoint in self.checkpoints if checkpoint > length]:
+            del self.checkpoints[checkpoint]
+
+    def step_back(self, count=1):
+        """
+        Undoes up to count of the recorded instructions, most recent first.
+        :param count: the maximum number of instructions to undo
+        :return: the number of instructions undone
+        """
+        count = min(count, len(self))
+        target = len(self) - count
+        if count > self.checkpoint_interval:
+            checkpoint = target - target % self.checkpoint_interval
+            self.computer.restore(self.checkpoints[checkpoint])
+            self.computer.run_uninterrupted(target - checkpoint)
+        else:
+            for index in range(len(self) - 1, target - 1, -1):
+                self.undo(index)
+        self.truncate(target)
+        return count
+
+    def run_back_to(self, pc):
+        """
+        Goes back to the most recent recorded point at which PC had the specified value.
+        :param pc: a valid byte value
+        :return: the number of instructions undone, or None if PC never had that value, in which case nothing changes
+        """
+        for index in range(len(self) - 1, -1, -1):
+            if self.pcs[index] == pc:
+                return self.step_back(len(self) - index)
+        return None
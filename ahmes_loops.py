@@ -0,0 +1,126 @@
+#!/usr/bin/python
+
+import random
+
+# A fixed seed makes the hashes of the same state equal across processes.
+zobrist_seed = 0x41484D
+
+zobrist_keys = {}
+
+# The number of instructions run between two states compared by the detector.
+default_chunk_steps = 64
+
+
+def get_zobrist_keys():
+    """
+    Returns the random keys of the Zobrist hash of Ahmes states, generating them on the first call.
+    :return: a dict with the keys of memory (indexed by (address << 8) | value), AC, PC, and the packed flags
+    """
+    if not zobrist_keys:
+        generator = random.Random(zobrist_seed)
+        zobrist_keys['memory'] = [generator.getrandbits(64) for i in range(65536)]
+        zobrist_keys['ac'] = [generator.getrandbits(64) for i in range(256)]
+        zobrist_keys['pc'] = [generator.getrandbits(64) for i in range(256)]
+        zobrist_keys['flags'] = [generator.getrandbits(64) for i in range(32)]
+    return zobrist_keys
+
+
+class AhmesLoopDetector(object):
+    """
+    Detects that an AhmesComputer is in an infinite loop by finding a repeated state.
+
+    The computer runs in chunks of chunk_steps instructions, and Brent's algorithm looks for a repeated hash among the
+    states at the ends of the chunks while keeping a single saved hash, so the memory used does not grow with the
+    number of steps. When a hash repeats, the computer runs one instruction at a time until its state repeats exactly,
+    for at most as many instructions as separate the two hashes, so hash collisions never produce a false report and
+    the period found is the smallest one. While run is active, the hash of the memory is updated by every store_byte;
+    memory written without store_byte is not observed.
+    """
+
+    def __init__(self, computer, chunk_steps=default_chunk_steps):
+        assert chunk_steps > 0, 'chunk_steps should be positive'
+        self.computer = computer
+        self.chunk_steps = chunk_steps
+        self.keys = get_zobrist_keys()
+        self.memory_hash = 0
+        self.period = None
+        self.rehash_memory()
+
+    def rehash_memory(self):
+        memory_keys = self.keys['memory']
+        self.memory_hash = 0
+        for address, value in enumerate(self.computer.bytes):
+            self.memory_hash ^= memory_keys[address << 8 | value]
+
+    def update_memory_hash(self, address, old_value, value):
+        memory_keys = self.keys['memory']
+        self.memory_hash ^= memory_keys[address << 8 | old_value] ^ memory_keys[address << 8 | value]
+
+    def get_state_hash(self):
+        computer = self.computer
+        return (self.memory_hash ^ self.keys['ac'][computer.ac] ^ self.keys['pc'][computer.pc] ^
+                self.keys['flags'][computer.flags])
+
+    def find_period(self, max_period):
+        """
+        Runs the computer one instruction at a time until it returns to its current state.
+        :param max_period: the maximum number of instructions to execute
+        :return: the period, or None if the state did not repeat, and the number of steps executed
+        """
+        computer = self.computer
+        state = computer.get_state()
+        state_hash = self.get_state_hash()
+        steps = 0
+        while steps < max_period and not computer.halted:
+            steps += computer.run(1)
+            if self.get_state_hash() == state_hash and computer.get_state() == state:
+                return steps, steps
+        return None, steps
+
+    def run(self, max_steps=None):
+        """
+        Runs the computer until it halts, max_steps instructions have been executed, or a loop is found.
+
+        After a loop is found, period holds the number of instructions in it.
+        :param max_steps: the maximum number of instructions to execute, or None for no limit
+        :return: the number of instructions executed
+        """
+        computer = self.computer
+        self.rehash_memory()
+        computer.store_observers.append(self.update_memory_hash)
+        try:
+            return self.find_loop(max_steps)
+        finally:
+            computer.store_observers.remove(self.update_memory_hash)
+
+    def find_loop(self, max_steps):
+        computer = self.computer
+        steps = 0
+        saved_hash = self.get_state_hash()
+        saved_steps = 0
+        power = 1
+        samples = 0
+        while self.period is None and not computer.halted and steps != max_steps:
+            steps += computer.run(self.chunk_steps if max_steps is None else min(self.chunk_steps, max_steps - steps))
+            state_hash = self.get_state_hash()
+            if state_hash == saved_hash:
+                # Both states are in the loop, so the current one repeats within steps - saved_steps instructions.
+                max_period = steps - saved_steps if max_steps is None else min(steps - saved_steps, max_steps - steps)
+                period, verification_steps = self.find_period(max_period)
+                steps += verification_steps
+                self.period = period
+                state_hash = self.get_state_hash()
+                samples = power
+            else:
+                samples += 1
+            if samples == power:
+                saved_hash = state_hash
+                saved_steps = steps
+                power *= 2
+                samples = 0
+        return steps
+
+    def __str__(self):
+        if self.period is None:
+            return 'not looping'
+        return 'looping, period {0}'.format(self.period)
@@ -31,6 +31,138 @@ def rotate_left(value):
     assert_is_a_valid_byte_value(value)
     return (value << 1) & 0xFF | ((value & 0x80) >> 7)
 
+
 def rotate_right(value):
     assert_is_a_valid_byte_value(value)
-    return (value >> 1) | ((value & 0x01) << 7)
\ No newline at end of file
+    return (value >> 1) | ((value & 0x01) << 7)
+
+
+# The indicators are packed into a single int, from the most significant bit to the least significant one: NZVCB.
+flag_n = 0x10
+flag_z = 0x08
+flag_v = 0x04
+flag_c = 0x02
+flag_b = 0x01
+
+# The name of the indicator of each flag.
+flag_names = {flag_n: 'n', flag_z: 'z', flag_v: 'v', flag_c: 'c', flag_b: 'b'}
+
+
+def make_nz_flags(value):
+    """
+    Returns the packed N and Z indicators for a byte value.
+    :param value: a valid byte value
+    """
+    return (flag_n if value & 0x80 else 0) | (flag_z if value == 0 else 0)
+
+
+nz_flag_mask = flag_n | flag_z
+
+# The packed N and Z indicators of every byte value.
+nz_flags = bytes(make_nz_flags(value) for value in range(256))
+
+
+def add_with_flags(a, b):
+    """
+    Adds two bytes as the Ahmes computer does.
+    :param a: a valid byte value
+    :param b: a valid byte value
+    :return: the resulting byte and its packed N, Z, V, and C indicators
+    """
+    total = a + b
+    result = total & 0xFF
+    flags = make_nz_flags(result)
+    if (a ^ result) & (b ^ result) & 0x80:
+        flags |= flag_v
+    if total > 0xFF:
+        flags |= flag_c
+    return result, flags
+
+
+def subtract_with_flags(a, b):
+    """
+    Subtracts the second byte from the first as the Ahmes computer does.
+    :param a: a valid byte value
+    :param b: a valid byte value
+    :return: the resulting byte and its packed N, Z, V, and B indicators
+    """
+    result = (a - b) & 0xFF
+    flags = make_nz_flags(result)
+    if (a ^ b) & (a ^ result) & 0x80:
+        flags |= flag_v
+    if b > a:
+        flags |= flag_b
+    return result, flags
+
+
+def and_with_flags(a, b):
+    return a & b, make_nz_flags(a & b)
+
+
+def or_with_flags(a, b):
+    return a | b, make_nz_flags(a | b)
+
+
+def not_with_flags(value):
+    return value ^ 0xFF, make_nz_flags(value ^ 0xFF)
+
+
+def shift_right_with_flags(value):
+    result = shift_right(value)
+    return result, make_nz_flags(result) | (flag_c if value & 0x01 else 0)
+
+
+def shift_left_with_flags(value):
+    result = shift_left(value)
+    return result, make_nz_flags(result) | (flag_c if value & 0x80 else 0)
+
+
+def rotate_right_with_flags(value):
+    result = rotate_right(value)
+    return result, make_nz_flags(result) | (flag_c if value & 0x01 else 0)
+
+
+def rotate_left_with_flags(value):
+    result = rotate_left(value)
+    return result, make_nz_flags(result) | (flag_c if value & 0x80 else 0)
+
+
+# Binary tables are indexed by (AC << 8) | operand and unary tables are indexed by AC.
+alu_operations = {'ADD': add_with_flags,
+                  'SUB': subtract_with_flags,
+                  'AND': and_with_flags,
+                  'OR': or_with_flags,
+                  'NOT': not_with_flags,
+                  'SHR': shift_right_with_flags,
+                  'SHL': shift_left_with_flags,
+                  'ROR': rotate_right_with_flags,
+                  'ROL': rotate_left_with_flags}
+
+# The indicators each operation changes. All the others are left untouched.
+alu_flag_masks = {'ADD': flag_n | flag_z | flag_v | flag_c,
+                  'SUB': flag_n | flag_z | flag_v | flag_b,
+                  'AND': flag_n | flag_z,
+                  'OR': flag_n | flag_z,
+                  'NOT': flag_n | flag_z,
+                  'SHR': flag_n | flag_z | flag_c,
+                  'SHL': flag_n | flag_z | flag_c,
+                  'ROR': flag_n | flag_z | flag_c,
+                  'ROL': flag_n | flag_z | flag_c}
+
+alu_tables = {}
+
+
+def get_alu_table(mnemonic):
+    """
+    Returns the lookup table of an ALU operation, building it on the first call.
+    :param mnemonic: one of the keys of alu_operations
+    :return: a pair of bytes objects with the results and the packed indicators of every input
+    """
+    if mnemonic not in alu_tables:
+        operation = alu_operations[mnemonic]
+        if mnemonic in ('ADD', 'SUB', 'AND', 'OR'):
+            outputs = [operation(a, b) for a in range(256) for b in range(256)]
+        else:
+            outputs = [operation(value) for value in range(256)]
+        alu_tables[mnemonic] = (bytes(output[0] for output in outputs), bytes(output[1] for output in outputs))
+    return alu_tables[mnemonic]
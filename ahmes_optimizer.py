@@ -0,0 +1,371 @@
+#!/usr/bin/python
+
+import ahmes
+import ahmes_analyzer
+import ahmes_math
+import ahmes_runner
+
+# The indicators that are not derived from AC. N and Z always describe AC, because every instruction that changes AC
+# also sets them, so only these need to be tracked to know whether removing an instruction changes the indicators.
+carried_flags = ahmes_math.flag_v | ahmes_math.flag_c | ahmes_math.flag_b
+
+
+def find_live_flags(reachable):
+    """
+    Finds which carried indicators may still be read after each instruction. HLT reads every indicator, because the
+    indicators are part of the final state.
+    :param reachable: a dict as returned by ahmes_analyzer.find_reachable_instructions
+    :return: a dict from addresses to the packed indicators that are live after the instruction at each address
+    """
+    uses = {}
+    kills = {}
+    for address, (instruction, operand) in reachable.items():
+        condition = ahmes_analyzer.jump_conditions.get(instruction.mnemonic)
+        if instruction.mnemonic == 'HLT':
+            uses[address] = carried_flags
+        else:
+            uses[address] = condition[0] & carried_flags if condition else 0
+        kills[address] = ahmes_math.alu_flag_masks.get(instruction.mnemonic, 0) & carried_flags
+    live_in = dict.fromkeys(reachable, 0)
+    live_out = dict.fromkeys(reachable, 0)
+    changed = True
+    while changed:
+        changed = False
+        for address, (instruction, operand) in reachable.items():
+            out = 0
+            for successor in ahmes_analyzer.get_successors(address, instruction, operand):
+                out |= live_in[successor]
+            live_out[address] = out
+            value = uses[address] | (out & ~kills[address])
+            if value != live_in[address]:
+                live_in[address] = value
+                changed = True
+    return live_out
+
+
+class AhmesCodeLine(object):
+    def __init__(self, address, code, instruction, operand):
+        """
+        Constructs a new AhmesCodeLine, an instruction that the optimizer may change or move.
+        :param address: the address of the instruction in the original program
+        :param code: the byte that selects the instruction
+        :param instruction: an AhmesInstruction
+        :param operand: the operand of the instruction, which is an address of the original program for jumps
+        """
+        self.address = address
+        self.code = code
+        self.instruction = instruction
+        self.operand = operand
+        self.removed = False
+
+    @property
+    def mnemonic(self):
+        return self.instruction.mnemonic
+
+
+class AhmesOptimization(object):
+    """
+    The outcome of optimizing a program: the optimized program, the number of rewrites of each kind, the addresses
+    whose bytes changed, and how many instructions the original and the optimized programs executed.
+    """
+
+    def __init__(self, original, program, rewrites, changed_addresses, reason=None):
+        self.original = original
+        self.program = program
+        self.rewrites = rewrites
+        self.changed_addresses = changed_addresses
+        self.reason = reason  # Why the program could not be optimized, or None
+        self.verified = False
+        self.original_result = None
+        self.optimized_result = None
+
+    def verify(self, max_steps=ahmes_runner.default_max_steps, pedantic=True, start=0):
+        """
+        Runs both programs and checks that they halt with the same AC, indicators, and bytes at every address that was
+        not changed. PC is not compared, because HLT may have moved.
+        :return: whether the programs are equivalent
+        """
+        computers = []
+        for program in (self.original, self.program):
+            computer = ahmes.AhmesComputer(pc=start, pedantic=pedantic)
+            computer.load_program(program)
+            computer.run(max_steps)
+            computers.append(computer)
+        original, optimized = computers
+        self.original_result = ahmes_runner.describe_computer(original)
+        self.optimized_result = ahmes_runner.describe_computer(optimized)
+        unchanged = [address for address in range(256) if address not in self.changed_addresses]
+        self.verified = (original.halted and optimized.halted and original.ac == optimized.ac and
+                         original.flags == optimized.flags and
+                         all(original.bytes[address] == optimized.bytes[address] for address in unchanged))
+        return self.verified
+
+    def make_report(self):
+        keys = ['Rewrites', 'Changed bytes']
+        values = [', '.join('{0} {1}'.format(count, name) for name, count in sorted(self.rewrites.items())) or 'none',
+                  len(self.changed_addresses)]
+        if self.reason is not None:
+            keys.append('Not optimized')
+            values.append(self.reason)
+        if self.original_result is not None:
+            before = self.original_result['instructions']
+            after = self.optimized_result['instructions']
+            keys.extend(['Verified', 'Instructions before', 'Instructions after', 'Speedup'])
+            speedup = '{0:.2f}x'.format(before / after) if after else '-'
+            values.extend(['yes' if self.verified else 'no', before, after, speedup])
+        return ahmes.make_string_of_key_value_lines(keys, values)
+
+    def __str__(self):
+        return self.make_report()
+
+
+class AhmesOptimizer(object):
+    """
+    A peephole optimizer that makes programs execute fewer instructions.
+
+    The optimizer works on regions: runs of consecutive reachable instructions whose bytes are never read or written
+    as data. Inside a region it threads jumps to unconditional jumps, removes LDA after STA or LDA of the same address,
+    folds LDA of a constant followed by an ALU instruction with constant operands into a single LDA when the indicators
+    it would set are never read, and removes jumps to the next instruction. The remaining instructions are packed
+    together and jumps are retargeted, which drops unreachable code from the layout. Regions that are entered and left
+    by falling through keep their layout and only have their jumps threaded.
+
+    The constants folded into LDA are bytes that are never written, either those at the addresses the caller marks as
+    constant or unreachable bytes that are never accessed as data. Other bytes are inputs that may hold other values
+    when the program runs, even if the program never writes them. Programs that write any byte of their reachable code
+    are not optimized, because their code and the addresses they access cannot be known without running them.
+    """
+
+    def __init__(self, program, pedantic=True, start=0, constant_addresses=()):
+        """
+        Constructs a new AhmesOptimizer.
+        :param program: an AhmesProgram with 256 bytes
+        :param pedantic: which instruction index the program is decoded with
+        :param start: the address where the program starts
+        :param constant_addresses: the addresses of the bytes that always hold their value in the program
+        """
+        self.original = program
+        self.memory = bytearray(program.get_bytes())
+        assert len(self.memory) == 256, 'program should have exactly 256 bytes'
+        self.pedantic = pedantic
+        self.start = start
+        self.constant_addresses = set(constant_addresses)
+        self.analysis = ahmes_analyzer.analyze(self.memory, start, pedantic)
+        self.reachable = self.analysis.instructions
+        self.rewrites = {}
+        self.changed_addresses = set()
+
+    def count(self, rewrite):
+        self.rewrites[rewrite] = self.rewrites.get(rewrite, 0) + 1
+
+    def get_owners(self):
+        owners = [[] for i in range(256)]
+        for address, (instruction, operand) in self.reachable.items():
+            for i in range(instruction.size):
+                owners[(address + i) & 0xFF].append(address)
+        return owners
+
+    def find_regions(self, owners, data_addresses):
+        """
+        Splits the movable instructions into regions.
+        :return: a list of lists of addresses of instructions
+        """
+        def is_movable(address):
+            size = self.reachable[address][0].size
+            addresses = range(address, address + size)
+            return address + size <= 256 and all(len(owners[a]) == 1 and a not in data_addresses for a in addresses)
+
+        regions = []
+        address = 0
+        while address < 256:
+            if address not in self.reachable or not is_movable(address):
+                address += 1
+                continue
+            region = []
+            while address < 256 and address in self.reachable and is_movable(address):
+                region.append(address)
+                address += self.reachable[address][0].size
+            regions.append(region)
+        return regions
+
+    def optimize(self):
+        """
+        Optimizes the program.
+        :return: an AhmesOptimization
+        """
+        owners = self.get_owners()
+        data_addresses = self.analysis.data_addresses
+        written_addresses = self.analysis.written_addresses
+        if self.analysis.self_modifying:
+            return AhmesOptimization(self.original, self.original, {}, set(), 'the program modifies its own code')
+        regions = self.find_regions(owners, data_addresses)
+        region_of = {}
+        for index, region in enumerate(regions):
+            for address in region:
+                region_of[address] = index
+        # Jumps of instructions that cannot move keep their targets, so those targets cannot move either.
+        fixed_regions = {region_of[operand] for address, (instruction, operand) in self.reachable.items()
+                         if ahmes_analyzer.is_jump(instruction) and address not in region_of and operand in region_of}
+        in_regions = {a for address in region_of for a in range(address, address + self.reachable[address][0].size)}
+        # Constant bytes that are never written can be loaded as constants; unreachable bytes that are never accessed as
+        # data are free to hold new constants.
+        self.stable_addresses = set()
+        self.free_addresses = []
+        self.constants = {}
+        for address in range(256):
+            if address in written_addresses or address in in_regions:
+                continue
+            if not owners[address] and address not in data_addresses:
+                self.free_addresses.append(address)
+            elif address in self.constant_addresses:
+                self.stable_addresses.add(address)
+                self.constants.setdefault(self.memory[address], address)
+        live_out = find_live_flags(self.reachable)
+        leaders = {self.start} | {operand for instruction, operand in self.reachable.values()
+                                  if ahmes_analyzer.is_jump(instruction)}
+        new_addresses = {}
+        layouts = []
+        for index, region in enumerate(regions):
+            lines = [AhmesCodeLine(address, self.memory[address], *self.reachable[address]) for address in region]
+            self.thread_jumps(lines)
+            start = region[0]
+            entered = start == self.start or any(address + instruction.size == start and
+                                                 ahmes_analyzer.falls_through(instruction)
+                                                 for address, (instruction, operand) in self.reachable.items())
+            left = ahmes_analyzer.falls_through(lines[-1].instruction)
+            movable = index not in fixed_regions and not (entered and left)
+            if movable:
+                self.remove_redundant_loads(lines, leaders)
+                self.fold_constants(lines, leaders, live_out)
+                self.remove_jumps_to_next(lines)
+            end = region[-1] + lines[-1].instruction.size
+            size = sum(line.instruction.size for line in lines if not line.removed)
+            # A region that is left by falling through must end where it did, so it is packed against its end.
+            base = end - size if left and not entered else start
+            self.place_lines(lines, base, new_addresses)
+            layouts.append((start, end, base, lines))
+        optimized = bytearray(self.memory)
+        for start, end, base, lines in layouts:
+            self.write_lines(optimized, start, end, base, lines, new_addresses)
+        self.changed_addresses |= {address for address in range(256) if optimized[address] != self.memory[address]}
+        program = ahmes.AhmesProgram.from_bytes(list(optimized))
+        return AhmesOptimization(self.original, program, self.rewrites, self.changed_addresses)
+
+    def thread_jumps(self, lines):
+        for line in lines:
+            if not ahmes_analyzer.is_jump(line.instruction):
+                continue
+            target = line.operand
+            seen = {line.address}
+            while target in self.reachable and self.reachable[target][0].mnemonic == 'JMP' and target not in seen:
+                seen.add(target)
+                target = self.reachable[target][1]
+            if target != line.operand:
+                line.operand = target
+                self.count('threaded jumps')
+
+    def remove_redundant_loads(self, lines, leaders):
+        previous = None
+        for line in lines:
+            if (line.mnemonic == 'LDA' and line.address not in leaders and previous is not None and
+                    previous.mnemonic in ('STA', 'LDA') and previous.operand == line.operand):
+                line.removed = True
+                self.count('redundant loads')
+            else:
+                previous = line
+
+    def get_constant_address(self, value):
+        """
+        Returns the address of a byte that always holds a value, taking a free byte if there is none.
+        :return: an address, or None if there is no such byte and no free byte is left
+        """
+        if value not in self.constants:
+            if not self.free_addresses:
+                return None
+            address = self.free_addresses.pop()
+            self.memory[address] = value
+            self.stable_addresses.add(address)
+            self.constants[value] = address
+            self.changed_addresses.add(address)
+        return self.constants[value]
+
+    def fold_constants(self, lines, leaders, live_out):
+        load = None
+        for line in lines:
+            if line.removed:
+                continue
+            mnemonic = line.mnemonic
+            if (load is not None and line.address not in leaders and mnemonic in ahmes_math.alu_operations and
+                    not live_out[line.address] & ahmes_math.alu_flag_masks[mnemonic] & carried_flags and
+                    (line.operand is None or line.operand in self.stable_addresses)):
+                value = self.memory[load.operand]
+                operation = ahmes_math.alu_operations[mnemonic]
+                result = operation(value) if line.operand is None else operation(value, self.memory[line.operand])
+                address = self.get_constant_address(result[0])
+                if address is not None:
+                    load.operand = address
+                    line.removed = True
+                    self.count('folded constants')
+                    continue
+            load = line if mnemonic == 'LDA' and line.operand in self.stable_addresses else None
+
+    def remove_jumps_to_next(self, lines):
+        positions = {line.address: i for i, line in enumerate(lines)}
+        # Going backwards removes chains of jumps that become jumps to the next instruction.
+        for i, line in reversed(list(enumerate(lines))):
+            if line.removed or not ahmes_analyzer.is_jump(line.instruction) or line.operand not in positions:
+                continue
+            following = next((other for other in lines[i + 1:] if not other.removed), None)
+            target = next((other for other in lines[positions[line.operand]:] if not other.removed), None)
+            if following is not None and target is following:
+                line.removed = True
+                self.count('jumps to the next instruction')
+
+    @staticmethod
+    def place_lines(lines, base, new_addresses):
+        """
+        Records the new address of every line. Removed lines take the address of the next line that is kept.
+        """
+        address = base
+        pending = []
+        for line in lines:
+            pending.append(line.address)
+            if not line.removed:
+                for original in pending:
+                    new_addresses[original] = address
+                pending = []
+                address += line.instruction.size
+        for original in pending:
+            new_addresses[original] = address
+
+    @staticmethod
+    def write_lines(memory, start, end, base, lines, new_addresses):
+        memory[start:end] = bytes(end - start)
+        address = base
+        for line in lines:
+            if line.removed:
+                continue
+            memory[address] = line.code
+            if line.instruction.size == 2:
+                operand = line.operand
+                if ahmes_analyzer.is_jump(line.instruction):
+                    operand = new_addresses.get(operand, operand)
+                memory[address + 1] = operand
+            address += line.instruction.size
+
+
+def optimize(program, pedantic=True, start=0, max_steps=ahmes_runner.default_max_steps, constant_addresses=()):
+    """
+    Optimizes a program and verifies the result by running both programs. If they are not equivalent, the original
+    program is kept. The verification only runs the program with its current bytes, so only the bytes at
+    constant_addresses are folded into constants. See AhmesOptimizer.
+    :return: an AhmesOptimization
+    """
+    optimization = AhmesOptimizer(program, pedantic, start, constant_addresses).optimize()
+    if not optimization.verify(max_steps, pedantic, start) and optimization.program is not program:
+        if optimization.original_result['halt_reason'] != 'halted':
+            optimization.reason = 'the original program did not halt within max_steps'
+        else:
+            optimization.reason = 'the optimized program did not match the original when run'
+        optimization.program = program
+    return optimization
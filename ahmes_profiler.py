@@ -0,0 +1,103 @@
+#!/usr/bin/python
+
+import array
+
+import ahmes
+import ahmes_analyzer
+
+
+def make_counter_array(size=256):
+    return array.array('Q', bytes(8 * size))
+
+
+class AhmesProfiler(ahmes.AhmesInstrument):
+    """
+    Counts what an AhmesComputer does: executions per address and per mnemonic, data reads and writes per address,
+    and how many times each jump was taken.
+    """
+
+    def __init__(self, computer):
+        super(AhmesProfiler, self).__init__(computer)
+        self.instruction_index = ahmes.get_ahmes_instruction_index(computer.pedantic)
+        self.mnemonics = sorted({instruction.mnemonic for instruction in self.instruction_index})
+        self.address_counts = make_counter_array()
+        self.mnemonic_counts = make_counter_array(len(self.mnemonics))
+        self.reads = make_counter_array()
+        self.writes = make_counter_array()
+        self.taken = make_counter_array()
+        self.not_taken = make_counter_array()
+
+    def make_entry(self, code, instruction, function):
+        """
+        Wraps the function of an instruction so that it updates the counters before running.
+        """
+        size = instruction.size
+        mnemonic_index = self.mnemonics.index(instruction.mnemonic)
+        address_counts = self.address_counts
+        mnemonic_counts = self.mnemonic_counts
+        if instruction.mnemonic in ahmes_analyzer.data_read_mnemonics:
+            accessed = self.reads
+        elif instruction.mnemonic == 'STA':
+            accessed = self.writes
+        else:
+            accessed = None
+        predicate = getattr(instruction, 'predicate', None)
+        taken = self.taken
+        not_taken = self.not_taken
+
+        def profiled_function(ahmes_computer, operand):
+            pc = (ahmes_computer.pc - size) & 0xFF
+            address_counts[pc] += 1
+            mnemonic_counts[mnemonic_index] += 1
+            if accessed is not None:
+                accessed[operand] += 1
+            elif predicate is not None:
+                if predicate(ahmes_computer.flags):
+                    taken[pc] += 1
+                else:
+                    not_taken[pc] += 1
+            function(ahmes_computer, operand)
+
+        return profiled_function
+
+    def reset(self):
+        for counters in (self.address_counts, self.mnemonic_counts, self.reads, self.writes, self.taken,
+                         self.not_taken):
+            counters[:] = make_counter_array(len(counters))
+
+    def as_dict(self):
+        """
+        Returns the nonzero counters as a dict of dicts, keyed by address or by mnemonic.
+        """
+        def nonzero(counters):
+            return {address: count for address, count in enumerate(counters) if count}
+
+        return {'addresses': nonzero(self.address_counts),
+                'mnemonics': {mnemonic: self.mnemonic_counts[i] for i, mnemonic in enumerate(self.mnemonics)
+                              if self.mnemonic_counts[i]},
+                'reads': nonzero(self.reads),
+                'writes': nonzero(self.writes),
+                'branches': {address: {'taken': self.taken[address], 'not_taken': self.not_taken[address]}
+                             for address in range(256) if self.taken[address] or self.not_taken[address]}}
+
+    def make_report(self, limit=10):
+        """
+        Makes a text report with the most executed addresses and mnemonics, the most accessed memory cells, and the
+        branches.
+        :param limit: the maximum number of lines in each section
+        :return: a str
+        """
+        profile = self.as_dict()
+        sections = []
+        for title, counts in (('Addresses', profile['addresses']), ('Mnemonics', profile['mnemonics']),
+                              ('Reads', profile['reads']), ('Writes', profile['writes'])):
+            keys = sorted(counts, key=lambda key: (-counts[key], str(key)))[:limit]
+            sections.append(title + '\n' + ahmes.make_string_of_key_value_lines(keys, [counts[key] for key in keys]))
+        branches = profile['branches']
+        keys = sorted(branches, key=lambda key: -(branches[key]['taken'] + branches[key]['not_taken']))[:limit]
+        values = ['{0} taken, {1} not taken'.format(branches[key]['taken'], branches[key]['not_taken']) for key in keys]
+        sections.append('Branches\n' + ahmes.make_string_of_key_value_lines(keys, values))
+        return '\n\n'.join(sections)
+
+    def __str__(self):
+        return self.make_report()
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+
+import ahmes
+
+# The formatted pieces of every dump, built once so that rendering only joins strings.
+hex_bytes = ['{0:02X}'.format(value) for value in range(256)]
+hex_dump_header = '    ' + ' '.join('{0:02X}'.format(column) for column in range(16)) + '\n'
+hex_dump_row_prefixes = ['{0:02X}: '.format(row * 16) for row in range(16)]
+flag_letters = 'NZVCB'
+flag_strings = [''.join(letter if flags & (0x10 >> i) else '-' for i, letter in enumerate(flag_letters))
+                for flags in range(32)]
+decimal_bytes = ahmes.byte_strings_by_width[3]
+diff_line_prefixes = ahmes.memory_line_prefixes
+
+
+def make_register_line(ac, pc, flags, halted):
+    return 'AC {0}  PC {1}  {2}{3}\n'.format(hex_bytes[ac], hex_bytes[pc], flag_strings[flags],
+                                            '  halted' if halted else '')
+
+
+def make_hex_rows(memory):
+    """
+    Makes the 16 rows of a hex dump, each with 16 bytes after the address of its first byte.
+    :param memory: 256 bytes
+    :return: a list of str that end with a newline
+    """
+    memory = bytes(memory)
+    return [prefix + memory[row * 16:row * 16 + 16].hex(' ').upper() + '\n'
+            for row, prefix in enumerate(hex_dump_row_prefixes)]
+
+
+def make_hex_dump(memory):
+    """
+    Makes a 16x16 hex dump of a memory image, with a header of column numbers.
+    :param memory: 256 bytes
+    :return: a str
+    """
+    assert len(memory) == 256, 'memory should have 256 bytes'
+    return hex_dump_header + ''.join(make_hex_rows(memory))
+
+
+def make_computer_dump(computer):
+    """
+    Makes a hex dump of the memory of a computer after a line with AC, PC, and the flags.
+    :param computer: an AhmesComputer
+    :return: a str
+    """
+    return make_register_line(computer.ac, computer.pc, computer.flags, computer.halted) + make_hex_dump(computer.bytes)
+
+
+def make_diff_lines(old_state, new_state):
+    """
+    Makes the lines that describe how a state changed, one per changed register or byte of memory.
+    :param old_state: 260 bytes as returned by AhmesComputer.get_state
+    :param new_state: 260 bytes as returned by AhmesComputer.get_state
+    :return: a list of str that end with a newline
+    """
+    assert len(old_state) == len(new_state) == 260, 'states should have 260 bytes'
+    lines = []
+    old_ac, old_pc, old_flags, old_halted = old_state[256:]
+    new_ac, new_pc, new_flags, new_halted = new_state[256:]
+    if old_ac != new_ac:
+        lines.append('AC : ' + decimal_bytes[old_ac] + ' -> ' + decimal_bytes[new_ac] + '\n')
+    if old_pc != new_pc:
+        lines.append('PC : ' + decimal_bytes[old_pc] + ' -> ' + decimal_bytes[new_pc] + '\n')
+    if old_flags != new_flags:
+        lines.append('FL : ' + flag_strings[old_flags] + ' -> ' + flag_strings[new_flags] + '\n')
+    if old_halted != new_halted:
+        lines.append('HLT: ' + ('halted\n' if new_halted else 'running\n'))
+    old_memory = old_state[:256]
+    new_memory = new_state[:256]
+    if old_memory != new_memory:
+        lines.extend([diff_line_prefixes[address] + decimal_bytes[old] + ' -> ' + decimal_bytes[new] + '\n'
+                      for address, (old, new) in enumerate(zip(old_memory, new_memory)) if old != new])
+    return lines
+
+
+def get_snapshot_state(snapshot):
+    """
+    Returns the state of a snapshot made by AhmesComputer.snapshot, which may also be given as the state itself.
+    """
+    return snapshot if isinstance(snapshot, (bytes, bytearray)) else snapshot[0]
+
+
+def make_diff(snapshot, computer):
+    """
+    Makes a view of what changed in a computer since a snapshot, listing only the changed registers and bytes.
+    :param snapshot: a tuple returned by AhmesComputer.snapshot, or a state returned by AhmesComputer.get_state
+    :param computer: an AhmesComputer
+    :return: a str, empty if nothing changed
+    """
+    return ''.join(make_diff_lines(get_snapshot_state(snapshot), computer.get_state()))
+
+
+class AhmesDumpWriter(object):
+    """
+    Writes dumps of a computer to a file object as it runs. The first dump is complete and every following one only
+    lists what changed since the previous dump, so a log of many states stays small and cheap to write.
+    """
+
+    def __init__(self, output):
+        """
+        Constructs a new AhmesDumpWriter.
+        :param output: a text file object
+        """
+        self.output = output
+        self.state = None
+        self.dumps = 0
+
+    def write(self, computer):
+        """
+        Writes the state of a computer, or what changed in it since the last write.
+        :param computer: an AhmesComputer
+        :return: the number of lines that describe changes, or None for a complete dump
+        """
+        state = computer.get_state()
+        self.output.write('# {0} instructions\n'.format(computer.instructions))
+        self.dumps += 1
+        if self.state is None:
+            self.state = state
+            self.output.write(make_register_line(computer.ac, computer.pc, computer.flags, computer.halted))
+            self.output.write(hex_dump_header)
+            self.output.writelines(make_hex_rows(computer.bytes))
+            return None
+        lines = make_diff_lines(self.state, state)
+        self.state = state
+        self.output.writelines(lines)
+        return len(lines)
+
+    def reset(self):
+        """
+        Makes the next write a complete dump.
+        """
+        self.state = None
@@ -0,0 +1,165 @@
+#!/usr/bin/python
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+import ahmes
+import ahmes_analyzer
+import ahmes_loops
+
+default_max_steps = 1000000
+
+
+def find_program_files(pattern):
+    """
+    Finds the memory files selected by a directory or a glob pattern.
+    :param pattern: a directory, whose .mem files are selected, or a glob pattern
+    :return: a sorted list of filenames
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.mem')
+    return sorted(glob.glob(pattern))
+
+
+def describe_computer(computer):
+    """
+    Describes the state of a computer after a run.
+    :param computer: an AhmesComputer
+    :return: a dict that can be serialized as JSON
+    """
+    indicators = computer.indicators
+    return {'ac': computer.ac,
+            'pc': computer.pc,
+            'flags': {'n': indicators.n, 'z': indicators.z, 'v': indicators.v, 'c': indicators.c, 'b': indicators.b},
+            'instructions': computer.instructions,
+            'memory_accesses': computer.memory_accesses,
+            'halt_reason': 'halted' if computer.halted else 'step_limit'}
+
+
+def run_program_file(filename, max_steps=default_max_steps, pedantic=True, detect_loops=False, cache=None,
+                     skip_non_halting=False):
+    """
+    Loads a memory file into a new AhmesComputer and runs it.
+    :param filename: the path of a memory file
+    :param max_steps: the maximum number of instructions to execute
+    :param pedantic: which instruction index the computer should use
+    :param detect_loops: whether to stop as soon as the computer is found to be in an infinite loop
+    :param cache: an AhmesResultCache to read and store the outcome of the run, which is not used with detect_loops
+    :param skip_non_halting: whether to skip running programs that provably never halt
+    :return: a dict describing the final state of the computer
+    """
+    program = ahmes.AhmesProgram(filename)
+    try:
+        loaded = program.initialized and len(program.get_bytes()) == 256
+    except OSError:
+        # AhmesProgram only handles missing files, but a directory or an unreadable file must not end the batch.
+        loaded = False
+    if not loaded:
+        return {'filename': filename, 'halt_reason': 'load_error'}
+    computer = ahmes.AhmesComputer(pedantic=pedantic)
+    computer.load_program(program)
+    if skip_non_halting and not ahmes_analyzer.analyze(computer.bytes, computer.pc, pedantic).may_halt:
+        result = describe_computer(computer)
+        result.update({'filename': filename, 'halt_reason': 'never_halts'})
+        return result
+    loop_detector = None
+    if detect_loops:
+        loop_detector = ahmes_loops.AhmesLoopDetector(computer)
+        loop_detector.run(max_steps)
+    elif cache is not None:
+        cache.run(computer, max_steps)
+    else:
+        computer.run(max_steps)
+    result = describe_computer(computer)
+    result['filename'] = filename
+    if loop_detector is not None and loop_detector.period is not None:
+        result['halt_reason'] = 'looping'
+        result['period'] = loop_detector.period
+    return result
+
+
+def run_program_file_chunk(filenames, max_steps, pedantic, detect_loops, cache_directory=None, skip_non_halting=False):
+    import ahmes_cache
+
+    cache = None if cache_directory is None else ahmes_cache.AhmesResultCache(cache_directory)
+    return [run_program_file(filename, max_steps, pedantic, detect_loops, cache, skip_non_halting)
+            for filename in filenames]
+
+
+def make_chunks(filenames, workers, chunk_size=None):
+    """
+    Splits the filenames into chunks so that each worker receives several of them per task.
+    :param filenames: a list of filenames
+    :param workers: the number of worker processes
+    :param chunk_size: the number of filenames per chunk, or None to pick one from the number of workers
+    :return: a list of lists of filenames
+    """
+    if chunk_size is None:
+        # About four chunks per worker balances the load without paying for one task per file.
+        chunk_size = max(1, min(256, len(filenames) // (4 * workers)))
+    return [filenames[i:i + chunk_size] for i in range(0, len(filenames), chunk_size)]
+
+
+def run_program_files(filenames, max_steps=default_max_steps, pedantic=True, workers=None, chunk_size=None,
+                      detect_loops=False, cache_directory=None, skip_non_halting=False):
+    """
+    Runs the memory files on a process pool, yielding their results in completion order.
+    :param filenames: a list of filenames
+    :param max_steps: the maximum number of instructions to execute per program
+    :param pedantic: which instruction index the computers should use
+    :param workers: the number of worker processes, or None to use every core
+    :param chunk_size: the number of programs per task, or None to pick one automatically
+    :param detect_loops: whether to stop each program as soon as it is found to be in an infinite loop
+    :param cache_directory: the directory of an AhmesResultCache shared by the workers, or None
+    :param skip_non_halting: whether to skip running programs that provably never halt
+    :return: a generator of dicts as returned by run_program_file
+    """
+    # Importing the pool and its logging costs more than running a single program, so it waits until it is needed.
+    import concurrent.futures
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_program_file_chunk, chunk, max_steps, pedantic, detect_loops, cache_directory,
+                                   skip_non_halting)
+                   for chunk in make_chunks(filenames, workers, chunk_size)]
+        for future in concurrent.futures.as_completed(futures):
+            for result in future.result():
+                yield result
+
+
+def write_json_lines(results, output):
+    for result in results:
+        output.write(json.dumps(result, sort_keys=True))
+        output.write('\n')
+        output.flush()
+
+
+def make_argument_parser():
+    parser = argparse.ArgumentParser(description='Runs many Ahmes memory files in parallel.')
+    parser.add_argument('pattern', help='a directory of .mem files or a glob pattern')
+    parser.add_argument('--max-steps', type=int, default=default_max_steps, help='the step budget of each program')
+    parser.add_argument('--pedantic', action=argparse.BooleanOptionalAction, default=True,
+                        help='map only the first code of each instruction (the default)')
+    parser.add_argument('--workers', type=int, default=None, help='the number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=None, help='the number of programs per task')
+    parser.add_argument('--detect-loops', action='store_true', help='stop programs that repeat a state')
+    parser.add_argument('--cache', default=None, help='a directory where the outcomes of runs are cached')
+    parser.add_argument('--skip-non-halting', action='store_true',
+                        help='do not run programs that can be proven to never halt')
+    return parser
+
+
+def main(arguments=None):
+    options = make_argument_parser().parse_args(arguments)
+    filenames = find_program_files(options.pattern)
+    results = run_program_files(filenames, options.max_steps, options.pedantic, options.workers, options.chunk_size,
+                                options.detect_loops, options.cache, options.skip_non_halting)
+    write_json_lines(results, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
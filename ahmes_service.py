@@ -0,0 +1,287 @@
+#!/usr/bin/python
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import math
+import os
+import time
+
+import ahmes
+import ahmes_runner
+
+default_slice_size = 1000
+default_progress_interval = 100
+default_max_steps = ahmes_runner.default_max_steps
+default_max_seconds = 10.0
+default_max_running = 64
+default_max_batches = 4
+default_max_batch_size = 4096
+# A request is a single line, so the limit has to fit the largest batch.
+default_line_limit = 16 * 1024 * 1024
+
+
+def parse_memory(memory):
+    """
+    Converts the memory of a request to bytes.
+    :param memory: a list of 256 integers from 0 to 255
+    :return: a bytes object
+    """
+    if not isinstance(memory, list) or len(memory) != 256:
+        raise ValueError('memory should be a list of 256 bytes')
+    return bytes(memory)
+
+
+def get_pedantic(request):
+    """
+    Returns the instruction index a request selects. Anything but a JSON boolean is rejected, because every other
+    value would be a different key of the dispatch tables of ahmes.
+    """
+    pedantic = request.get('pedantic', True)
+    if not isinstance(pedantic, bool):
+        raise ValueError('pedantic should be true or false')
+    return pedantic
+
+
+def get_byte(request, name):
+    """
+    Returns the AC or PC of a request, which defaults to 0.
+    """
+    value = request.get(name, 0)
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 255:
+        raise ValueError('{0} should be an integer from 0 to 255'.format(name))
+    return value
+
+
+def get_quota(request, name, maximum):
+    """
+    Returns a quota of a request, capped by the quota of the service, which is also the default.
+    """
+    value = request.get(name, maximum)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError('{0} should be a number'.format(name))
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError('{0} should be finite'.format(name))
+    if value < 0:
+        raise ValueError('{0} should not be negative'.format(name))
+    return min(value, maximum)
+
+
+def make_computer(memory, ac=0, pc=0, pedantic=True):
+    computer = ahmes.AhmesComputer(ac, pc, pedantic)
+    computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+    return computer
+
+
+def run_in_slices(computer, max_steps, deadline, slice_size):
+    """
+    Runs a computer slice_size instructions at a time, yielding after every slice, until it halts, executes max_steps
+    instructions, or time.time() passes the deadline.
+    :return: a generator of the number of instructions executed so far
+    """
+    while not computer.halted and computer.instructions < max_steps and time.time() < deadline:
+        computer.run(min(slice_size, max_steps - computer.instructions))
+        yield computer.instructions
+
+
+def describe_run(computer, max_steps):
+    result = ahmes_runner.describe_computer(computer)
+    result['memory'] = list(computer.bytes)
+    if not computer.halted and computer.instructions < max_steps:
+        result['halt_reason'] = 'time_limit'
+    return result
+
+
+def run_batch_chunk(memories, ac, pc, pedantic, max_steps, deadline, slice_size):
+    """
+    Runs some memories of a batch one after the other. This runs on the process pool.
+    :return: a list of dicts as returned by describe_run
+    """
+    results = []
+    for memory in memories:
+        computer = make_computer(memory, ac, pc, pedantic)
+        for instructions in run_in_slices(computer, max_steps, deadline, slice_size):
+            pass
+        results.append(describe_run(computer, max_steps))
+    return results
+
+
+class AhmesService(object):
+    """
+    Runs memory images for clients that send one JSON request per line and receive JSON messages, one per line.
+
+    A request has a memory (a list of 256 bytes) or a batch (a list of memories), and may have an id, which is copied
+    to every message about it, ac, pc, pedantic, max_steps, and max_seconds. The step and time quotas of the service
+    cap those of the requests. A result describes the final state of the computer, including its memory.
+
+    A memory runs on the event loop slice_size instructions at a time, yielding between slices so that no client
+    starves the others, and sends a progress message every progress_interval slices before its result. A batch runs on
+    a process pool and sends one result per memory, with its index, as the chunks complete.
+
+    The requests of a connection are handled one at a time, every message waits for the client to read the previous
+    ones, and at most max_running memories and max_batches batches are handled at once, so clients that send faster
+    than the service runs are slowed down instead of filling its memory. Requests are checked with exceptions rather
+    than asserts, so that the checks are not removed by python -O.
+    """
+
+    def __init__(self, slice_size=default_slice_size, progress_interval=default_progress_interval,
+                 max_steps=default_max_steps, max_seconds=default_max_seconds, max_running=default_max_running,
+                 max_batches=default_max_batches, max_batch_size=default_max_batch_size, workers=None):
+        assert slice_size > 0, 'slice_size should be positive'
+        self.slice_size = slice_size
+        self.progress_interval = progress_interval
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_batch_size = max_batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.running = asyncio.Semaphore(max_running)
+        self.batches = asyncio.Semaphore(max_batches)
+        self.executor = None
+        self.connections = set()
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def disconnect(self):
+        """
+        Closes every connection, abandoning the requests being handled.
+        """
+        connections = list(self.connections)
+        for connection in connections:
+            connection.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    def get_quotas(self, request):
+        """
+        Returns the step budget and the deadline of a request.
+        """
+        max_steps = int(get_quota(request, 'max_steps', self.max_steps))
+        return max_steps, time.time() + get_quota(request, 'max_seconds', self.max_seconds)
+
+    async def send(self, writer, message):
+        writer.write(json.dumps(message, sort_keys=True).encode() + b'\n')
+        await writer.drain()
+
+    async def handle_client(self, reader, writer):
+        connection = asyncio.current_task()
+        self.connections.add(connection)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    await self.send(writer, {'type': 'error', 'message': 'the request is too long'})
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    await self.handle_request(line, writer)
+        except ConnectionError:
+            pass  # The client went away
+        finally:
+            self.connections.discard(connection)
+            writer.close()
+
+    async def handle_request(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('the request should be an object')
+            request_id = request.get('id')
+            if 'batch' in request:
+                await self.run_batch(request, writer)
+            else:
+                await self.run_memory(request, writer)
+        except (ValueError, TypeError, KeyError, OverflowError, AssertionError) as error:
+            await self.send(writer, {'type': 'error', 'id': request_id, 'message': str(error)})
+
+    async def run_memory(self, request, writer):
+        computer = make_computer(parse_memory(request['memory']), get_byte(request, 'ac'), get_byte(request, 'pc'),
+                                 get_pedantic(request))
+        max_steps, deadline = self.get_quotas(request)
+        async with self.running:
+            slices = 0
+            for instructions in run_in_slices(computer, max_steps, deadline, self.slice_size):
+                slices += 1
+                if slices % self.progress_interval == 0:
+                    await self.send(writer, {'type': 'progress', 'id': request.get('id'), 'instructions': instructions})
+                await asyncio.sleep(0)
+        result = describe_run(computer, max_steps)
+        result.update({'type': 'result', 'id': request.get('id')})
+        await self.send(writer, result)
+
+    async def run_batch(self, request, writer):
+        batch = request['batch']
+        if not isinstance(batch, list) or len(batch) > self.max_batch_size:
+            raise ValueError('a batch should be a list of at most {0} memories'.format(self.max_batch_size))
+        memories = [parse_memory(memory) for memory in batch]
+        ac = get_byte(request, 'ac')
+        pc = get_byte(request, 'pc')
+        pedantic = get_pedantic(request)
+        max_steps, deadline = self.get_quotas(request)
+        loop = asyncio.get_running_loop()
+        async with self.batches:
+            executor = self.get_executor()
+
+            async def run_chunk(chunk):
+                return chunk, await loop.run_in_executor(executor, run_batch_chunk, [memories[i] for i in chunk], ac,
+                                                         pc, pedantic, max_steps, deadline, self.slice_size)
+
+            chunks = ahmes_runner.make_chunks(list(range(len(memories))), self.workers)
+            for future in asyncio.as_completed([run_chunk(chunk) for chunk in chunks]):
+                chunk, results = await future
+                for index, result in zip(chunk, results):
+                    result.update({'type': 'result', 'id': request.get('id'), 'index': index})
+                    await self.send(writer, result)
+
+
+async def serve(service, host=None, port=None, path=None):
+    """
+    Serves clients on a TCP socket or, if path is not None, on a Unix socket.
+    :return: an asyncio Server
+    """
+    if path is not None:
+        return await asyncio.start_unix_server(service.handle_client, path, limit=default_line_limit)
+    return await asyncio.start_server(service.handle_client, host, port, limit=default_line_limit)
+
+
+def make_argument_parser():
+    parser = argparse.ArgumentParser(description='Runs Ahmes memory images for clients over a socket.')
+    parser.add_argument('--host', default='127.0.0.1', help='the address to listen on')
+    parser.add_argument('--port', type=int, default=8256, help='the TCP port to listen on')
+    parser.add_argument('--unix', default=None, help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--slice-size', type=int, default=default_slice_size,
+                        help='the number of instructions run before yielding to other clients')
+    parser.add_argument('--max-steps', type=int, default=default_max_steps, help='the step quota of each request')
+    parser.add_argument('--max-seconds', type=float, default=default_max_seconds,
+                        help='the time quota of each request')
+    parser.add_argument('--max-running', type=int, default=default_max_running,
+                        help='the number of memories run at once')
+    parser.add_argument('--workers', type=int, default=None, help='the number of worker processes for batches')
+    return parser
+
+
+async def main(arguments=None):
+    options = make_argument_parser().parse_args(arguments)
+    service = AhmesService(options.slice_size, max_steps=options.max_steps, max_seconds=options.max_seconds,
+                           max_running=options.max_running, workers=options.workers)
+    try:
+        server = await serve(service, options.host, options.port, options.unix)
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.disconnect()
+        service.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
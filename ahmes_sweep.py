@@ -0,0 +1,100 @@
+#!/usr/bin/python
+
+import hashlib
+import itertools
+import struct
+
+import ahmes
+import ahmes_analyzer
+
+default_checkpoint_interval = 64
+
+# About 100 bytes per checkpoint, so the checkpoints of a sweep stay under about 25 MB.
+default_max_checkpoints = 1 << 18
+
+# The digest of a checkpoint identifies its state and counters, so the states themselves are not kept.
+checkpoint_digest_size = 16
+
+
+class AhmesSweep(object):
+    """
+    Runs a program for every combination of values of some input bytes.
+
+    The instructions executed before the first access to an input byte are the same for every combination, so they
+    run only once and every combination is forked from a snapshot taken there. Every checkpoint_interval instructions
+    after the fork the digest of the state of the computer is recorded; a combination that reaches a recorded state
+    reuses the outcome of the combination that recorded it. At most max_checkpoints digests are kept, dropping the
+    oldest first. A state includes the input bytes, so combinations only converge after the program overwrites them.
+    """
+
+    def __init__(self, memory, input_addresses, pedantic=True, checkpoint_interval=default_checkpoint_interval,
+                 max_checkpoints=default_max_checkpoints):
+        """
+        Constructs a new AhmesSweep.
+        :param memory: a list of 256 bytes
+        :param input_addresses: a list of the addresses of the input bytes
+        :param pedantic: which instruction index the computers should use
+        :param checkpoint_interval: the number of instructions between two states compared across combinations
+        :param max_checkpoints: the maximum number of checkpoints kept at once
+        """
+        assert len(memory) == 256, 'memory should have 256 bytes'
+        assert checkpoint_interval > 0, 'checkpoint_interval should be positive'
+        assert max_checkpoints > 0, 'max_checkpoints should be positive'
+        self.memory = bytearray(memory)
+        self.input_addresses = list(input_addresses)
+        self.pedantic = pedantic
+        self.checkpoint_interval = checkpoint_interval
+        self.max_checkpoints = max_checkpoints
+        self.prefix_steps = 0
+        self.reused_outcomes = 0
+        self.checkpoints = {}  # The combination that recorded each digest, oldest first
+
+    def run(self, value_ranges, max_steps):
+        """
+        Runs the program for every combination of input values.
+        :param value_ranges: one iterable of byte values for each input address
+        :param max_steps: the maximum number of instructions to execute for each combination
+        :return: a dict from tuples of input values to the snapshot of the computer after running with them
+        """
+        assert len(value_ranges) == len(self.input_addresses), 'there should be one value range per input address'
+        computer = ahmes.AhmesComputer(pedantic=self.pedantic)
+        computer.bytes = bytearray(self.memory)
+        self.prefix_steps = ahmes_analyzer.run_until_access(computer, set(self.input_addresses), max_steps)
+        prefix = computer.snapshot()
+        outcomes = {}
+        self.checkpoints = {}
+        self.reused_outcomes = 0
+        for values in itertools.product(*value_ranges):
+            computer.restore(prefix)
+            for address, value in zip(self.input_addresses, values):
+                computer.set_byte(address, value)
+            outcome = self.run_fork(computer, max_steps, values, outcomes)
+            outcomes[values] = outcome if outcome is not None else computer.snapshot()
+        return outcomes
+
+    def run_fork(self, computer, max_steps, values, outcomes):
+        """
+        Runs one combination, recording the digests of its checkpoints.
+        :return: the outcome of an earlier combination that reached the same state, or None
+        """
+        while not computer.halted and computer.instructions < max_steps:
+            computer.run(min(self.checkpoint_interval, max_steps - computer.instructions))
+            digest = hashlib.blake2b(computer.get_state(), digest_size=checkpoint_digest_size)
+            digest.update(struct.pack('<QQ', computer.instructions, computer.memory_accesses))
+            key = digest.digest()
+            checkpoints = self.checkpoints
+            if key in checkpoints:
+                self.reused_outcomes += 1
+                return outcomes[checkpoints[key]]
+            if len(checkpoints) == self.max_checkpoints:
+                del checkpoints[next(iter(checkpoints))]
+            checkpoints[key] = values
+        return None
+
+
+def sweep(memory, input_addresses, value_ranges, max_steps, pedantic=True):
+    """
+    Runs a program for every combination of input values. See AhmesSweep.
+    :return: a dict from tuples of input values to the snapshot of the computer after running with them
+    """
+    return AhmesSweep(memory, input_addresses, pedantic).run(value_ranges, max_steps)
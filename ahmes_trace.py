@@ -0,0 +1,193 @@
+#!/usr/bin/python
+
+import collections
+import mmap
+import os
+import struct
+
+import ahmes
+
+trace_header = b'\x03AHT'
+
+# Every record has the address and the code of the instruction, its operand, AC and the flags after it ran, the
+# address and the value it stored, and marks telling whether the operand and the store are present.
+trace_fields = ('pc', 'opcode', 'operand', 'ac', 'flags', 'store_address', 'store_value', 'marks')
+trace_record_format = struct.Struct('<8B')
+trace_record_size = trace_record_format.size
+
+trace_mark_operand = 0x01
+trace_mark_store = 0x02
+
+default_buffer_records = 65536
+
+AhmesTraceRecord = collections.namedtuple('AhmesTraceRecord', trace_fields)
+
+
+class AhmesTraceRecorder(ahmes.AhmesInstrument):
+    """
+    Writes a binary record of every instruction an AhmesComputer executes to a file object.
+
+    Records are packed into a preallocated buffer that is written to the output only when it is full, when the
+    recorder is flushed, or when it is disabled.
+    """
+
+    def __init__(self, computer, output, buffer_records=default_buffer_records):
+        """
+        Constructs a new AhmesTraceRecorder and writes the header of the trace.
+        :param computer: an AhmesComputer
+        :param output: a binary file object
+        :param buffer_records: the number of records written to the output at once
+        """
+        assert buffer_records > 0, 'buffer_records should be positive'
+        super(AhmesTraceRecorder, self).__init__(computer)
+        self.output = output
+        self.buffer = bytearray(buffer_records * trace_record_size)
+        self.offset = 0
+        self.records = 0  # The number of records written to the output
+        output.write(trace_header)
+
+    def make_entry(self, code, instruction, function):
+        """
+        Wraps the function of an instruction so that it records a step after running.
+        """
+        size = instruction.size
+        stores = instruction.mnemonic == 'STA'
+        marks = (trace_mark_operand if size == 2 else 0) | (trace_mark_store if stores else 0)
+        buffer = self.buffer
+        buffer_size = len(buffer)
+        pack_into = trace_record_format.pack_into
+        recorder = self
+
+        def traced_function(ahmes_computer, operand):
+            pc = (ahmes_computer.pc - size) & 0xFF
+            function(ahmes_computer, operand)
+            ac = ahmes_computer.ac
+            offset = recorder.offset
+            if stores:
+                pack_into(buffer, offset, pc, code, operand, ac, ahmes_computer.flags, operand, ac, marks)
+            else:
+                pack_into(buffer, offset, pc, code, operand or 0, ac, ahmes_computer.flags, 0, 0, marks)
+            recorder.offset = offset + trace_record_size
+            if recorder.offset == buffer_size:
+                recorder.flush()
+
+        return traced_function
+
+    def disable(self):
+        super(AhmesTraceRecorder, self).disable()
+        self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered records to the output.
+        """
+        if self.offset:
+            self.output.write(memoryview(self.buffer)[:self.offset])
+            self.records += self.offset // trace_record_size
+            self.offset = 0
+        self.output.flush()
+
+
+def record_trace(computer, filename, max_steps=None, buffer_records=default_buffer_records):
+    """
+    Runs a computer, writing its trace to a file.
+    :return: the number of instructions executed
+    """
+    with open(filename, 'wb') as output:
+        recorder = AhmesTraceRecorder(computer, output, buffer_records)
+        recorder.enable()
+        try:
+            return computer.run(max_steps)
+        finally:
+            recorder.disable()
+
+
+def check_trace_header(header, filename):
+    assert header == trace_header, '{0} is not an Ahmes trace'.format(filename)
+
+
+def read_trace(filename, buffer_records=default_buffer_records):
+    """
+    Reads a trace one record at a time. A partial record at the end, which an interrupted recorder leaves behind, is
+    ignored.
+    :param filename: the path of a trace
+    :param buffer_records: the number of records read from the file at once
+    :return: a generator of AhmesTraceRecord
+    """
+    with open(filename, 'rb') as input_file:
+        check_trace_header(input_file.read(len(trace_header)), filename)
+        while True:
+            chunk = input_file.read(buffer_records * trace_record_size)
+            if len(chunk) < trace_record_size:
+                break
+            for record in trace_record_format.iter_unpack(chunk[:len(chunk) // trace_record_size * trace_record_size]):
+                yield AhmesTraceRecord._make(record)
+
+
+class AhmesTraceView(object):
+    """
+    A trace mapped into memory, which should be closed, or used in a with statement, to release the mapping.
+    """
+
+    def __init__(self, filename):
+        """
+        Maps a trace into memory. A partial record at the end, which an interrupted recorder leaves behind, is left
+        out of records.
+        :param filename: the path of a trace
+        """
+        with open(filename, 'rb') as input_file:
+            self.mapped = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.views = [memoryview(self.mapped)]
+        try:
+            check_trace_header(bytes(self.views[0][:len(trace_header)]), filename)
+        except BaseException:
+            self.close()
+            raise
+        count = (len(self.mapped) - len(trace_header)) // trace_record_size
+        self.views.append(self.views[0][len(trace_header):len(trace_header) + count * trace_record_size])
+        self.records = self.views[1].cast('B', (count, trace_record_size))
+        self.views.append(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def close(self):
+        """
+        Releases the records and unmaps the trace.
+        """
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+
+def read_trace_view(filename):
+    """
+    Maps a trace into memory.
+    :param filename: the path of a trace
+    :return: an AhmesTraceView, whose records are a read-only memoryview of shape (records, 8) with columns in the
+    order of trace_fields
+    """
+    return AhmesTraceView(filename)
+
+
+def read_trace_array(filename):
+    """
+    Maps a trace into memory as a NumPy structured array, whose fields are named after trace_fields.
+    Requires NumPy.
+    """
+    import numpy
+    with open(filename, 'rb') as input_file:
+        check_trace_header(input_file.read(len(trace_header)), filename)
+        count = (os.fstat(input_file.fileno()).st_size - len(trace_header)) // trace_record_size
+    dtype = numpy.dtype([(field, numpy.uint8) for field in trace_fields])
+    if count == 0:
+        return numpy.zeros(0, dtype)  # An empty file cannot be mapped
+    # A partial record at the end is left out, as in read_trace_view.
+    return numpy.memmap(filename, dtype=dtype, mode='r', offset=len(trace_header), shape=(count,))
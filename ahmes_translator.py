@@ -0,0 +1,237 @@
+#!/usr/bin/python
+
+import ahmes
+import ahmes_analyzer
+import ahmes_math
+
+# The longest straight-line run of instructions compiled into a single function.
+maximum_block_length = 64
+
+binary_alu_mnemonics = {'ADD', 'SUB', 'AND', 'OR'}
+
+unary_alu_mnemonics = {'NOT', 'SHR', 'SHL', 'ROR', 'ROL'}
+
+
+def make_kept_flags(mask):
+    return ~mask & (ahmes_math.nz_flag_mask | ahmes_math.flag_v | ahmes_math.flag_c | ahmes_math.flag_b)
+
+
+def make_block_namespace():
+    """
+    Makes the globals of the block functions: the lookup tables of ahmes_math, named after their operations.
+    """
+    namespace = {'nz_flags': ahmes_math.nz_flags}
+    for mnemonic in binary_alu_mnemonics | unary_alu_mnemonics:
+        results, flags = ahmes_math.get_alu_table(mnemonic)
+        namespace[mnemonic.lower() + '_results'] = results
+        namespace[mnemonic.lower() + '_flags'] = flags
+    return namespace
+
+
+def make_instruction_lines(mnemonic, operand):
+    """
+    Makes the Python lines that implement a non-jump instruction inside a block function.
+    :param mnemonic: the mnemonic of the instruction
+    :param operand: the operand of the instruction, or None
+    :return: a list of lines
+    """
+    if mnemonic == 'STA':
+        return ['store({0}, ac)'.format(operand)]
+    if mnemonic == 'LDA':
+        return ['ac = memory[{0}]'.format(operand),
+                'flags = flags & {0} | nz_flags[ac]'.format(make_kept_flags(ahmes_math.nz_flag_mask))]
+    name = mnemonic.lower()
+    kept_flags = make_kept_flags(ahmes_math.alu_flag_masks.get(mnemonic, 0))
+    if mnemonic in binary_alu_mnemonics:
+        return ['i = ac << 8 | memory[{0}]'.format(operand),
+                'ac = {0}_results[i]'.format(name),
+                'flags = flags & {0} | {1}_flags[i]'.format(kept_flags, name)]
+    if mnemonic in unary_alu_mnemonics:
+        return ['flags = flags & {0} | {1}_flags[ac]'.format(kept_flags, name),
+                'ac = {0}_results[ac]'.format(name)]
+    return []
+
+
+class AhmesBlock(object):
+    def __init__(self, function, start, addresses, length):
+        """
+        Constructs a new AhmesBlock.
+        :param function: the compiled function, which takes an AhmesComputer, its memory, and its store_byte
+        :param start: the address of the first instruction of the block
+        :param addresses: the addresses of every byte the block was translated from
+        :param length: the number of instructions in the block
+        """
+        self.function = function
+        self.start = start
+        self.addresses = addresses
+        self.length = length
+
+
+class AhmesTranslator(object):
+    """
+    Translates the basic blocks of the memory of an AhmesComputer into Python functions and runs them.
+
+    Translated blocks are invalidated whenever store_byte writes a different value into one of their bytes, and store
+    observers see the same AC, indicators, and PC as when the instructions are interpreted. Compiled functions are kept
+    by start address and content, so code that is restored to a previous state is not compiled again. Memory written
+    without store_byte is not observed; call reset after such writes.
+    """
+
+    def __init__(self, computer):
+        self.computer = computer
+        self.instruction_index = ahmes.get_ahmes_instruction_index(computer.pedantic)
+        self.memory = computer.bytes
+        self.blocks = {}
+        self.blocks_by_address = [set() for i in range(256)]
+        self.compiled_blocks = {}
+        self.namespace = make_block_namespace()
+        computer.store_observers.append(self.invalidate_address)
+
+    def reset(self):
+        """
+        Discards every translated block, keeping the compiled functions for reuse.
+        """
+        self.memory = self.computer.bytes
+        self.blocks = {}
+        self.blocks_by_address = [set() for i in range(256)]
+
+    def invalidate_address(self, address, old_value, value):
+        if old_value != value:
+            for start in list(self.blocks_by_address[address]):
+                self.invalidate_block(start)
+
+    def invalidate_block(self, start):
+        block = self.blocks.pop(start)
+        for address in block.addresses:
+            self.blocks_by_address[address].discard(start)
+
+    def decode_block(self, start):
+        """
+        Decodes the instructions of the basic block that starts at an address.
+
+        The block ends after a jump or HLT, before an instruction whose bytes are written by an earlier STA of the
+        block, or when it would overlap itself.
+        :param start: a valid address
+        :return: a list of (instruction, operand) pairs and the list of addresses they occupy
+        """
+        memory = self.memory
+        instructions = []
+        addresses = []
+        written_addresses = set()
+        address = start
+        while len(instructions) < maximum_block_length:
+            instruction = self.instruction_index[memory[address]]
+            instruction_addresses = [(address + i) & 0xFF for i in range(instruction.size)]
+            if any(a in written_addresses or a in addresses for a in instruction_addresses):
+                break
+            operand = memory[instruction_addresses[1]] if instruction.size == 2 else None
+            instructions.append((instruction, operand))
+            addresses.extend(instruction_addresses)
+            address = (address + instruction.size) & 0xFF
+            if instruction.mnemonic == 'STA':
+                written_addresses.add(operand)
+            if instruction.mnemonic in ahmes_analyzer.jump_conditions or instruction.mnemonic == 'HLT':
+                break
+        return instructions, addresses
+
+    @staticmethod
+    def make_block_source(start, instructions, addresses):
+        """
+        Makes the source code of the function that executes a block.
+
+        Before each STA the function writes back AC, the indicators, PC, and the counters, so that store observers see
+        the computer as it is when the STA executes.
+        :return: a str with the definition of a function named block
+        """
+        body = ['ac = computer.ac', 'flags = computer.flags']
+        last_instruction, last_operand = instructions[-1]
+        ends_with_jump = last_instruction.mnemonic in ahmes_analyzer.jump_conditions
+        straight_line_instructions = instructions[:-1] if ends_with_jump else instructions
+        address = start
+        executed = 0
+        memory_accesses = 0
+        for instruction, operand in straight_line_instructions:
+            address = (address + instruction.size) & 0xFF
+            executed += 1
+            memory_accesses += instruction.size
+            if instruction.mnemonic == 'STA':
+                body.extend(['computer.ac = ac', 'computer.flags = flags', 'computer.pc = {0}'.format(address),
+                             'computer.instructions += {0}'.format(executed),
+                             'computer.memory_accesses += {0}'.format(memory_accesses)])
+                executed = 0
+                memory_accesses = 0
+            body.extend(make_instruction_lines(instruction.mnemonic, operand))
+            if instruction.mnemonic in ahmes_analyzer.data_read_mnemonics:
+                memory_accesses += 1
+        if straight_line_instructions is not instructions:
+            executed += 1
+            memory_accesses += last_instruction.size
+        body.append('computer.ac = ac')
+        body.append('computer.flags = flags')
+        next_address = (start + len(addresses)) & 0xFF
+        if ends_with_jump:
+            condition = ahmes_analyzer.jump_conditions[last_instruction.mnemonic]
+            if condition is None:
+                body.append('computer.pc = {0}'.format(last_operand))
+            else:
+                flag, expected = condition
+                condition = 'flags & {0}'.format(flag) if expected else 'not flags & {0}'.format(flag)
+                body.append('computer.pc = {0} if {1} else {2}'.format(last_operand, condition, next_address))
+        else:
+            body.append('computer.pc = {0}'.format(next_address))
+            if last_instruction.mnemonic == 'HLT':
+                body.append('computer.halted = True')
+        if executed:
+            body.append('computer.instructions += {0}'.format(executed))
+        if memory_accesses:
+            body.append('computer.memory_accesses += {0}'.format(memory_accesses))
+        return 'def block(computer, memory, store):\n' + ''.join('    {0}\n'.format(line) for line in body)
+
+    def translate(self, start):
+        """
+        Translates the basic block that starts at an address, reusing a compiled function for the same content.
+        :param start: a valid address
+        :return: an AhmesBlock
+        """
+        instructions, addresses = self.decode_block(start)
+        key = (start, bytes(self.memory[address] for address in addresses))
+        function = self.compiled_blocks.get(key)
+        if function is None:
+            namespace = dict(self.namespace)
+            exec(self.make_block_source(start, instructions, addresses), namespace)
+            function = namespace['block']
+            self.compiled_blocks[key] = function
+        block = AhmesBlock(function, start, addresses, len(instructions))
+        self.blocks[start] = block
+        for address in addresses:
+            self.blocks_by_address[address].add(start)
+        return block
+
+    def run(self, max_steps=None):
+        """
+        Runs the computer block by block until it halts or max_steps instructions have been executed.
+
+        When fewer steps than the length of the next block remain, the remaining instructions are interpreted. Blocks do
+        not check breakpoints and watchpoints, so a computer that has any is interpreted.
+        :param max_steps: the maximum number of instructions to execute, or None for no limit
+        :return: the number of instructions executed
+        """
+        computer = self.computer
+        if computer.debugging:
+            return computer.run(max_steps)
+        if computer.bytes is not self.memory:
+            self.reset()
+        memory = self.memory
+        store = computer.store_byte
+        blocks = self.blocks
+        steps = 0
+        while not computer.halted and steps != max_steps:
+            block = blocks.get(computer.pc)
+            if block is None:
+                block = self.translate(computer.pc)
+            if max_steps is not None and block.length > max_steps - steps:
+                steps += computer.run(max_steps - steps)
+                break
+            block.function(computer, memory, store)
+            steps += block.length
+        return steps
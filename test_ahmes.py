@@ -1,9 +1,22 @@
 #!/usr/bin/python
 
+import os
+import tempfile
 import unittest
 import ahmes
 import ahmes_math
 
+# LDA 128, SUB 129, STA 128, JNZ 2, HLT: counts the byte at 128 down to 0 by the byte at 129.
+countdown_code = [32, 128, 112, 129, 16, 128, 164, 2, 240]
+
+
+def make_countdown_computer(counter):
+    computer = ahmes.AhmesComputer()
+    computer.bytes[0:len(countdown_code)] = countdown_code
+    computer.bytes[128] = counter
+    computer.bytes[129] = 1
+    return computer
+
 
 class TestAhmesProgram(unittest.TestCase):
     def test_set_bytes_should_assert_the_list_is_of_the_correct_size(self):
@@ -23,8 +36,51 @@ class TestAhmesProgram(unittest.TestCase):
         mixed_list_of_the_same_size[-1] = '255'
         self.assertRaises(AssertionError, program.set_bytes, mixed_list_of_the_same_size)
 
+    def test_program_should_read_every_other_byte_after_the_header(self):
+        program = ahmes.AhmesProgram('ones.mem')
+        self.assertTrue(program.initialized)
+        self.assertEqual(b'\x01' * 256, program.get_bytes())
+
+    def test_program_of_a_missing_file_should_not_be_initialized(self):
+        program = ahmes.AhmesProgram('missing.mem')
+        self.assertFalse(program.initialized)
+        self.assertEqual('Failed to initialize the program.', str(program))
+
+    def test_str_should_list_every_byte_with_its_address(self):
+        byte_list = [i % 50 for i in range(256)]
+        expected = ahmes.make_string_of_key_value_lines(list(range(256)), byte_list)
+        self.assertEqual(expected, str(ahmes.AhmesProgram.from_bytes(byte_list)))
+        self.assertEqual('  0: 1\n  1: 1', '\n'.join(str(ahmes.AhmesProgram('ones.mem')).split('\n')[:2]))
+
+    def test_save_should_write_a_file_that_loads_the_same_bytes(self):
+        byte_list = [i for i in range(256)]
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'range.mem')
+            ahmes.AhmesProgram.from_bytes(byte_list).save(filename)
+            self.assertEqual(4 + 2 * 256, os.path.getsize(filename))
+            self.assertEqual(bytes(byte_list), ahmes.AhmesProgram(filename).get_bytes())
+
+    def test_save_should_reproduce_the_original_file(self):
+        with open('ones.mem', 'rb') as open_file:
+            original = open_file.read()
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'ones.mem')
+            ahmes.AhmesProgram('ones.mem').save(filename)
+            with open(filename, 'rb') as open_file:
+                self.assertEqual(original, open_file.read())
+
 
 class TestAhmesComputer(unittest.TestCase):
+    def test_str_should_list_the_registers_and_every_byte(self):
+        computer = ahmes.AhmesComputer()
+        computer.load_program(ahmes.AhmesProgram.from_bytes([i % 7 for i in range(256)]))
+        computer.ac = 120
+        computer.pc = 3
+        keys = ['AC', 'PC'] + list(range(256))
+        values = [120, 3] + [i % 7 for i in range(256)]
+        self.assertEqual(ahmes.make_string_of_key_value_lines(keys, values), str(computer))
+        self.assertEqual(['AC : 120', 'PC :   3', '  0:   0'], str(computer).split('\n')[:3])
+
     def test_pc_should_start_as_a_valid_byte(self):
         computer = ahmes.AhmesComputer()
         self.assertTrue(ahmes_math.is_byte(computer.pc))
@@ -89,3 +145,194 @@ class TestAhmesComputer(unittest.TestCase):
         memory_accesses_after_load = computer.memory_accesses
         ahmes.load_function(computer, 128)
         self.assertEqual(memory_accesses_before_load + 1, memory_accesses_after_load)
+
+    def test_advance_should_execute_a_single_instruction(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[0:2] = [32, 128]  # LDA 128
+        computer.bytes[128] = 42
+        computer.advance()
+        self.assertEqual(42, computer.ac)
+        self.assertEqual(2, computer.pc)
+        self.assertEqual(1, computer.instructions)
+        self.assertEqual(3, computer.memory_accesses)
+
+    def test_run_should_stop_at_hlt(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[0:5] = [32, 128, 48, 129, 240]  # LDA 128, ADD 129, HLT
+        computer.bytes[128] = 20
+        computer.bytes[129] = 22
+        self.assertEqual(3, computer.run())
+        self.assertTrue(computer.halted)
+        self.assertEqual(42, computer.ac)
+        self.assertEqual(5, computer.pc)
+        self.assertEqual(0, computer.run())
+
+    def test_run_should_respect_max_steps(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[0:2] = [128, 0]  # JMP 0
+        self.assertEqual(1000, computer.run(max_steps=1000))
+        self.assertFalse(computer.halted)
+        self.assertEqual(1000, computer.instructions)
+        self.assertEqual(2000, computer.memory_accesses)
+
+    def test_run_should_execute_a_countdown_loop(self):
+        computer = make_countdown_computer(10)
+        computer.run()
+        self.assertEqual(0, computer.bytes[128])
+        self.assertEqual(1 + 10 * 3 + 1, computer.instructions)
+        self.assertEqual(3 + 10 * (3 + 3 + 2) + 1, computer.memory_accesses)
+
+    def test_add_should_set_carry_and_overflow(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[128] = 1
+        computer.ac = 255
+        ahmes.resolve_ahmes_instruction(48).function(computer, 128)
+        self.assertEqual(0, computer.ac)
+        self.assertTrue(computer.indicators.c)
+        self.assertTrue(computer.indicators.z)
+        self.assertFalse(computer.indicators.v)
+        computer.ac = 127
+        ahmes.resolve_ahmes_instruction(48).function(computer, 128)
+        self.assertTrue(computer.indicators.v)
+        self.assertTrue(computer.indicators.n)
+        self.assertFalse(computer.indicators.c)
+
+    def test_sub_should_set_borrow(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[128] = 1
+        ahmes.resolve_ahmes_instruction(112).function(computer, 128)
+        self.assertEqual(255, computer.ac)
+        self.assertTrue(computer.indicators.b)
+        self.assertTrue(computer.indicators.n)
+
+    def test_pedantic_computer_should_treat_unlisted_codes_as_nop(self):
+        computer = ahmes.AhmesComputer(pedantic=True)
+        computer.bytes[0:2] = [33, 128]  # 33 is only LDA when not pedantic
+        computer.bytes[128] = 7
+        computer.advance()
+        self.assertEqual(0, computer.ac)
+        self.assertEqual(1, computer.pc)
+
+    def test_non_pedantic_computer_should_map_code_ranges_to_instructions(self):
+        computer = ahmes.AhmesComputer(pedantic=False)
+        computer.bytes[0:2] = [33, 128]
+        computer.bytes[128] = 7
+        computer.advance()
+        self.assertEqual(7, computer.ac)
+        self.assertEqual(2, computer.pc)
+
+    def test_computer_should_not_accept_new_attributes(self):
+        computer = ahmes.AhmesComputer()
+        self.assertRaises(AttributeError, setattr, computer, 'accumulator', 0)
+
+    def test_indicators_should_be_packed_into_flags(self):
+        computer = ahmes.AhmesComputer()
+        self.assertEqual(ahmes_math.flag_z, computer.flags)
+        computer.indicators.c = True
+        self.assertEqual(ahmes_math.flag_z | ahmes_math.flag_c, computer.flags)
+        computer.indicators.z = False
+        self.assertEqual(ahmes_math.flag_c, computer.flags)
+
+    def test_get_state_should_have_260_bytes(self):
+        computer = ahmes.AhmesComputer(7, 9)
+        state = computer.get_state()
+        self.assertEqual(260, len(state))
+        self.assertEqual(bytes(computer.bytes), state[:256])
+        self.assertEqual(bytes((7, 9, computer.flags, 0)), state[256:])
+
+    def test_restore_should_undo_execution(self):
+        computer = make_countdown_computer(10)
+        computer.run(5)
+        snapshot = computer.snapshot()
+        copy_of_computer = ahmes.AhmesComputer()
+        copy_of_computer.restore(snapshot)
+        computer.run()
+        self.assertTrue(computer.halted)
+        self.assertNotEqual(computer, copy_of_computer)
+        computer.restore(snapshot)
+        self.assertEqual(copy_of_computer, computer)
+        self.assertEqual(hash(copy_of_computer), hash(computer))
+        self.assertEqual(5, computer.instructions)
+        self.assertFalse(computer.halted)
+
+    def test_instruction_indexes_should_be_built_once_per_mode(self):
+        self.assertIs(ahmes.get_ahmes_instruction_index(True), ahmes.ahmes_instructions)
+        self.assertIsNot(ahmes.get_ahmes_instruction_index(True), ahmes.get_ahmes_instruction_index(False))
+        self.assertIs(ahmes.get_ahmes_instruction_index(False), ahmes.get_ahmes_instruction_index(False))
+        self.assertEqual('LDA', ahmes.get_ahmes_instruction_index(False)[33].mnemonic)
+        self.assertEqual('NOP', ahmes.ahmes_instructions[33].mnemonic)
+        self.assertIs(ahmes.ahmes_dispatch_tables[False], ahmes.AhmesComputer(pedantic=False).dispatch_table)
+
+    def test_computers_with_different_instruction_indexes_should_not_be_equal(self):
+        self.assertEqual(ahmes.AhmesComputer(), ahmes.AhmesComputer())
+        self.assertNotEqual(ahmes.AhmesComputer(pedantic=True), ahmes.AhmesComputer(pedantic=False))
+
+    def test_pedantic_should_be_normalized_to_a_bool(self):
+        computer = ahmes.AhmesComputer(pedantic=2)
+        self.assertIs(True, computer.pedantic)
+        self.assertEqual(ahmes.AhmesComputer(pedantic=True), computer)
+        self.assertEqual(hash(ahmes.AhmesComputer(pedantic=0)), hash(ahmes.AhmesComputer(pedantic=False)))
+        self.assertIs(ahmes.ahmes_instructions, ahmes.get_ahmes_instruction_index('x'))
+        for pedantic in (2, 'x', 0.5, None):
+            with self.assertRaises(AssertionError):
+                ahmes.ahmes_dispatch_tables[pedantic]
+        self.assertEqual({True, False}, set(ahmes.ahmes_dispatch_tables))
+
+    def test_set_byte_should_not_increment_memory_accesses(self):
+        computer = ahmes.AhmesComputer()
+        computer.set_byte(1, 1)
+        self.assertEqual(1, computer.bytes[1])
+        self.assertEqual(0, computer.memory_accesses)
+        self.assertRaises(AssertionError, computer.set_byte, 1, 256)
+
+    def test_breakpoints_should_stop_before_the_instruction(self):
+        computer = make_countdown_computer(10)
+        computer.add_breakpoint(4)
+        self.assertEqual(2, computer.run())
+        self.assertEqual((4, ('breakpoint', 4)), (computer.pc, computer.stop_reason))
+        self.assertEqual(3, computer.run())  # Resuming executes the instruction at the breakpoint
+        self.assertEqual((4, 9, 8), (computer.pc, computer.bytes[128], computer.ac))
+        computer.remove_breakpoint(4)
+        self.assertFalse(computer.debugging)
+        computer.run()
+        self.assertEqual((True, None), (computer.halted, computer.stop_reason))
+
+    def test_watchpoints_should_stop_after_the_access(self):
+        computer = make_countdown_computer(10)
+        computer.add_watchpoint(128)
+        computer.run()
+        self.assertEqual((6, 9, ('write', 128)), (computer.pc, computer.bytes[128], computer.stop_reason))
+        self.assertEqual(3, computer.instructions)
+        computer.remove_watchpoint(128)
+        computer.add_watchpoint(129, read=True, write=False)
+        self.assertEqual(2, computer.run())
+        self.assertEqual((4, ('read', 129)), (computer.pc, computer.stop_reason))
+
+    def test_debugging_should_not_change_the_outcome(self):
+        computer = make_countdown_computer(200)
+        expected = make_countdown_computer(200)
+        expected.run()
+        computer.add_breakpoint(6)
+        computer.add_watchpoint(128, read=True)
+        while not computer.halted:
+            computer.run()
+        self.assertEqual(expected.snapshot(), computer.snapshot())
+
+    def test_instruments_should_define_make_entry(self):
+        self.assertRaises(TypeError, ahmes.AhmesInstrument, ahmes.AhmesComputer())
+
+        class AhmesStepCounter(ahmes.AhmesInstrument):
+            steps = 0
+
+            def make_entry(self, code, instruction, function):
+                def counted_function(ahmes_computer, operand):
+                    self.steps += 1
+                    function(ahmes_computer, operand)
+                return counted_function
+
+        computer = make_countdown_computer(3)
+        counter = AhmesStepCounter(computer)
+        counter.enable()
+        computer.run()
+        counter.disable()
+        self.assertEqual(computer.instructions, counter.steps)
@@ -0,0 +1,64 @@
+#!/usr/bin/python
+
+import unittest
+import ahmes
+import ahmes_analyzer
+import ahmes_benchmark
+
+
+class TestAhmesAnalyzer(unittest.TestCase):
+    def test_analysis_should_separate_code_from_data(self):
+        analysis = ahmes_analyzer.analyze(ahmes_benchmark.make_countdown_memory())
+        self.assertEqual(set(range(9)), analysis.code_addresses)
+        self.assertEqual({128, 129}, analysis.read_addresses)
+        self.assertEqual({128}, analysis.written_addresses)
+        self.assertEqual(set(range(9, 256)) - {128, 129}, analysis.unreachable_addresses)
+        self.assertFalse(analysis.self_modifying)
+        self.assertTrue(analysis.may_halt)
+        self.assertTrue(analysis.is_never_written(range(9)))
+        self.assertFalse(analysis.is_never_written([128]))
+
+    def test_analysis_should_find_blocks_and_loops(self):
+        analysis = ahmes_analyzer.analyze(ahmes_benchmark.make_multiplication_memory())
+        self.assertEqual({0: ([0, 2], [4]),
+                          4: ([4, 6], [8, 20]),
+                          8: ([8, 10, 12, 14, 16, 18], [4]),
+                          20: ([20], [])}, analysis.blocks)
+        self.assertEqual({(4, 8): {4, 8}}, analysis.loops)
+
+    def test_analysis_should_find_nested_loops(self):
+        analysis = ahmes_analyzer.analyze(ahmes_benchmark.make_bubble_sort_memory())
+        self.assertEqual({(0, 58), (8, 48)}, set(analysis.loops))
+        self.assertTrue(analysis.loops[(8, 48)] < analysis.loops[(0, 58)])
+
+    def test_self_modifying_programs_may_write_anything(self):
+        analysis = ahmes_analyzer.analyze(ahmes_benchmark.make_self_modifying_sum_memory())
+        self.assertTrue(analysis.self_modifying)
+        self.assertTrue(analysis.may_be_written(200))
+        self.assertFalse(analysis.is_never_written([100]))
+
+    def test_programs_without_reachable_hlt_never_halt(self):
+        memory = ahmes_benchmark.make_memory([32, 128, 128, 0, 240], {})  # LDA 128, JMP 0, HLT
+        analysis = ahmes_analyzer.analyze(memory)
+        self.assertFalse(analysis.may_halt)
+        self.assertEqual({4}, {address for address in analysis.unreachable_addresses if memory[address]})
+
+    def test_analyze_should_reuse_the_analysis_of_identical_images(self):
+        memory = ahmes_benchmark.make_countdown_memory(7)
+        self.assertIs(ahmes_analyzer.analyze(memory), ahmes_analyzer.analyze(bytearray(memory)))
+        self.assertIsNot(ahmes_analyzer.analyze(memory), ahmes_analyzer.analyze(memory, pedantic=False))
+
+    def test_run_until_access_should_stop_before_touching_the_addresses(self):
+        memory = ahmes_benchmark.make_memory([0, 0, 32, 128, 240], {})  # NOP, NOP, LDA 128, HLT
+        for addresses, steps, pc in (({128}, 2, 2), ({3}, 2, 2), ({4}, 3, 4), ({200}, 4, 5)):
+            computer = ahmes.AhmesComputer()
+            computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+            self.assertEqual(steps, ahmes_analyzer.run_until_access(computer, addresses, 100))
+            self.assertEqual(pc, computer.pc)
+        computer = ahmes.AhmesComputer()
+        computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+        self.assertEqual(1, ahmes_analyzer.run_until_access(computer, {200}, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
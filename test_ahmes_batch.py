@@ -0,0 +1,51 @@
+#!/usr/bin/python
+
+import random
+import unittest
+import ahmes
+import ahmes_benchmark
+
+try:
+    import numpy
+    import ahmes_batch
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not available')
+class TestAhmesBatchComputer(unittest.TestCase):
+    def assert_batch_matches_computers(self, memories, pedantic, steps):
+        batch = ahmes_batch.AhmesBatchComputer(memories, pedantic=pedantic)
+        batch.run(steps)
+        for i, memory in enumerate(memories):
+            computer = ahmes.AhmesComputer(pedantic=pedantic)
+            computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+            computer.run(steps)
+            self.assertEqual(computer.snapshot(), batch.get_computer(i).snapshot())
+
+    def test_batch_should_match_computers_on_random_memories_in_pedantic_mode(self):
+        generator = random.Random(0)
+        memories = [[generator.randrange(256) for j in range(256)] for i in range(64)]
+        self.assert_batch_matches_computers(memories, True, 300)
+
+    def test_batch_should_match_computers_on_random_memories_in_non_pedantic_mode(self):
+        generator = random.Random(1)
+        memories = [[generator.randrange(256) for j in range(256)] for i in range(64)]
+        self.assert_batch_matches_computers(memories, False, 300)
+
+    def test_batch_should_run_a_countdown_loop_with_different_inputs(self):
+        memories = [ahmes_benchmark.make_countdown_memory(i) for i in range(1, 11)]
+        batch = ahmes_batch.AhmesBatchComputer(memories)
+        batch.run()
+        self.assertTrue(batch.halted.all())
+        self.assertEqual([1 + 3 * i + 1 for i in range(1, 11)], batch.instructions.tolist())
+        self.assertEqual([0] * 10, batch.bytes[:, 128].tolist())
+
+    def test_halted_computers_should_not_change(self):
+        program = [0] * 256
+        program[0] = 240
+        batch = ahmes_batch.AhmesBatchComputer([program, program])
+        batch.run(10)
+        self.assertEqual([1, 1], batch.instructions.tolist())
+        self.assertEqual([1, 1], batch.pc.tolist())
+        self.assertEqual(0, batch.advance())
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_translator
+
+
+def run_memory(memory, translate=False):
+    computer = ahmes.AhmesComputer()
+    computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+    if translate:
+        ahmes_translator.AhmesTranslator(computer).run(100000)
+    else:
+        computer.run(100000)
+    return computer
+
+
+class TestAhmesBenchmark(unittest.TestCase):
+    def test_workloads_should_halt_with_both_engines(self):
+        for name, make_workload_memory in ahmes_benchmark.workloads.items():
+            interpreted = run_memory(make_workload_memory())
+            translated = run_memory(make_workload_memory(), True)
+            self.assertTrue(interpreted.halted, name)
+            self.assertEqual(interpreted.snapshot(), translated.snapshot(), name)
+
+    def test_engines_should_be_built_once_per_measurement(self):
+        computers = []
+
+        def make_run(computer):
+            computers.append(computer)
+            return computer.run
+
+        memory = ahmes_benchmark.make_countdown_memory(10)
+        self.assertGreater(ahmes_benchmark.measure_instructions_per_second(memory, make_run, 0.01), 0)
+        self.assertEqual(1, len(computers))
+
+    def test_countdown_should_reach_zero(self):
+        self.assertEqual(0, run_memory(ahmes_benchmark.make_countdown_memory(10)).bytes[128])
+
+    def test_multiplication_should_compute_the_product(self):
+        for a, b in ((13, 19), (0, 5), (5, 0), (1, 1), (15, 17)):
+            computer = run_memory(ahmes_benchmark.make_multiplication_memory(a, b))
+            self.assertEqual(a * b % 256, computer.bytes[131])
+
+    def test_bubble_sort_should_sort_the_bytes(self):
+        values = ahmes_benchmark.make_pseudorandom_bytes(ahmes_benchmark.bubble_sort_length)
+        computer = run_memory(ahmes_benchmark.make_bubble_sort_memory(values))
+        start = ahmes_benchmark.bubble_sort_start
+        self.assertEqual(sorted(values), list(computer.bytes[start:start + len(values)]))
+
+    def test_self_modifying_sum_should_add_the_bytes(self):
+        values = ahmes_benchmark.make_pseudorandom_bytes(ahmes_benchmark.self_modifying_sum_length)
+        computer = run_memory(ahmes_benchmark.make_self_modifying_sum_memory(values))
+        self.assertEqual(sum(values) % 256, computer.bytes[250])
+
+    def test_find_regressions_should_respect_the_direction_of_each_metric(self):
+        baseline = {'a.instructions_per_second': 100.0, 'str_seconds': 1.0, 'load_program_seconds': 1.0}
+        metrics = {'a.instructions_per_second': 80.0, 'str_seconds': 0.5, 'load_program_seconds': 1.05}
+        self.assertEqual(['a.instructions_per_second'],
+                         list(ahmes_benchmark.find_regressions(metrics, baseline, 0.1)))
+        metrics = {'a.instructions_per_second': 120.0, 'str_seconds': 1.5, 'load_program_seconds': 1.0}
+        self.assertEqual(['str_seconds'], list(ahmes_benchmark.find_regressions(metrics, baseline, 0.1)))
+
+    def test_run_benchmarks_should_report_every_metric(self):
+        metrics = ahmes_benchmark.run_benchmarks(minimum_time=0.0)
+        self.assertEqual(2 * len(ahmes_benchmark.workloads) + 2, len(metrics))
+        self.assertTrue(all(value > 0 for value in metrics.values()))
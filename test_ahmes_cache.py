@@ -0,0 +1,145 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import tempfile
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_cache
+import ahmes_profiler
+
+
+def make_computer(memory, pedantic=True):
+    computer = ahmes.AhmesComputer(pedantic=pedantic)
+    computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+    return computer
+
+
+def count_entries(directory):
+    return sum(len([name for name in os.listdir(os.path.join(directory, shard)) if not name.startswith('.tmp-')])
+               for shard in os.listdir(directory))
+
+
+class TestAhmesResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_make_key_should_depend_on_the_state_the_index_and_the_budget(self):
+        memory = ahmes_benchmark.make_countdown_memory()
+        key = ahmes_cache.make_key(make_computer(memory), 100)
+        self.assertEqual(key, ahmes_cache.make_key(make_computer(memory), 100))
+        self.assertNotEqual(key, ahmes_cache.make_key(make_computer(memory), 101))
+        self.assertNotEqual(ahmes_cache.make_key(make_computer(memory), 0),
+                            ahmes_cache.make_key(make_computer(memory), None))
+        self.assertNotEqual(key, ahmes_cache.make_key(make_computer(memory, pedantic=False), 100))
+        computer = make_computer(memory)
+        computer.set_ac(1)
+        self.assertNotEqual(key, ahmes_cache.make_key(computer, 100))
+        computer = make_computer(memory)
+        computer.set_byte(128, 254)
+        self.assertNotEqual(key, ahmes_cache.make_key(computer, 100))
+
+    def test_run_should_reuse_the_outcome_of_an_identical_run(self):
+        memory = ahmes_benchmark.make_multiplication_memory()
+        expected = make_computer(memory)
+        expected.run(10000)
+        cache = ahmes_cache.AhmesResultCache(self.directory)
+        for i in range(2):
+            computer = make_computer(memory)
+            self.assertEqual(expected.instructions, cache.run(computer, 10000))
+            self.assertEqual(expected.snapshot(), computer.snapshot())
+        self.assertEqual((1, 1), (cache.misses, cache.hits))
+        # Another process using the same directory sees the entry.
+        other_cache = ahmes_cache.AhmesResultCache(self.directory)
+        computer = make_computer(memory)
+        other_cache.run(computer, 10000)
+        self.assertEqual(expected.snapshot(), computer.snapshot())
+        self.assertEqual(1, other_cache.hits)
+
+    def test_run_should_accept_an_unlimited_budget(self):
+        memory = ahmes_benchmark.make_countdown_memory(3)
+        expected = make_computer(memory)
+        expected.run()
+        cache = ahmes_cache.AhmesResultCache(self.directory)
+        for i in range(2):
+            computer = make_computer(memory)
+            self.assertEqual(expected.instructions, cache.run(computer, None))
+            self.assertEqual(expected.snapshot(), computer.snapshot())
+        self.assertEqual((1, 1), (cache.misses, cache.hits))
+
+    def test_run_should_bypass_the_cache_for_computers_with_breakpoints(self):
+        memory = ahmes_benchmark.make_countdown_memory(3)
+        cache = ahmes_cache.AhmesResultCache(self.directory)
+        stopped = make_computer(memory)
+        stopped.add_breakpoint(4)
+        self.assertEqual(2, cache.run(stopped, 1000))
+        self.assertEqual(('breakpoint', 4), stopped.stop_reason)
+        computer = make_computer(memory)
+        expected = make_computer(memory)
+        expected.run(1000)
+        self.assertEqual(expected.instructions, cache.run(computer, 1000))
+        self.assertTrue(computer.halted)
+        self.assertEqual((1, 0), (cache.misses, cache.hits))
+
+    def test_run_should_bypass_the_cache_for_instrumented_computers(self):
+        memory = ahmes_benchmark.make_countdown_memory(3)
+        cache = ahmes_cache.AhmesResultCache(self.directory)
+        cache.run(make_computer(memory), 1000)
+        computer = make_computer(memory)
+        profiler = ahmes_profiler.AhmesProfiler(computer)
+        profiler.enable()
+        cache.run(computer, 1000)
+        profiler.disable()
+        self.assertEqual(1 + 3 * 3 + 1, sum(profiler.address_counts))
+        computer = make_computer(memory)
+        stores = []
+        computer.store_observers.append(lambda address, old_value, value: stores.append(value))
+        cache.run(computer, 1000)
+        self.assertEqual([2, 1, 0], stores)
+        self.assertEqual((1, 0), (cache.misses, cache.hits))
+
+    def test_run_should_add_to_the_counters_of_the_computer(self):
+        memory = ahmes_benchmark.make_countdown_memory(3)
+        cache = ahmes_cache.AhmesResultCache(self.directory)
+        cache.run(make_computer(memory), 1000)
+        computer = make_computer(memory)
+        computer.instructions = 5
+        computer.memory_accesses = 7
+        steps = cache.run(computer, 1000)
+        self.assertEqual(5 + steps, computer.instructions)
+        self.assertEqual(1, cache.hits)
+
+    def test_get_should_ignore_missing_and_truncated_entries(self):
+        cache = ahmes_cache.AhmesResultCache(self.directory)
+        key = ahmes_cache.make_key(ahmes.AhmesComputer(), 1)
+        self.assertIsNone(cache.get(key))
+        os.makedirs(os.path.dirname(cache.get_path(key)))
+        with open(cache.get_path(key), 'wb') as open_file:
+            open_file.write(b'\x00' * 10)
+        self.assertIsNone(cache.get(key))
+        os.remove(cache.get_path(key))
+        os.makedirs(cache.get_path(key))  # An entry that cannot be read as a file
+        self.assertIsNone(cache.get(key))
+
+    def test_evict_should_remove_the_least_recently_used_entries(self):
+        cache = ahmes_cache.AhmesResultCache(self.directory, max_bytes=10 * ahmes_cache.entry_size,
+                                             eviction_interval=1000)
+        keys = []
+        for i in range(20):
+            computer = ahmes.AhmesComputer()
+            computer.set_ac(i)
+            keys.append(ahmes_cache.make_key(computer, 1))
+            cache.put(keys[-1], computer.get_state(), 0, 0)
+            os.utime(cache.get_path(keys[-1]), (i, i))
+        cache.evict()
+        self.assertLessEqual(count_entries(self.directory), 9)
+        self.assertIsNotNone(cache.get(keys[-1]))
+        self.assertIsNone(cache.get(keys[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/python
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_cli
+import ahmes_runner
+import ahmes_trace
+
+
+def run_main(arguments):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        ahmes_cli.main(arguments)
+    return output.getvalue()
+
+
+class TestAhmesCli(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'multiplication.mem')
+        ahmes.AhmesProgram.from_bytes(ahmes_benchmark.make_multiplication_memory(6, 7)).save(self.filename)
+        # 33 is LDA 128 with --no-pedantic and a NOP followed by a NOP without it.
+        self.range_filename = os.path.join(self.directory, 'range.mem')
+        ahmes.AhmesProgram.from_bytes(ahmes_benchmark.make_memory([33, 128, 240], {128: 9})).save(self.range_filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_pedantic_should_be_accepted_before_and_after_the_subcommand(self):
+        parser = ahmes_cli.make_argument_parser()
+        self.assertTrue(parser.parse_args(['run', 'a.mem']).pedantic)
+        self.assertTrue(parser.parse_args(['--pedantic', 'run', 'a.mem']).pedantic)
+        self.assertFalse(parser.parse_args(['--no-pedantic', 'run', 'a.mem']).pedantic)
+        self.assertFalse(parser.parse_args(['run', 'a.mem', '--no-pedantic']).pedantic)
+        self.assertTrue(parser.parse_args(['--no-pedantic', 'run', 'a.mem', '--pedantic']).pedantic)
+
+    def test_run_should_print_the_final_state(self):
+        result = json.loads(run_main(['run', self.filename]))
+        self.assertEqual('halted', result['halt_reason'])
+        self.assertEqual(self.filename, result['filename'])
+
+    def test_run_should_use_the_selected_instruction_index(self):
+        self.assertEqual(0, json.loads(run_main(['run', self.range_filename]))['ac'])
+        self.assertEqual(9, json.loads(run_main(['run', self.range_filename, '--no-pedantic']))['ac'])
+        self.assertEqual(ahmes_runner.run_program_file(self.range_filename),
+                         json.loads(run_main(['run', self.range_filename])))
+
+    def test_batch_should_print_a_result_per_file(self):
+        results = [json.loads(line) for line in run_main(['batch', self.directory, '--workers', '1']).splitlines()]
+        self.assertEqual(sorted([self.filename, self.range_filename]), sorted(result['filename'] for result in results))
+
+    def test_trace_should_write_a_record_per_instruction(self):
+        trace_filename = os.path.join(self.directory, 'multiplication.aht')
+        result = json.loads(run_main(['trace', self.filename, trace_filename]))
+        self.assertEqual(result['instructions'], len(list(ahmes_trace.read_trace(trace_filename))))
+
+    def test_profile_should_print_a_report(self):
+        self.assertIn('Mnemonics\n', run_main(['profile', self.filename]))
+        self.assertIn('Cycles\n', run_main(['profile', self.filename, '--cycles']))
+
+    def test_missing_file_should_exit_with_a_message(self):
+        self.assertRaises(SystemExit, run_main, ['profile', os.path.join(self.directory, 'missing.mem')])
+
+    def test_importing_should_not_build_tables_or_load_heavy_modules(self):
+        code = ('import sys, ahmes_cli, ahmes; '
+                'print(len(ahmes.ahmes_instruction_indexes), len(ahmes.ahmes_dispatch_tables), '
+                '"numpy" in sys.modules, "concurrent.futures" in sys.modules, "multiprocessing" in sys.modules)')
+        directory = os.path.dirname(os.path.abspath(ahmes_cli.__file__))
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=directory)
+        self.assertEqual('0 0 False False False', output.decode().strip())
+
+
+if __name__ == '__main__':
+    unittest.main()
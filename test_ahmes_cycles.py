@@ -0,0 +1,78 @@
+#!/usr/bin/python
+
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_cycles
+
+
+def make_computer(memory):
+    computer = ahmes.AhmesComputer()
+    computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+    return computer
+
+
+class TestAhmesCycles(unittest.TestCase):
+    def test_cost_model_should_price_each_instruction_class(self):
+        model = ahmes_cycles.AhmesCostModel()
+        cycles = {mnemonic: model.get_cycles(ahmes.resolve_ahmes_instruction(code))
+                  for mnemonic, code in (('NOP', 0), ('STA', 16), ('LDA', 32), ('NOT', 96), ('JMP', 128), ('HLT', 240))}
+        self.assertEqual({'NOP': 3, 'STA': 7, 'LDA': 7, 'NOT': 3, 'JMP': 5, 'HLT': 3}, cycles)
+        model = ahmes_cycles.AhmesCostModel(1, 1, 4, overrides={'HLT': 0})
+        self.assertEqual(6, model.get_cycles(ahmes.resolve_ahmes_instruction(32)))
+        self.assertEqual(0, model.get_cycles(ahmes.resolve_ahmes_instruction(240)))
+
+    def test_counter_should_report_cycles_per_mnemonic_block_and_loop(self):
+        computer = make_computer(ahmes_benchmark.make_countdown_memory(10))
+        counter = ahmes_cycles.AhmesCycleCounter(computer)
+        counter.enable()
+        computer.run()
+        counter.disable()
+        report = counter.as_dict()
+        # LDA once, then SUB, STA, and JNZ ten times each, then HLT.
+        self.assertEqual(7 + 10 * (7 + 7 + 5) + 3, report['cycles'])
+        self.assertEqual({'LDA': 7, 'SUB': 70, 'STA': 70, 'JNZ': 50, 'HLT': 3}, report['mnemonics'])
+        self.assertEqual({0: 7, 2: 190, 8: 3}, {start: block['cycles'] for start, block in report['blocks'].items()})
+        self.assertEqual(6, report['blocks'][2]['end'])
+        self.assertEqual([(2, 6)], list(report['loops']))
+        self.assertAlmostEqual(190 / 200, report['loops'][(2, 6)]['share'])
+        self.assertIn('Loops', str(counter))
+
+    def test_loops_should_only_count_the_blocks_they_execute(self):
+        # LDA 128, SUB 129, JMP 8, NOT, HLT, STA 128, JNZ 2, JMP 6: the loop from 2 to 10 jumps over NOT and HLT,
+        # which run once after it through a backward jump that closes no loop.
+        computer = make_computer(ahmes_benchmark.make_memory([32, 128, 112, 129, 128, 8, 96, 240, 16, 128, 164, 2, 128,
+                                                              6], {128: 3, 129: 1}))
+        counter = ahmes_cycles.AhmesCycleCounter(computer)
+        counter.enable()
+        computer.run()
+        report = counter.as_dict()
+        self.assertEqual({0: 7, 2: 36, 6: 6, 8: 36, 12: 5},
+                         {start: block['cycles'] for start, block in report['blocks'].items()})
+        self.assertEqual({(2, 10): 72}, {key: loop['cycles'] for key, loop in report['loops'].items()})
+
+    def test_jumps_not_taken_should_not_close_loops(self):
+        # LDA 128, JNZ 0 at the end of memory falls through to address 0, which is also its target, and halts there.
+        computer = make_computer(ahmes_benchmark.make_memory([240], {252: 32, 253: 128, 254: 164, 255: 0}))
+        computer.pc = 252
+        counter = ahmes_cycles.AhmesCycleCounter(computer)
+        counter.enable()
+        computer.run()
+        self.assertTrue(computer.halted)
+        self.assertEqual({}, counter.as_dict()['loops'])
+
+    def test_counted_computer_should_match_uncounted_computer(self):
+        memory = ahmes_benchmark.make_bubble_sort_memory()
+        expected = make_computer(memory)
+        expected.run()
+        computer = make_computer(memory)
+        counter = ahmes_cycles.AhmesCycleCounter(computer)
+        counter.enable()
+        computer.run()
+        self.assertEqual(expected.snapshot(), computer.snapshot())
+        blocks = counter.as_dict()['blocks']
+        self.assertEqual(counter.total_cycles, sum(block['cycles'] for block in blocks.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
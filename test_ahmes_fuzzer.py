@@ -0,0 +1,93 @@
+#!/usr/bin/python
+
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_fuzzer
+
+
+def make_sum_memory():
+    """
+    Doubles the byte at 140 before adding the input at 128 to it, leaving the sum at 130.
+    """
+    code = [32, 140,  # 0: LDA 140
+            48, 140,  # 2: ADD 140
+            16, 141,  # 4: STA 141
+            32, 128,  # 6: LDA 128
+            48, 141,  # 8: ADD 141
+            16, 130,  # 10: STA 130
+            240]  # 12: HLT
+    return ahmes_benchmark.make_memory(code, {128: 5, 140: 20})
+
+
+def check_sum_does_not_overflow(computer):
+    if computer.bytes[130] < 40:
+        return 'the sum overflowed'
+    return None
+
+
+class TestAhmesFuzzer(unittest.TestCase):
+    def test_parse_addresses_should_expand_ranges(self):
+        self.assertEqual([128, 129, 130, 140], ahmes_fuzzer.parse_addresses('128-130,140'))
+        self.assertEqual([16], ahmes_fuzzer.parse_addresses('0x10'))
+        self.assertRaises(AssertionError, ahmes_fuzzer.parse_addresses, '250-256')
+
+    def test_fork_should_be_taken_before_the_first_input_access(self):
+        fuzzer = ahmes_fuzzer.AhmesFuzzer(make_sum_memory(), [128])
+        self.assertEqual(3, fuzzer.fork_steps)
+        self.assertEqual(6, fuzzer.fork[0][257])
+
+    def test_execute_should_match_running_the_loaded_program(self):
+        memory = make_sum_memory()
+        fuzzer = ahmes_fuzzer.AhmesFuzzer(memory, [128])
+        for value in (0, 1, 100, 255):
+            memory[128] = value
+            computer = ahmes.AhmesComputer()
+            computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+            computer.run()
+            result = fuzzer.execute(bytes([value]))
+            expected_state = bytearray(computer.get_state())
+            expected_state[128] = 0
+            self.assertEqual(bytes(expected_state), result.state)
+            self.assertIsNone(result.crash)
+        self.assertEqual(ahmes.ahmes_dispatch_tables[True], fuzzer.computer.dispatch_table)
+
+    def test_fuzz_should_cover_both_directions_of_the_loop_exit(self):
+        fuzzer = ahmes_fuzzer.AhmesFuzzer(ahmes_benchmark.make_multiplication_memory(13, 0), [128, 129],
+                                          max_steps=2000, seed=1)
+        self.assertEqual([(6, True)], fuzzer.covered_branches)
+        self.assertEqual([0, 2, 4, 6, 20], fuzzer.covered_addresses)
+        self.assertEqual(1, len(fuzzer.corpus))
+        fuzzer.fuzz(200)
+        self.assertEqual([(6, False), (6, True)], fuzzer.covered_branches)
+        self.assertEqual(list(range(0, 22, 2)), fuzzer.covered_addresses)
+        self.assertGreater(len(fuzzer.corpus), 1)
+        self.assertEqual(200, fuzzer.executions)
+
+    def test_runs_out_of_budget_should_be_reported_as_crashes(self):
+        fuzzer = ahmes_fuzzer.AhmesFuzzer(ahmes_benchmark.make_countdown_memory(3), [128], max_steps=100, seed=1)
+        self.assertEqual({}, fuzzer.crashes)
+        fuzzer.fuzz(300)
+        self.assertTrue(fuzzer.crashes)
+        for crash in fuzzer.crashes.values():
+            self.assertEqual('step_limit', crash.kind)
+            self.assertGreater(crash.inputs[0], 24)
+
+    def test_states_rejected_by_the_check_should_be_reported_as_crashes(self):
+        fuzzer = ahmes_fuzzer.AhmesFuzzer(make_sum_memory(), [128], check=check_sum_does_not_overflow, seed=1)
+        fuzzer.fuzz(300)
+        crashes = list(fuzzer.crashes.values())
+        self.assertEqual(1, len(crashes))
+        self.assertEqual(('assertion', 13, 'the sum overflowed'), crashes[0][:3])
+        self.assertGreaterEqual(crashes[0].inputs[0], 216)
+
+    def test_fuzz_in_workers_should_merge_the_corpora(self):
+        fuzzer = ahmes_fuzzer.fuzz_in_workers(make_sum_memory(), [128], 400, workers=2, rounds=2,
+                                              check=check_sum_does_not_overflow)
+        self.assertEqual(400, fuzzer.executions)
+        self.assertGreater(len(fuzzer.corpus), 1)
+        self.assertEqual(['assertion'], [crash.kind for crash in fuzzer.crashes.values()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/python
+
+import unittest
+import ahmes
+import ahmes_journal
+
+
+def make_counting_computer():
+    computer = ahmes.AhmesComputer()
+    # LDA 128, ADD 129, STA 128, JMP 0
+    computer.bytes[0:8] = [32, 128, 48, 129, 16, 128, 128, 0]
+    computer.bytes[129] = 1
+    return computer
+
+
+class TestAhmesJournal(unittest.TestCase):
+    def test_step_back_should_restore_the_previous_states(self):
+        computer = make_counting_computer()
+        journal = ahmes_journal.AhmesJournal(computer)
+        snapshots = []
+        for i in range(20):
+            snapshots.append(computer.snapshot())
+            journal.step()
+        for i in range(19, -1, -1):
+            self.assertEqual(1, journal.step_back())
+            self.assertEqual(snapshots[i], computer.snapshot())
+        self.assertEqual(0, journal.step_back())
+
+    def test_step_back_far_should_use_checkpoints(self):
+        computer = make_counting_computer()
+        journal = ahmes_journal.AhmesJournal(computer, checkpoint_interval=16)
+        journal.step(50)
+        expected = computer.snapshot()
+        journal.step(100)
+        self.assertEqual(len(journal.checkpoints), 1 + 150 // 16)
+        self.assertEqual(100, journal.step_back(100))
+        self.assertEqual(expected, computer.snapshot())
+        self.assertEqual(50, len(journal))
+        self.assertEqual(1 + 50 // 16, len(journal.checkpoints))
+
+    def test_step_back_far_should_ignore_breakpoints_and_watchpoints(self):
+        computer = make_counting_computer()
+        computer.add_breakpoint(4)
+        computer.add_watchpoint(128, read=True)
+        journal = ahmes_journal.AhmesJournal(computer, checkpoint_interval=64)
+        snapshots = []
+        for i in range(100):
+            snapshots.append(computer.snapshot())
+            journal.step()
+        self.assertEqual(70, journal.step_back(70))
+        self.assertEqual(snapshots[30], computer.snapshot())
+        self.assertEqual(30, len(journal))
+        self.assertIsNone(computer.stop_reason)
+
+    def test_step_back_should_undo_halting(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[0] = 240
+        journal = ahmes_journal.AhmesJournal(computer)
+        self.assertEqual(1, journal.step(10))
+        self.assertTrue(computer.halted)
+        journal.step_back()
+        self.assertFalse(computer.halted)
+        self.assertEqual(0, computer.pc)
+
+    def test_run_back_to_should_stop_at_the_most_recent_visit_of_the_address(self):
+        computer = make_counting_computer()
+        journal = ahmes_journal.AhmesJournal(computer)
+        journal.step(10)  # Ends at PC 4 with 128 holding 2
+        self.assertEqual(4, computer.pc)
+        self.assertEqual(4, journal.run_back_to(4))
+        self.assertEqual(4, computer.pc)
+        self.assertEqual(1, computer.bytes[128])
+        self.assertIsNone(journal.run_back_to(100))
+
+    def test_undo_should_notify_store_observers(self):
+        computer = make_counting_computer()
+        journal = ahmes_journal.AhmesJournal(computer)
+        stores = []
+        computer.store_observers.append(lambda address, old_value, value: stores.append((address, old_value, value)))
+        journal.step(3)
+        journal.step_back()
+        self.assertEqual([(128, 0, 1), (128, 1, 0)], stores)
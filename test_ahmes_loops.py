@@ -0,0 +1,63 @@
+#!/usr/bin/python
+
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_loops
+
+
+class TestAhmesLoopDetector(unittest.TestCase):
+    def test_jump_to_itself_should_be_a_loop_of_period_one(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[0:2] = [128, 0]  # JMP 0
+        detector = ahmes_loops.AhmesLoopDetector(computer)
+        # The repeated hash is found after the first chunk, and a single instruction verifies it.
+        self.assertEqual(ahmes_loops.default_chunk_steps + 1, detector.run(1000))
+        self.assertEqual(1, detector.period)
+        self.assertEqual('looping, period 1', str(detector))
+
+    def test_periods_that_do_not_divide_the_chunk_should_be_found_exactly(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[0:4] = [0, 0, 128, 0]  # NOP, NOP, JMP 0
+        detector = ahmes_loops.AhmesLoopDetector(computer, chunk_steps=64)
+        detector.run(1000)
+        self.assertEqual(3, detector.period)
+
+    def test_loops_that_write_memory_should_be_found_after_their_state_repeats(self):
+        computer = ahmes.AhmesComputer()
+        # LDA 128, ADD 129, STA 128, JMP 0: the counter at 128 wraps around after 256 iterations
+        computer.bytes[0:8] = [32, 128, 48, 129, 16, 128, 128, 0]
+        computer.bytes[129] = 1
+        detector = ahmes_loops.AhmesLoopDetector(computer)
+        detector.run(100000)
+        self.assertEqual(4 * 256, detector.period)
+        self.assertLess(computer.instructions, 3 * 4 * 256)
+
+    def test_halting_programs_should_not_be_reported_as_loops(self):
+        computer = ahmes.AhmesComputer()
+        computer.load_program(ahmes.AhmesProgram.from_bytes(ahmes_benchmark.make_countdown_memory(100)))
+        detector = ahmes_loops.AhmesLoopDetector(computer)
+        detector.run()
+        self.assertTrue(computer.halted)
+        self.assertIsNone(detector.period)
+
+    def test_step_budget_should_be_respected(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[0:8] = [32, 128, 48, 129, 16, 128, 128, 0]
+        computer.bytes[129] = 1
+        detector = ahmes_loops.AhmesLoopDetector(computer)
+        self.assertEqual(100, detector.run(100))
+        self.assertEqual(100, computer.instructions)
+        self.assertIsNone(detector.period)
+
+    def test_memory_hash_should_follow_store_byte_while_running(self):
+        computer = ahmes.AhmesComputer()
+        computer.load_program(ahmes.AhmesProgram.from_bytes(ahmes_benchmark.make_countdown_memory(100)))
+        detector = ahmes_loops.AhmesLoopDetector(computer)
+        initial_hash = detector.memory_hash
+        detector.run(50)
+        self.assertNotEqual(initial_hash, detector.memory_hash)
+        self.assertEqual([], computer.store_observers)
+        running_hash = detector.memory_hash
+        detector.rehash_memory()
+        self.assertEqual(detector.memory_hash, running_hash)
@@ -115,3 +115,47 @@ class TestByteMath(unittest.TestCase):
     def test_rotate_right_should_equal_shift_right_for_bytes_with_the_least_significant_bit_unset(self):
         for i in range(0, 256, 2):
             self.assertEqual(ahmes_math.shift_right(i), ahmes_math.rotate_right(i))
+
+    def test_make_nz_flags_should_set_n_only_for_bytes_with_the_most_significant_bit_set(self):
+        for i in range(256):
+            self.assertEqual(i >= 128, ahmes_math.make_nz_flags(i) & ahmes_math.flag_n != 0)
+            self.assertEqual(i == 0, ahmes_math.make_nz_flags(i) & ahmes_math.flag_z != 0)
+
+    def test_add_with_flags_should_compute_carry_and_overflow(self):
+        self.assertEqual((0, ahmes_math.flag_z | ahmes_math.flag_c), ahmes_math.add_with_flags(255, 1))
+        self.assertEqual((128, ahmes_math.flag_n | ahmes_math.flag_v), ahmes_math.add_with_flags(127, 1))
+        self.assertEqual((0, ahmes_math.flag_z | ahmes_math.flag_v | ahmes_math.flag_c),
+                         ahmes_math.add_with_flags(128, 128))
+        self.assertEqual((3, 0), ahmes_math.add_with_flags(1, 2))
+
+    def test_subtract_with_flags_should_compute_borrow_and_overflow(self):
+        self.assertEqual((255, ahmes_math.flag_n | ahmes_math.flag_b), ahmes_math.subtract_with_flags(0, 1))
+        self.assertEqual((127, ahmes_math.flag_v), ahmes_math.subtract_with_flags(128, 1))
+        self.assertEqual((0, ahmes_math.flag_z), ahmes_math.subtract_with_flags(7, 7))
+
+    def test_shift_and_rotate_with_flags_should_set_carry_to_the_bit_shifted_out(self):
+        self.assertEqual((0, ahmes_math.flag_z | ahmes_math.flag_c), ahmes_math.shift_right_with_flags(1))
+        self.assertEqual((0, ahmes_math.flag_z | ahmes_math.flag_c), ahmes_math.shift_left_with_flags(128))
+        self.assertEqual((128, ahmes_math.flag_n | ahmes_math.flag_c), ahmes_math.rotate_right_with_flags(1))
+        self.assertEqual((1, ahmes_math.flag_c), ahmes_math.rotate_left_with_flags(128))
+
+    def test_binary_alu_tables_should_match_their_operations(self):
+        for mnemonic in ('ADD', 'SUB', 'AND', 'OR'):
+            results, flags = ahmes_math.get_alu_table(mnemonic)
+            self.assertEqual(65536, len(results))
+            self.assertEqual(65536, len(flags))
+            for a in range(0, 256, 7):
+                for b in range(0, 256, 5):
+                    index = a << 8 | b
+                    self.assertEqual(ahmes_math.alu_operations[mnemonic](a, b), (results[index], flags[index]))
+
+    def test_unary_alu_tables_should_match_their_operations(self):
+        for mnemonic in ('NOT', 'SHR', 'SHL', 'ROR', 'ROL'):
+            results, flags = ahmes_math.get_alu_table(mnemonic)
+            for i in range(256):
+                self.assertEqual(ahmes_math.alu_operations[mnemonic](i), (results[i], flags[i]))
+
+    def test_alu_flags_should_only_use_the_bits_of_the_affected_indicators(self):
+        for mnemonic in ahmes_math.alu_operations:
+            results, flags = ahmes_math.get_alu_table(mnemonic)
+            self.assertFalse(any(flag & ~ahmes_math.alu_flag_masks[mnemonic] for flag in flags))
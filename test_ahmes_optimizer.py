@@ -0,0 +1,94 @@
+#!/usr/bin/python
+
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_optimizer
+
+
+def optimize(code, data, constant_addresses=()):
+    program = ahmes.AhmesProgram.from_bytes(ahmes_benchmark.make_memory(code, data))
+    return ahmes_optimizer.optimize(program, max_steps=10000, constant_addresses=constant_addresses)
+
+
+class TestAhmesOptimizer(unittest.TestCase):
+    def assert_optimized(self, optimization, rewrites, instructions_before, instructions_after):
+        self.assertTrue(optimization.verified, optimization.make_report())
+        self.assertEqual(rewrites, optimization.rewrites)
+        self.assertEqual(instructions_before, optimization.original_result['instructions'])
+        self.assertEqual(instructions_after, optimization.optimized_result['instructions'])
+
+    def test_redundant_loads_should_be_removed(self):
+        optimization = optimize([32, 128,  # 0: LDA 128
+                                 16, 129,  # 2: STA 129
+                                 32, 129,  # 4: LDA 129
+                                 32, 129,  # 6: LDA 129
+                                 48, 128,  # 8: ADD 128
+                                 16, 130,  # 10: STA 130
+                                 240],  # 12: HLT
+                                {128: 7})
+        self.assert_optimized(optimization, {'redundant loads': 2}, 7, 5)
+
+    def test_jumps_should_be_threaded_and_removed_when_they_go_to_the_next_instruction(self):
+        optimization = optimize([32, 128,  # 0: LDA 128
+                                 160, 6,  # 2: JZ 6
+                                 128, 6,  # 4: JMP 6
+                                 128, 8,  # 6: JMP 8
+                                 240],  # 8: HLT
+                                {128: 1})
+        self.assert_optimized(optimization, {'threaded jumps': 2, 'jumps to the next instruction': 3}, 5, 2)
+        self.assertEqual([32, 128, 240], list(optimization.program.get_bytes()[:3]))
+
+    def test_constant_loads_should_be_folded_when_the_indicators_are_not_read(self):
+        code = [32, 128,  # 0: LDA 128
+                96,  # 2: NOT
+                48, 129,  # 3: ADD 129
+                16, 130,  # 5: STA 130
+                32, 131,  # 7: LDA 131 (clears C before HLT)
+                48, 131,  # 9: ADD 131
+                240]  # 11: HLT
+        optimization = optimize(code, {128: 5, 129: 10, 131: 0}, {128, 129, 131})
+        self.assert_optimized(optimization, {'folded constants': 2}, 7, 5)
+        optimized_bytes = optimization.program.get_bytes()
+        self.assertEqual((250 + 10) & 0xFF, optimized_bytes[optimized_bytes[1]])
+        # C is read by the jump, so the ADD that sets it is kept.
+        optimization = optimize([32, 128, 48, 129, 176, 7, 240, 240], {128: 250, 129: 10}, {128, 129})
+        self.assertEqual({}, optimization.rewrites)
+
+    def test_inputs_should_not_be_folded(self):
+        code = [32, 128,  # 0: LDA 128
+                96,  # 2: NOT
+                16, 130,  # 3: STA 130
+                240]  # 5: HLT
+        optimization = optimize(code, {128: 5})
+        self.assert_optimized(optimization, {}, 4, 4)
+        computer = ahmes.AhmesComputer()
+        computer.load_program(optimization.program)
+        computer.set_byte(128, 9)
+        computer.run()
+        self.assertEqual(~9 & 0xFF, computer.bytes[130])
+        optimization = optimize(code, {128: 5}, {128})
+        self.assert_optimized(optimization, {'folded constants': 1}, 4, 3)
+
+    def test_leaders_should_not_be_removed(self):
+        optimization = optimize([32, 128,  # 0: LDA 128
+                                 16, 129,  # 2: STA 129
+                                 32, 129,  # 4: LDA 129 (entered from the jump)
+                                 112, 130,  # 6: SUB 130
+                                 16, 129,  # 8: STA 129
+                                 164, 4,  # 10: JNZ 4
+                                 240],  # 12: HLT
+                                {128: 3, 130: 1})
+        self.assertTrue(optimization.verified)
+        self.assertEqual({}, optimization.rewrites)
+
+    def test_self_modifying_programs_should_be_left_unchanged(self):
+        program = ahmes.AhmesProgram.from_bytes(ahmes_benchmark.make_self_modifying_sum_memory())
+        optimization = ahmes_optimizer.optimize(program)
+        self.assertIs(program, optimization.program)
+        self.assertIsNotNone(optimization.reason)
+        self.assertIn('Not optimized', str(optimization))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+
+import io
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_cycles
+import ahmes_profiler
+import ahmes_trace
+
+
+def make_countdown_computer(counter):
+    computer = ahmes.AhmesComputer()
+    computer.load_program(ahmes.AhmesProgram.from_bytes(ahmes_benchmark.make_countdown_memory(counter)))
+    return computer
+
+
+class TestAhmesProfiler(unittest.TestCase):
+    def test_profiler_should_count_executions_accesses_and_branches(self):
+        computer = make_countdown_computer(10)
+        profiler = ahmes_profiler.AhmesProfiler(computer)
+        profiler.enable()
+        computer.run()
+        profile = profiler.as_dict()
+        self.assertEqual({0: 1, 2: 10, 4: 10, 6: 10, 8: 1}, profile['addresses'])
+        self.assertEqual({'LDA': 1, 'SUB': 10, 'STA': 10, 'JNZ': 10, 'HLT': 1}, profile['mnemonics'])
+        self.assertEqual({128: 1, 129: 10}, profile['reads'])
+        self.assertEqual({128: 10}, profile['writes'])
+        self.assertEqual({6: {'taken': 9, 'not_taken': 1}}, profile['branches'])
+
+    def test_disabled_profiler_should_not_count(self):
+        computer = make_countdown_computer(10)
+        profiler = ahmes_profiler.AhmesProfiler(computer)
+        profiler.enable()
+        computer.run(5)
+        profiler.disable()
+        computer.run()
+        self.assertEqual(5, sum(profiler.mnemonic_counts))
+        self.assertIs(ahmes.ahmes_dispatch_tables[True], computer.dispatch_table)
+
+    def test_instruments_should_stack(self):
+        computer = make_countdown_computer(5)
+        profiler = ahmes_profiler.AhmesProfiler(computer)
+        output = io.BytesIO()
+        recorder = ahmes_trace.AhmesTraceRecorder(computer, output)
+        counter = ahmes_cycles.AhmesCycleCounter(computer)
+        profiler.enable()
+        recorder.enable()
+        counter.enable()
+        self.assertEqual(17, computer.run())
+        self.assertRaises(AssertionError, profiler.disable)
+        counter.disable()
+        recorder.disable()
+        profiler.disable()
+        self.assertEqual(17, sum(profiler.mnemonic_counts))
+        self.assertEqual(17, recorder.records)
+        self.assertEqual(7 + 5 * (7 + 7 + 5) + 3, counter.total_cycles)
+        self.assertIs(ahmes.ahmes_dispatch_tables[True], computer.dispatch_table)
+
+    def test_profiled_computer_should_match_unprofiled_computer(self):
+        computer = make_countdown_computer(200)
+        profiled_computer = make_countdown_computer(200)
+        ahmes_profiler.AhmesProfiler(profiled_computer).enable()
+        computer.run()
+        profiled_computer.run()
+        self.assertEqual(computer.snapshot(), profiled_computer.snapshot())
+
+    def test_report_should_list_the_most_executed_addresses_first(self):
+        computer = make_countdown_computer(10)
+        profiler = ahmes_profiler.AhmesProfiler(computer)
+        profiler.enable()
+        computer.run()
+        report = profiler.make_report(limit=2)
+        self.assertIn('Addresses\n2: 10\n4: 10', report)
+        self.assertIn('Branches\n6: 9 taken, 1 not taken', report)
+
+    def test_reset_should_clear_the_counters(self):
+        computer = make_countdown_computer(10)
+        profiler = ahmes_profiler.AhmesProfiler(computer)
+        profiler.enable()
+        computer.run()
+        profiler.reset()
+        self.assertEqual({'addresses': {}, 'mnemonics': {}, 'reads': {}, 'writes': {}, 'branches': {}},
+                         profiler.as_dict())
+        str(profiler)
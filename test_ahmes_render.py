@@ -0,0 +1,69 @@
+#!/usr/bin/python
+
+import io
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_render
+
+
+def make_computer(memory):
+    computer = ahmes.AhmesComputer()
+    computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+    return computer
+
+
+class TestAhmesRender(unittest.TestCase):
+    def test_hex_dump_should_have_sixteen_rows_of_sixteen_bytes(self):
+        lines = ahmes_render.make_hex_dump(bytes(range(256))).splitlines()
+        self.assertEqual(17, len(lines))
+        self.assertEqual('    00 01 02 03 04 05 06 07 08 09 0A 0B 0C 0D 0E 0F', lines[0])
+        self.assertEqual('00: 00 01 02 03 04 05 06 07 08 09 0A 0B 0C 0D 0E 0F', lines[1])
+        self.assertEqual('F0: F0 F1 F2 F3 F4 F5 F6 F7 F8 F9 FA FB FC FD FE FF', lines[16])
+
+    def test_hex_dump_should_assert_the_memory_has_256_bytes(self):
+        self.assertRaises(AssertionError, ahmes_render.make_hex_dump, bytes(255))
+
+    def test_computer_dump_should_start_with_the_registers(self):
+        computer = make_computer(ahmes_benchmark.make_multiplication_memory())
+        computer.run()
+        first_line = ahmes_render.make_computer_dump(computer).split('\n')[0]
+        self.assertEqual('AC {0:02X}  PC {1:02X}  {2}  halted'.format(
+            computer.ac, computer.pc, ahmes_render.flag_strings[computer.flags]), first_line)
+        self.assertEqual('N---B', ahmes_render.flag_strings[0x11])
+
+    def test_diff_should_list_only_what_changed(self):
+        computer = make_computer(ahmes_benchmark.make_multiplication_memory())
+        snapshot = computer.snapshot()
+        self.assertEqual('', ahmes_render.make_diff(snapshot, computer))
+        computer.run()
+        diff = ahmes_render.make_diff(snapshot, computer)
+        old_state = snapshot[0]
+        changed = [address for address in range(256) if old_state[address] != computer.bytes[address]]
+        lines = diff.splitlines()
+        self.assertIn('HLT: halted', lines)
+        self.assertIn('{0:3}: {1:3} -> {2:3}'.format(131, old_state[131], computer.bytes[131]), lines)
+        self.assertEqual(len(changed), len([line for line in lines if line[:3].strip().isdigit()]))
+        self.assertEqual(diff, ahmes_render.make_diff(old_state, computer))
+
+    def test_writer_should_write_a_complete_dump_and_then_changes(self):
+        computer = make_computer(ahmes_benchmark.make_countdown_memory(3))
+        output = io.StringIO()
+        writer = ahmes_render.AhmesDumpWriter(output)
+        self.assertIsNone(writer.write(computer))
+        self.assertIn(ahmes_render.make_computer_dump(computer), output.getvalue())
+        start = len(output.getvalue())
+        snapshot = computer.snapshot()
+        computer.run(4)
+        changes = writer.write(computer)
+        written = output.getvalue()[start:]
+        self.assertEqual('# 4 instructions\n' + ahmes_render.make_diff(snapshot, computer), written)
+        self.assertEqual(changes, written.count('\n') - 1)
+        self.assertEqual(0, writer.write(computer))
+        writer.reset()
+        self.assertIsNone(writer.write(computer))
+        self.assertEqual(4, writer.dumps)
+
+
+if __name__ == '__main__':
+    unittest.main()
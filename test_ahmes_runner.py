@@ -0,0 +1,82 @@
+#!/usr/bin/python
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import ahmes
+import ahmes_cache
+import ahmes_runner
+
+
+class TestAhmesRunner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        halting = [0] * 256
+        halting[0:5] = [32, 128, 48, 129, 240]  # LDA 128, ADD 129, HLT
+        halting[128] = 20
+        halting[129] = 22
+        looping = [0] * 256
+        looping[0:2] = [128, 0]  # JMP 0
+        ahmes.AhmesProgram.from_bytes(halting).save(os.path.join(self.directory, 'halting.mem'))
+        ahmes.AhmesProgram.from_bytes(looping).save(os.path.join(self.directory, 'looping.mem'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_find_program_files_should_accept_directories_and_globs(self):
+        expected = [os.path.join(self.directory, 'halting.mem'), os.path.join(self.directory, 'looping.mem')]
+        self.assertEqual(expected, ahmes_runner.find_program_files(self.directory))
+        self.assertEqual(expected[:1], ahmes_runner.find_program_files(os.path.join(self.directory, 'h*.mem')))
+
+    def test_run_program_file_should_report_the_halt_reason(self):
+        halting = ahmes_runner.run_program_file(os.path.join(self.directory, 'halting.mem'), 100)
+        self.assertEqual('halted', halting['halt_reason'])
+        self.assertEqual(42, halting['ac'])
+        self.assertEqual(3, halting['instructions'])
+        looping = ahmes_runner.run_program_file(os.path.join(self.directory, 'looping.mem'), 100)
+        self.assertEqual('step_limit', looping['halt_reason'])
+        self.assertEqual(100, looping['instructions'])
+        missing = ahmes_runner.run_program_file(os.path.join(self.directory, 'missing.mem'), 100)
+        self.assertEqual('load_error', missing['halt_reason'])
+
+    def test_run_program_file_should_report_unreadable_paths_as_load_errors(self):
+        os.mkdir(os.path.join(self.directory, 'sub.mem'))
+        unreadable = ahmes_runner.run_program_file(os.path.join(self.directory, 'sub.mem'), 100)
+        self.assertEqual('load_error', unreadable['halt_reason'])
+        filenames = ahmes_runner.find_program_files(self.directory)
+        results = list(ahmes_runner.run_program_files(filenames, 100, workers=1, chunk_size=3))
+        self.assertEqual(['halted', 'step_limit', 'load_error'], [result['halt_reason'] for result in
+                                                                 sorted(results, key=lambda r: r['filename'])])
+
+    def test_run_program_file_should_use_the_cache(self):
+        cache = ahmes_cache.AhmesResultCache(os.path.join(self.directory, 'cache'))
+        filename = os.path.join(self.directory, 'halting.mem')
+        expected = ahmes_runner.run_program_file(filename, 100)
+        self.assertEqual(expected, ahmes_runner.run_program_file(filename, 100, cache=cache))
+        self.assertEqual(expected, ahmes_runner.run_program_file(filename, 100, cache=cache))
+        self.assertEqual((1, 1), (cache.misses, cache.hits))
+
+    def test_run_program_file_should_skip_programs_that_never_halt(self):
+        looping = ahmes_runner.run_program_file(os.path.join(self.directory, 'looping.mem'), 100, skip_non_halting=True)
+        self.assertEqual(('never_halts', 0), (looping['halt_reason'], looping['instructions']))
+        halting = ahmes_runner.run_program_file(os.path.join(self.directory, 'halting.mem'), 100, skip_non_halting=True)
+        self.assertEqual('halted', halting['halt_reason'])
+
+    def test_make_chunks_should_cover_every_filename_once(self):
+        filenames = [str(i) for i in range(1000)]
+        chunks = ahmes_runner.make_chunks(filenames, 4)
+        self.assertEqual(filenames, [filename for chunk in chunks for filename in chunk])
+        self.assertEqual([['0', '1'], ['2']], ahmes_runner.make_chunks(filenames[:3], 4, 2))
+
+    def test_run_program_files_should_return_one_result_per_file(self):
+        filenames = ahmes_runner.find_program_files(self.directory)
+        results = list(ahmes_runner.run_program_files(filenames, 100, workers=2, chunk_size=1))
+        self.assertEqual(filenames, sorted(result['filename'] for result in results))
+
+    def test_write_json_lines_should_write_one_object_per_line(self):
+        output = io.StringIO()
+        ahmes_runner.write_json_lines([{'a': 1}, {'b': 2}], output)
+        self.assertEqual([{'a': 1}, {'b': 2}], [json.loads(line) for line in output.getvalue().splitlines()])
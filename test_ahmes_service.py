@@ -0,0 +1,120 @@
+#!/usr/bin/python
+
+import asyncio
+import json
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_service
+
+looping = [128, 0] + [0] * 254  # JMP 0
+
+
+class TestAhmesService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.service = ahmes_service.AhmesService(slice_size=100, progress_interval=1, max_steps=100000,
+                                                  max_seconds=5.0, workers=1)
+        self.server = await ahmes_service.serve(self.service, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.service.disconnect()
+        await self.server.wait_closed()
+        self.service.close()
+
+    async def connect(self):
+        return await asyncio.open_connection('127.0.0.1', self.port)
+
+    async def request(self, writer, request):
+        writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+
+    async def read_until_result(self, reader):
+        messages = []
+        while not messages or messages[-1]['type'] == 'progress':
+            messages.append(json.loads(await reader.readline()))
+        return messages
+
+    async def test_a_memory_should_be_run_to_completion(self):
+        reader, writer = await self.connect()
+        await self.request(writer, {'id': 1, 'memory': ahmes_benchmark.make_multiplication_memory(13, 19)})
+        messages = await self.read_until_result(reader)
+        result = messages[-1]
+        self.assertEqual((1, 'halted'), (result['id'], result['halt_reason']))
+        self.assertEqual(13 * 19 % 256, result['memory'][131])
+        self.assertTrue(all(message['type'] == 'progress' for message in messages[:-1]))
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_the_step_quota_of_the_service_should_cap_the_request(self):
+        reader, writer = await self.connect()
+        await self.request(writer, {'memory': looping, 'max_steps': 10 ** 9, 'max_seconds': 60})
+        messages = await self.read_until_result(reader)
+        self.assertEqual('step_limit', messages[-1]['halt_reason'])
+        self.assertEqual(100000, messages[-1]['instructions'])
+        self.assertEqual(list(range(100, 100001, 100)), [message['instructions'] for message in messages[:-1]])
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_a_runaway_loop_should_not_starve_other_clients(self):
+        self.service.max_steps = 10 ** 9
+        runaway_reader, runaway_writer = await self.connect()
+        await self.request(runaway_writer, {'memory': looping, 'max_steps': 10 ** 9, 'max_seconds': 0.5})
+        reader, writer = await self.connect()
+        await self.request(writer, {'memory': ahmes_benchmark.make_countdown_memory(3)})
+        self.assertEqual('halted', (await self.read_until_result(reader))[-1]['halt_reason'])
+        runaway_messages = await self.read_until_result(runaway_reader)
+        self.assertEqual('time_limit', runaway_messages[-1]['halt_reason'])
+        writer.close()
+        await writer.wait_closed()
+        runaway_writer.close()
+        await runaway_writer.wait_closed()
+
+    async def test_invalid_requests_should_be_answered_with_errors(self):
+        reader, writer = await self.connect()
+        countdown = ahmes_benchmark.make_countdown_memory(3)
+        requests = [b'not json\n', b'[]\n', b'{"id": 2, "memory": [1, 2]}\n', b'{"memory": [256]}\n']
+        for fields in ({'max_steps': -1}, {'max_seconds': float('nan')}, {'max_steps': 'many'}, {'ac': 256},
+                       {'pc': -1}):
+            requests.append(json.dumps(dict(fields, memory=countdown)).encode() + b'\n')
+        requests.append(b'{"memory": ' + json.dumps(countdown).encode() + b', "max_steps": 1e999}\n')
+        requests.append(b'{"batch": ' + json.dumps([countdown]).encode() + b', "max_seconds": NaN}\n')
+        requests.append(json.dumps({'batch': 'not a list'}).encode() + b'\n')
+        for pedantic in (2, 'x', 0.5, None, 'yes'):
+            requests.append(json.dumps({'memory': countdown, 'pedantic': pedantic}).encode() + b'\n')
+            requests.append(json.dumps({'batch': [countdown], 'pedantic': pedantic}).encode() + b'\n')
+        for request in requests:
+            writer.write(request)
+            self.assertEqual('error', json.loads(await reader.readline())['type'])
+        self.assertLessEqual(set(ahmes.ahmes_dispatch_tables), {True, False})
+        await self.request(writer, {'memory': ahmes_benchmark.make_countdown_memory(3)})
+        self.assertEqual('halted', (await self.read_until_result(reader))[-1]['halt_reason'])
+        writer.close()
+        await writer.wait_closed()
+
+    def test_requests_should_be_checked_without_asserts(self):
+        # These checks must not be asserts, which python -O removes.
+        for request in ({'pedantic': 'yes'}, {'pedantic': 1}):
+            self.assertRaises(ValueError, ahmes_service.get_pedantic, request)
+        self.assertRaises(ValueError, ahmes_service.parse_memory, [1])
+        self.assertRaises(ValueError, ahmes_service.parse_memory, 256)
+        for value in (float('inf'), float('nan'), -1, '10', True):
+            self.assertRaises(ValueError, ahmes_service.get_quota, {'max_steps': value}, 'max_steps', 100)
+        self.assertEqual(100, ahmes_service.get_quota({'max_steps': 10 ** 400}, 'max_steps', 100))
+        self.assertEqual(0.5, ahmes_service.get_quota({}, 'max_seconds', 0.5))
+        self.assertRaises(ValueError, ahmes_service.get_byte, {'ac': 256}, 'ac')
+
+    async def test_a_batch_should_return_one_result_per_memory(self):
+        reader, writer = await self.connect()
+        batch = [ahmes_benchmark.make_multiplication_memory(a, 3) for a in range(5)]
+        await self.request(writer, {'id': 'b', 'batch': batch})
+        results = [json.loads(await reader.readline()) for memory in batch]
+        self.assertEqual({index: 3 * index for index in range(5)},
+                         {result['index']: result['memory'][131] for result in results})
+        writer.close()
+        await writer.wait_closed()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_sweep
+
+
+def run_directly(memory, input_addresses, values, max_steps):
+    computer = ahmes.AhmesComputer()
+    computer.bytes = bytearray(memory)
+    for address, value in zip(input_addresses, values):
+        computer.bytes[address] = value
+    computer.run(max_steps)
+    return computer.snapshot()
+
+
+class TestAhmesSweep(unittest.TestCase):
+    def test_sweep_should_match_direct_runs(self):
+        memory = ahmes_benchmark.make_multiplication_memory()
+        value_ranges = [range(0, 256, 17), range(0, 256, 23)]
+        outcomes = ahmes_sweep.sweep(memory, [128, 129], value_ranges, 2000)
+        self.assertEqual(len(value_ranges[0]) * len(value_ranges[1]), len(outcomes))
+        for values, outcome in outcomes.items():
+            self.assertEqual(run_directly(memory, [128, 129], values, 2000), outcome)
+
+    def test_shared_prefix_should_run_once(self):
+        memory = ahmes_benchmark.make_multiplication_memory()
+        sweep = ahmes_sweep.AhmesSweep(memory, [128])
+        sweep.run([range(4)], 2000)
+        # LDA 129, STA 132, LDA 132, JZ 20, SUB 133, STA 132, LDA 131, and then ADD 128 reads the input
+        self.assertEqual(7, sweep.prefix_steps)
+
+    def test_converging_combinations_should_reuse_outcomes(self):
+        memory = [0] * 256
+        # LDA 128, AND 129, STA 128, then count down the byte at 130 and halt
+        memory[0:15] = [32, 128, 80, 129, 16, 128, 32, 130, 112, 131, 16, 130, 164, 6, 240]
+        memory[129] = 1
+        memory[130] = 100
+        memory[131] = 1
+        sweep = ahmes_sweep.AhmesSweep(memory, [128], checkpoint_interval=8)
+        outcomes = sweep.run([range(256)], 10000)
+        self.assertEqual(254, sweep.reused_outcomes)
+        for values, outcome in outcomes.items():
+            self.assertEqual(run_directly(memory, [128], values, 10000), outcome)
+
+    def test_two_input_sweeps_should_reuse_outcomes_once_the_inputs_are_overwritten(self):
+        code = [32, 128,  # 0: LDA 128
+                48, 129,  # 2: ADD 129
+                80, 133,  # 4: AND 133
+                16, 128,  # 6: STA 128 (the parity of the sum)
+                32, 134,  # 8: LDA 134
+                16, 129,  # 10: STA 129
+                32, 130,  # 12: LDA 130
+                112, 131,  # 14: SUB 131
+                16, 130,  # 16: STA 130
+                164, 12,  # 18: JNZ 12
+                240]  # 20: HLT
+        memory = ahmes_benchmark.make_memory(code, {130: 100, 131: 1, 133: 1, 134: 0})
+        sweep = ahmes_sweep.AhmesSweep(memory, [128, 129], checkpoint_interval=8)
+        value_ranges = [range(16), range(16)]
+        outcomes = sweep.run(value_ranges, 10000)
+        self.assertEqual(16 * 16 - 2, sweep.reused_outcomes)
+        for values, outcome in outcomes.items():
+            self.assertEqual(run_directly(memory, [128, 129], values, 10000), outcome)
+
+    def test_checkpoints_should_be_bounded(self):
+        memory = ahmes_benchmark.make_multiplication_memory()
+        sweep = ahmes_sweep.AhmesSweep(memory, [128, 129], checkpoint_interval=4, max_checkpoints=10)
+        outcomes = sweep.run([range(8), range(8)], 2000)
+        self.assertEqual(10, len(sweep.checkpoints))
+        for values, outcome in outcomes.items():
+            self.assertEqual(run_directly(memory, [128, 129], values, 2000), outcome)
+
+    def test_inputs_that_are_never_accessed_should_still_be_in_the_outcomes(self):
+        memory = [0] * 256
+        memory[0] = 240
+        outcomes = ahmes_sweep.sweep(memory, [200], [range(3)], 100)
+        self.assertEqual([0, 1, 2], [outcomes[(i,)][0][200] for i in range(3)])
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import ahmes
+import ahmes_benchmark
+import ahmes_trace
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def make_computer(memory):
+    computer = ahmes.AhmesComputer()
+    computer.load_program(ahmes.AhmesProgram.from_bytes(memory))
+    return computer
+
+
+def make_expected_records(memory, max_steps=None):
+    """
+    Makes the records of a trace by running the computer one step at a time.
+    """
+    computer = make_computer(memory)
+    records = []
+    while not computer.halted and (max_steps is None or len(records) < max_steps):
+        pc = computer.pc
+        opcode = computer.bytes[pc]
+        instruction = ahmes.resolve_ahmes_instruction(opcode)
+        operand = computer.bytes[(pc + 1) & 0xFF] if instruction.size == 2 else 0
+        computer.advance()
+        stores = instruction.mnemonic == 'STA'
+        marks = (ahmes_trace.trace_mark_operand if instruction.size == 2 else 0)
+        marks |= ahmes_trace.trace_mark_store if stores else 0
+        records.append((pc, opcode, operand, computer.ac, computer.flags, operand if stores else 0,
+                        computer.ac if stores else 0, marks))
+    return records
+
+
+class TestAhmesTrace(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'trace.aht')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_record_trace_should_write_one_record_per_instruction(self):
+        memory = ahmes_benchmark.make_multiplication_memory(5, 7)
+        computer = make_computer(memory)
+        steps = ahmes_trace.record_trace(computer, self.filename, buffer_records=16)
+        self.assertEqual(steps, computer.instructions)
+        self.assertEqual(make_expected_records(memory), [tuple(record) for record in
+                                                          ahmes_trace.read_trace(self.filename, buffer_records=3)])
+        self.assertIs(ahmes.ahmes_dispatch_tables[True], computer.dispatch_table)
+
+    def test_recorder_should_buffer_records_until_flushed(self):
+        output = io.BytesIO()
+        computer = make_computer(ahmes_benchmark.make_countdown_memory())
+        recorder = ahmes_trace.AhmesTraceRecorder(computer, output, buffer_records=10)
+        recorder.enable()
+        computer.run(25)
+        self.assertEqual(len(ahmes_trace.trace_header) + 20 * ahmes_trace.trace_record_size, len(output.getvalue()))
+        recorder.disable()
+        self.assertEqual(25, recorder.records)
+        self.assertEqual(len(ahmes_trace.trace_header) + 25 * ahmes_trace.trace_record_size, len(output.getvalue()))
+
+    def test_read_trace_view_should_expose_the_records(self):
+        memory = ahmes_benchmark.make_countdown_memory(3)
+        ahmes_trace.record_trace(make_computer(memory), self.filename)
+        with ahmes_trace.read_trace_view(self.filename) as view:
+            self.assertEqual(make_expected_records(memory), [tuple(row) for row in view.records.tolist()])
+        self.assertRaises(ValueError, view.records.tolist)
+
+    def test_readers_should_ignore_a_partial_last_record(self):
+        memory = ahmes_benchmark.make_countdown_memory(3)
+        ahmes_trace.record_trace(make_computer(memory), self.filename)
+        with open(self.filename, 'ab') as open_file:
+            open_file.write(bytes(3))  # What an interrupted recorder may leave behind
+        expected = make_expected_records(memory)
+        self.assertEqual(expected, [tuple(record) for record in ahmes_trace.read_trace(self.filename, 4)])
+        with ahmes_trace.read_trace_view(self.filename) as view:
+            self.assertEqual(expected, [tuple(row) for row in view.records.tolist()])
+        if numpy is not None:
+            self.assertEqual(len(expected), len(ahmes_trace.read_trace_array(self.filename)))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not available')
+    def test_read_trace_array_should_expose_the_fields(self):
+        memory = ahmes_benchmark.make_countdown_memory(3)
+        ahmes_trace.record_trace(make_computer(memory), self.filename, 100)
+        trace = ahmes_trace.read_trace_array(self.filename)
+        expected = make_expected_records(memory, 100)
+        self.assertEqual([record[0] for record in expected], trace['pc'].tolist())
+        self.assertEqual([record[5] for record in expected if record[7] & ahmes_trace.trace_mark_store],
+                         trace['store_address'][trace['marks'] & ahmes_trace.trace_mark_store != 0].tolist())
+        ahmes_trace.record_trace(make_computer(memory), self.filename, 0)
+        self.assertEqual(0, len(ahmes_trace.read_trace_array(self.filename)))
+
+    def test_readers_should_reject_other_files(self):
+        with open(self.filename, 'wb') as open_file:
+            open_file.write(b'\x03AHM' + bytes(512))
+        with self.assertRaises(AssertionError):
+            list(ahmes_trace.read_trace(self.filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
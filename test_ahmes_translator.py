@@ -0,0 +1,76 @@
+#!/usr/bin/python
+
+import random
+import unittest
+import ahmes
+import ahmes_math
+import ahmes_translator
+
+
+class TestAhmesTranslator(unittest.TestCase):
+    def assert_translation_matches_interpretation(self, memory, pedantic, steps):
+        interpreted = ahmes.AhmesComputer(pedantic=pedantic)
+        interpreted.load_program(ahmes.AhmesProgram.from_bytes(memory))
+        interpreted.run(steps)
+        translated = ahmes.AhmesComputer(pedantic=pedantic)
+        translated.load_program(ahmes.AhmesProgram.from_bytes(memory))
+        self.assertEqual(interpreted.instructions, ahmes_translator.AhmesTranslator(translated).run(steps))
+        self.assertEqual(interpreted.snapshot(), translated.snapshot())
+
+    def test_translation_should_match_interpretation_on_random_memories(self):
+        generator = random.Random(0)
+        for i in range(100):
+            memory = [generator.randrange(256) for j in range(256)]
+            self.assert_translation_matches_interpretation(memory, i % 2 == 0, generator.randrange(1, 500))
+
+    def test_translation_should_match_interpretation_on_straight_line_memories(self):
+        generator = random.Random(1)
+        codes = [16, 32, 48, 64, 80, 96, 112, 224, 225, 226, 227]
+        for i in range(100):
+            memory = [generator.choice(codes) if j % 2 == 0 else generator.randrange(256) for j in range(256)]
+            self.assert_translation_matches_interpretation(memory, True, 1000)
+
+    def test_translation_should_handle_self_modifying_code(self):
+        memory = [0] * 256
+        # 0: LDA 128, ADD 129, STA 128, LDA 3, ADD 130, STA 3, JMP 0
+        memory[0:14] = [32, 128, 48, 129, 16, 128, 32, 3, 48, 130, 16, 3, 128, 0]
+        memory[129] = 1
+        memory[130] = 1
+        self.assert_translation_matches_interpretation(memory, True, 2000)
+
+    def test_stores_into_a_block_should_invalidate_it(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[0:4] = [32, 128, 128, 0]  # LDA 128, JMP 0
+        translator = ahmes_translator.AhmesTranslator(computer)
+        translator.run(2)
+        self.assertIn(0, translator.blocks)
+        computer.store_byte(1, 129)
+        self.assertNotIn(0, translator.blocks)
+        computer.store_byte(200, 1)
+        translator.run(2)
+        self.assertIn(0, translator.blocks)
+
+    def test_blocks_with_the_same_content_should_reuse_the_compiled_function(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[0:4] = [32, 128, 128, 0]  # LDA 128, JMP 0
+        translator = ahmes_translator.AhmesTranslator(computer)
+        translator.run(2)
+        function = translator.blocks[0].function
+        computer.store_byte(1, 129)
+        computer.store_byte(1, 128)
+        translator.run(2)
+        self.assertIs(function, translator.blocks[0].function)
+
+    def test_store_observers_should_see_the_state_at_the_store(self):
+        computer = ahmes.AhmesComputer()
+        computer.bytes[0:10] = [32, 128, 48, 129, 16, 130, 96, 16, 131, 240]  # LDA, ADD, STA 130, NOT, STA 131, HLT
+        computer.bytes[128:130] = [200, 100]
+        translator = ahmes_translator.AhmesTranslator(computer)
+        stores = []
+        computer.store_observers.append(lambda address, old_value, value: stores.append(
+            (address, computer.ac, computer.flags & ahmes_math.flag_c, computer.pc, computer.instructions)))
+        translator.run()
+        self.assertEqual(1, len(translator.blocks))
+        self.assertEqual([(130, 44, ahmes_math.flag_c, 6, 3), (131, 211, ahmes_math.flag_c, 9, 5)], stores)
+        self.assertEqual(6, computer.instructions)
+        self.assertEqual(10 + 2 + 2, computer.memory_accesses)